@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+对比每个监控账户占用的内存（RSS）：
+  - persistent: 每个账户一个 launch_persistent_context Chromium（旧方式）
+  - pool:       BrowserPool，多个账户共享Chromium进程
+
+用法: python benchmarks/bench_browser_rss.py --accounts 20 --per-browser 10 [--url https://band.us]
+仅支持Linux（读取 /proc 统计子进程RSS）。
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from playwright.async_api import async_playwright
+from src.band_monitor.browser_pool import BrowserPool
+from src.band_monitor.browser_manager import BROWSER_ARGS, VIEWPORT
+
+
+def _children(pid: int) -> list:
+    result = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            if int(fields[1]) == pid:
+                result.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return result
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def tree_rss_mb() -> float:
+    """当前进程所有子孙进程（Chromium/driver）的RSS总和"""
+    total = 0
+    stack = _children(os.getpid())
+    while stack:
+        pid = stack.pop()
+        total += _rss_kb(pid)
+        stack.extend(_children(pid))
+    return total / 1024
+
+
+async def run_persistent(playwright, accounts: int, url: str, data_dir: str) -> float:
+    contexts = []
+    for i in range(accounts):
+        context = await playwright.chromium.launch_persistent_context(
+            user_data_dir=os.path.join(data_dir, f"account_{i}"),
+            headless=True,
+            viewport=VIEWPORT,
+            args=BROWSER_ARGS,
+        )
+        page = context.pages[0] if context.pages else await context.new_page()
+        await page.goto(url)
+        contexts.append(context)
+    await asyncio.sleep(2)
+    rss = tree_rss_mb()
+    for context in contexts:
+        await context.close()
+    return rss
+
+
+async def run_pool(playwright, accounts: int, per_browser: int, url: str, data_dir: str) -> float:
+    pool = BrowserPool(playwright, data_dir, accounts_per_browser=per_browser, launch_args=BROWSER_ARGS)
+    for i in range(accounts):
+        context = await pool.acquire_context(i, headless=True, viewport=VIEWPORT)
+        page = await context.new_page()
+        await page.goto(url)
+    await asyncio.sleep(2)
+    rss = tree_rss_mb()
+    await pool.close()
+    return rss
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--per-browser", type=int, default=10)
+    parser.add_argument("--url", default="about:blank")
+    args = parser.parse_args()
+
+    async with async_playwright() as playwright:
+        baseline = tree_rss_mb()
+        with tempfile.TemporaryDirectory() as data_dir:
+            persistent = await run_persistent(playwright, args.accounts, args.url, data_dir) - baseline
+        with tempfile.TemporaryDirectory() as data_dir:
+            pooled = await run_pool(playwright, args.accounts, args.per_browser, args.url, data_dir) - baseline
+
+    print(f"accounts={args.accounts} per_browser={args.per_browser} url={args.url}")
+    print(f"persistent: total {persistent:8.1f} MB  per account {persistent / args.accounts:6.1f} MB")
+    print(f"pool:       total {pooled:8.1f} MB  per account {pooled / args.accounts:6.1f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+update_current_counts 吞吐量：每次调用新建连接（旧方式） vs Database长连接 + WAL
+
+用法: python benchmarks/bench_db_updates.py --accounts 100 --rounds 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import aiosqlite
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.band_monitor.database import Database
+
+
+async def legacy_update(db_path: str, account_id: int, friend_count: int, friend_requests: int, timestamp: str):
+    """旧实现：每次调用打开新连接并立即提交"""
+    async with aiosqlite.connect(db_path) as db:
+        cursor = await db.execute(
+            "SELECT initial_friend_count, initial_friend_requests FROM accounts WHERE id = ?",
+            (account_id,)
+        )
+        row = await cursor.fetchone()
+        if row:
+            increment = max(0, friend_count + friend_requests - (row[0] or 0) - (row[1] or 0))
+            await db.execute(
+                "UPDATE accounts SET current_friend_count = ?, current_friend_requests = ?, friend_count = ?, last_updated = ? WHERE id = ?",
+                (friend_count, friend_requests, increment, timestamp, account_id)
+            )
+        await db.commit()
+
+
+async def setup(db_path: str, accounts: int) -> list:
+    db = Database(db_path)
+    await db.init_db()
+    ids = [await db.add_account(f"user{i}@example.com", "secret") for i in range(accounts)]
+    await db.close()
+    return ids
+
+
+async def run(label: str, update, ids: list, rounds: int):
+    start = time.perf_counter()
+    failed = 0
+    for r in range(rounds):
+        # 与监控循环一致：所有账户并发上报
+        results = await asyncio.gather(
+            *(update(account_id, 100 + r, r % 5, "2025-01-01T00:00:00") for account_id in ids),
+            return_exceptions=True
+        )
+        failed += sum(1 for result in results if isinstance(result, Exception))
+    elapsed = time.perf_counter() - start
+    total = len(ids) * rounds
+    print(f"{label:<12} {total} updates in {elapsed:6.2f}s  -> {total / elapsed:8.0f} updates/s  ({failed} failed)")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        ids = await setup(legacy_path, args.accounts)
+        # 旧版数据库使用默认的rollback journal
+        async with aiosqlite.connect(legacy_path) as conn:
+            await conn.execute("PRAGMA journal_mode=DELETE")
+        await run("per-call", lambda *a: legacy_update(legacy_path, *a), ids, args.rounds)
+
+        pooled_path = os.path.join(tmp, "pooled.db")
+        ids = await setup(pooled_path, args.accounts)
+        db = Database(pooled_path)
+        await db.connect()
+        await run("persistent", db.update_current_counts, ids, args.rounds)
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+对比监控页面每次刷新的网络流量和Chromium CPU时间：
+  - full:    可见/无头浏览器，加载全部资源（旧方式）
+  - blocked: 无头浏览器，拦截图片、媒体、字体和跟踪脚本
+
+用法: python benchmarks/bench_headless_blocking.py --url https://band.us --reloads 10 [--headed]
+仅支持Linux（读取 /proc 统计子进程CPU时间）。
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from playwright.async_api import async_playwright
+from src.band_monitor.browser_manager import BROWSER_ARGS, VIEWPORT, _block_heavy_resources
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def _children(pid: int) -> list:
+    result = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            if int(fields[1]) == pid:
+                result.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return result
+
+
+def _cpu_ticks(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime, stime 为 ")" 之后的第12、13个字段
+        return int(fields[11]) + int(fields[12])
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def tree_cpu_seconds() -> float:
+    """当前进程所有子孙进程（Chromium/driver）累计的CPU时间"""
+    total = 0
+    stack = _children(os.getpid())
+    while stack:
+        pid = stack.pop()
+        total += _cpu_ticks(pid)
+        stack.extend(_children(pid))
+    return total / _CLOCK_TICKS
+
+
+async def run(playwright, url: str, reloads: int, headless: bool, block: bool, data_dir: str) -> tuple:
+    context = await playwright.chromium.launch_persistent_context(
+        user_data_dir=data_dir,
+        headless=headless,
+        viewport=VIEWPORT,
+        args=BROWSER_ARGS,
+    )
+    if block:
+        await context.route("**/*", _block_heavy_resources)
+    page = context.pages[0] if context.pages else await context.new_page()
+
+    # 通过CDP统计实际传输的字节数（被拦截的请求不计入）
+    received = {"bytes": 0}
+    cdp = await context.new_cdp_session(page)
+    await cdp.send("Network.enable")
+    cdp.on("Network.loadingFinished", lambda event: received.__setitem__(
+        "bytes", received["bytes"] + event.get("encodedDataLength", 0)))
+
+    await page.goto(url, wait_until="load")
+    received["bytes"] = 0
+    cpu_before = tree_cpu_seconds()
+    for _ in range(reloads):
+        await page.reload(wait_until="load")
+    await asyncio.sleep(1)
+    cpu = tree_cpu_seconds() - cpu_before
+
+    await context.close()
+    return received["bytes"] / reloads, cpu / reloads
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="https://band.us")
+    parser.add_argument("--reloads", type=int, default=10)
+    parser.add_argument("--headed", action="store_true", help="对照组使用可见浏览器（与旧方式一致，需要显示环境）")
+    args = parser.parse_args()
+
+    async with async_playwright() as playwright:
+        with tempfile.TemporaryDirectory() as data_dir:
+            full_bytes, full_cpu = await run(playwright, args.url, args.reloads, not args.headed, False, data_dir)
+        with tempfile.TemporaryDirectory() as data_dir:
+            blocked_bytes, blocked_cpu = await run(playwright, args.url, args.reloads, True, True, data_dir)
+
+    print(f"url={args.url} reloads={args.reloads} baseline={'headed' if args.headed else 'headless'}")
+    print(f"full:    {full_bytes / 1024:9.1f} KB/reload  cpu {full_cpu * 1000:7.1f} ms/reload")
+    print(f"blocked: {blocked_bytes / 1024:9.1f} KB/reload  cpu {blocked_cpu * 1000:7.1f} ms/reload")
+    if full_bytes:
+        print(f"bytes saved: {100 * (1 - blocked_bytes / full_bytes):5.1f}%")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+对比轮询日志对事件循环的阻塞：
+  - print:   每次轮询在事件循环中同步 print 多行（旧方式）
+  - logging: 队列日志管道，轮询细节为DEBUG级别，重复消息限流，写入由后台线程完成
+
+模拟 --accounts 个账户每 --interval 秒轮询一次，同时用一个1ms定时器测量事件循环的延迟。
+输出写到临时目录下的文件（每次写入都flush），用 --slow-ms 模拟缓慢的终端/管道（每次写入额外阻塞的毫秒数）。
+
+用法: python benchmarks/bench_logging_stall.py --accounts 300 --seconds 10 --slow-ms 0.2
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.band_monitor.log import account_logger, setup_logging, shutdown_logging
+
+
+class SlowStream(io.TextIOBase):
+    """每次写入都同步落盘并额外阻塞 slow_ms 毫秒"""
+
+    def __init__(self, path: str, slow_ms: float):
+        self._file = open(path, "a", buffering=1)
+        self.slow_ms = slow_ms
+
+    def write(self, text: str) -> int:
+        written = self._file.write(text)
+        self._file.flush()
+        if self.slow_ms:
+            time.sleep(self.slow_ms / 1000)
+        return written
+
+    def flush(self):
+        self._file.flush()
+
+
+def poll_with_print(stream, account_id: int):
+    # 与旧版 get_member_count_and_requests 每次轮询的输出一致
+    print(f"Band name: Band {account_id}", file=stream)
+    print(f"Member count: {1000 + account_id}", file=stream)
+    print(f"Join status text: pending/{account_id % 10}", file=stream)
+    print(f"Match: <re.Match object; span=(0, 9), match='pending/{account_id % 10}'>", file=stream)
+    print(f"Friend requests: {account_id % 10}", file=stream)
+
+
+def poll_with_logging(logger: logging.Logger, account_id: int):
+    log = account_logger(logger, account_id)
+    log.debug("Band name: %s", f"Band {account_id}")
+    log.debug("Member count: %s", 1000 + account_id)
+    log.debug("Join status text: %s", f"pending/{account_id % 10}")
+    log.debug("Match: %s", None)
+    log.debug("Friend requests: %s", account_id % 10)
+    # 偶发的告警走限流
+    if account_id % 20 == 0:
+        log.warning("Failed to get band name: %s", "Timeout 5000ms exceeded")
+
+
+async def measure(mode: str, accounts: int, seconds: float, interval: float, stream) -> dict:
+    logger = logging.getLogger("bench")
+    lags = []
+    stop = time.monotonic() + seconds
+
+    async def ticker():
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    async def account_loop(account_id: int):
+        await asyncio.sleep(interval * account_id / accounts)
+        while time.monotonic() < stop:
+            if mode == "print":
+                poll_with_print(stream, account_id)
+            else:
+                poll_with_logging(logger, account_id)
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(ticker(), *(account_loop(i) for i in range(accounts)))
+    lags.sort()
+    return {
+        "p50_ms": statistics.median(lags) * 1000,
+        "p99_ms": lags[int(len(lags) * 0.99)] * 1000,
+        "max_ms": lags[-1] * 1000,
+        "stalled_ms": sum(lag for lag in lags if lag > 0.005) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=300)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=1.0, help="每个账户的轮询间隔（秒）")
+    parser.add_argument("--slow-ms", type=float, default=0.2, help="每次写入额外阻塞的毫秒数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        stream = SlowStream(os.path.join(workdir, "print.out"), args.slow_ms)
+        before = asyncio.run(measure("print", args.accounts, args.seconds, args.interval, stream))
+
+        log_stream = SlowStream(os.path.join(workdir, "logging.out"), args.slow_ms)
+        setup_logging(level="INFO", log_file=os.path.join(workdir, "logs", "bench.log"), stream=log_stream)
+        after = asyncio.run(measure("logging", args.accounts, args.seconds, args.interval, log_stream))
+        shutdown_logging()
+
+    print(f"accounts={args.accounts} interval={args.interval}s seconds={args.seconds} slow_ms={args.slow_ms}")
+    for name, result in (("print", before), ("logging", after)):
+        print(f"{name:8} loop lag p50 {result['p50_ms']:6.2f} ms  p99 {result['p99_ms']:7.2f} ms  "
+              f"max {result['max_ms']:7.2f} ms  stalled {result['stalled_ms']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
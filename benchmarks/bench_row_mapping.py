@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+accounts行映射耗时：旧版逐行 safe_get + pydantic校验 vs 预解析列下标的映射器（Account / AccountRecord）
+
+只计算映射本身（行已从SQLite读出），每种方式重复 --repeat 次取最快一次。
+
+用法: python benchmarks/bench_row_mapping.py --rows 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import aiosqlite
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.band_monitor.database import Database, _AccountRowMapper
+from src.band_monitor.models import Account, MonitorStatus
+
+
+def legacy_row_to_account(row) -> Account:
+    """旧实现：每行定义 safe_get，每个字段调用一次 row.keys()"""
+    def safe_get(row, key, default=None):
+        try:
+            return row[key] if key in row.keys() else default
+        except (KeyError, IndexError):
+            return default
+
+    return Account(
+        id=row["id"],
+        username=row["username"],
+        password=row["password"],
+        status=MonitorStatus(row["status"]),
+        last_updated=row["last_updated"],
+        friend_count=safe_get(row, "friend_count", 0) or 0,
+        band_id=safe_get(row, "band_id"),
+        band_name=safe_get(row, "band_name"),
+        current_friend_count=safe_get(row, "current_friend_count") or safe_get(row, "friend_count", 0) or 0,
+        current_friend_requests=safe_get(row, "current_friend_requests", 0) or 0,
+        initial_friend_count=safe_get(row, "initial_friend_count", 0) or 0,
+        initial_friend_requests=safe_get(row, "initial_friend_requests", 0) or 0,
+        target_friend_count=safe_get(row, "target_friend_count", 10),
+        notes=safe_get(row, "notes"),
+        link=safe_get(row, "link"),
+    )
+
+
+async def load_rows(db_path: str, rows: int):
+    db = Database(db_path)
+    await db.init_db()
+    await db.add_accounts([(f"user{i}@example.com", "secret", f"https://band.us/n/{i}") for i in range(rows)])
+    await db.close()
+    async with aiosqlite.connect(db_path) as conn:
+        conn.row_factory = aiosqlite.Row
+        cursor = await conn.execute("SELECT * FROM accounts")
+        return tuple(column[0] for column in cursor.description), await cursor.fetchall()
+
+
+def best_of(repeat: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        columns, rows = asyncio.run(load_rows(os.path.join(tmp, "accounts.db"), args.rows))
+
+    mapper = _AccountRowMapper(columns)
+    assert [legacy_row_to_account(row) for row in rows[:100]] == [mapper.account(row) for row in rows[:100]]
+
+    results = [
+        ("legacy", best_of(args.repeat, lambda: [legacy_row_to_account(row) for row in rows])),
+        ("Account", best_of(args.repeat, lambda: [mapper.account(row) for row in rows])),
+        ("record", best_of(args.repeat, lambda: [mapper.record(row) for row in rows])),
+    ]
+    for label, elapsed in results:
+        print(f"{label:<8} {len(rows)} rows in {elapsed * 1000:7.1f} ms  -> {elapsed / len(rows) * 1e6:5.2f} us/row")
+
+
+if __name__ == "__main__":
+    main()
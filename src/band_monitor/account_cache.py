@@ -0,0 +1,45 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+from .models import AccountRecord
+from .metrics import ACCOUNT_CACHE_LOOKUPS
+
+
+class AccountCache:
+    """
+    进程内账户缓存（按账户ID，LRU淘汰），保存不可变的 AccountRecord
+    由 Database 在读取时填充、在写事务提交后失效，max_size 为0时不缓存
+    """
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._records: "OrderedDict[int, AccountRecord]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, account_id: int) -> Optional[AccountRecord]:
+        record = self._records.get(account_id)
+        if record is None:
+            self.misses += 1
+            ACCOUNT_CACHE_LOOKUPS.inc(result="miss")
+            return None
+        self._records.move_to_end(account_id)
+        self.hits += 1
+        ACCOUNT_CACHE_LOOKUPS.inc(result="hit")
+        return record
+
+    def put(self, record: AccountRecord):
+        if self.max_size <= 0:
+            return
+        self._records[record.id] = record
+        self._records.move_to_end(record.id)
+        while len(self._records) > self.max_size:
+            self._records.popitem(last=False)
+
+    def invalidate(self, account_id: int):
+        self._records.pop(account_id, None)
+
+    def clear(self):
+        self._records.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._records), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
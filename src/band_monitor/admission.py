@@ -0,0 +1,109 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict
+
+# 各类浏览器操作占用的容量
+OPERATION_WEIGHTS = {
+    "navigate": 3,
+    "reload": 2,
+    "screenshot": 1,
+}
+
+
+class _Waiter:
+    __slots__ = ("future", "weight", "operation", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, weight: int, operation: str):
+        self.future = future
+        self.weight = weight
+        self.operation = operation
+        self.enqueued_at = time.monotonic()
+
+
+class AdmissionController:
+    """
+    浏览器重操作（刷新、导航、截图）的全局准入控制
+    同时进行的操作按权重占用总容量，排队的请求在账户之间轮流放行，单个账户的操作按顺序执行
+    """
+
+    def __init__(self, capacity: int = 8, weights: Dict[str, int] = None):
+        self.capacity = max(1, capacity)
+        self.weights = weights or OPERATION_WEIGHTS
+        self._used = 0
+        self._queues: "OrderedDict[int, deque]" = OrderedDict()
+        self._in_flight: Dict[str, int] = {}
+        self._wait_stats: Dict[str, dict] = {}
+
+    def _weight(self, operation: str) -> int:
+        return min(self.capacity, self.weights.get(operation, 1))
+
+    def _dispatch(self):
+        """按账户轮询放行排队的操作，容量不足时停止，避免重操作被饿死"""
+        while self._queues:
+            account_id, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            if waiter.future.done():
+                queue.popleft()
+            elif self._used + waiter.weight <= self.capacity:
+                queue.popleft()
+                self._used += waiter.weight
+                waiter.future.set_result(None)
+            else:
+                return
+            # 本账户放到队尾，其他账户先执行
+            self._queues.pop(account_id)
+            if queue:
+                self._queues[account_id] = queue
+
+    def _record_wait(self, operation: str, waited: float):
+        stats = self._wait_stats.setdefault(operation, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        stats["count"] += 1
+        stats["total_seconds"] += waited
+        stats["max_seconds"] = max(stats["max_seconds"], waited)
+
+    def _release(self, weight: int):
+        self._used -= weight
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, account_id: int, operation: str):
+        weight = self._weight(operation)
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), weight, operation)
+        self._queues.setdefault(account_id, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已被放行但调用方取消，归还容量
+                self._release(weight)
+            else:
+                self._dispatch()
+            raise
+
+        self._record_wait(operation, time.monotonic() - waiter.enqueued_at)
+        self._in_flight[operation] = self._in_flight.get(operation, 0) + 1
+        try:
+            yield
+        finally:
+            self._in_flight[operation] -= 1
+            self._release(weight)
+
+    def metrics(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "used": self._used,
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "queued_accounts": len(self._queues),
+            "in_flight": dict(self._in_flight),
+            "wait": {
+                operation: {
+                    "count": stats["count"],
+                    "avg_seconds": round(stats["total_seconds"] / stats["count"], 4) if stats["count"] else 0.0,
+                    "max_seconds": round(stats["max_seconds"], 4),
+                }
+                for operation, stats in self._wait_stats.items()
+            },
+        }
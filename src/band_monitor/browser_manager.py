@@ -1,17 +1,126 @@
 import asyncio
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page
-from typing import Dict, Optional
+from typing import Dict, Optional, Set
+import logging
 import os
+import time
 from datetime import datetime
+from urllib.parse import urlparse
+from .browser_pool import BrowserPool
+from .network_counts import NetworkCountExtractor
+from .screenshot_store import ScreenshotStore
+from .scheduler import PollScheduler
+from .admission import AdmissionController
+from .events import BandNameChanged, BrowserClosed, CountChanged, EventBus, PageNavigated, ScreenshotSaved
+from .config import config
+from .log import account_logger
+from .metrics import (
+    FAILURES_TOTAL, LAST_POLL_SUCCESS_AGE, MONITOR_LOOP_LAG_SECONDS, POLL_SECONDS, POLL_STAGE_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+BROWSER_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--no-first-run',
+    '--disable-default-apps',
+    '--disable-features=TranslateUI',
+]
+VIEWPORT = {'width': 1280, 'height': 720}
+
+# 无头监控时拦截的资源类型和第三方跟踪域名
+BLOCKED_RESOURCE_TYPES = {'image', 'media', 'font'}
+TRACKER_HOSTS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'googlesyndication.com',
+    'facebook.net',
+    'connect.facebook.com',
+    'scorecardresearch.com',
+    'amplitude.com',
+    'criteo.com',
+    'criteo.net',
+)
+
+
+def _is_tracker(url: str) -> bool:
+    host = urlparse(url).hostname or ''
+    return any(host == tracker or host.endswith('.' + tracker) for tracker in TRACKER_HOSTS)
+
+
+async def _block_heavy_resources(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or _is_tracker(request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def is_member_page_url(url: str) -> bool:
+    return '/member' in url and 'band.us/band/' in url
+
+
+class PageState:
+    """账户浏览器/页面状态，由页面事件和监控循环更新，读取时无需访问浏览器"""
+    __slots__ = ('browser_open', 'current_url', 'on_member_page', 'last_poll_success')
+
+    def __init__(self):
+        self.browser_open = True
+        self.current_url: Optional[str] = None
+        self.on_member_page = False
+        self.last_poll_success: Optional[str] = None
+
+    def set_url(self, url: str):
+        self.current_url = url
+        self.on_member_page = is_member_page_url(url)
+
+    def mark_closed(self):
+        self.browser_open = False
+        self.on_member_page = False
+
+    def to_dict(self) -> dict:
+        return {
+            'browser_open': self.browser_open,
+            'on_member_page': self.on_member_page,
+            'needs_login': not self.on_member_page,
+            'current_url': self.current_url,
+            'last_poll_success': self.last_poll_success,
+        }
 
 class BrowserManager:
-    def __init__(self, user_data_dir: str = "browser_sessions"):
+    def __init__(self, user_data_dir: str = "browser_sessions", events: Optional[EventBus] = None):
         self.user_data_dir = user_data_dir
+        # 监控循环和页面事件发布到事件总线（计数变化、浏览器关闭、页面跳转、截图保存）
+        self.events = events or EventBus()
         self.browsers: Dict[int, Browser] = {}
         self.contexts: Dict[int, BrowserContext] = {}
         self.pages: Dict[int, Page] = {}
+        self.session_headless: Dict[int, bool] = {}  # 会话是否为无头监控模式
         self.monitoring_tasks: Dict[int, asyncio.Task] = {}
         self.playwright = None
+        self.pool: Optional[BrowserPool] = None
+        self.network_counts = NetworkCountExtractor()
+        self.stale_dom: Set[int] = set()  # 计数来自网络接口、页面DOM尚未刷新的账户
+        self.page_states: Dict[int, PageState] = {}
+        self.screenshots = ScreenshotStore(
+            "screenshots",
+            image_format=config.screenshot_format,
+            quality=config.screenshot_quality,
+            clip_selector=config.screenshot_clip_selector,
+            max_per_account=config.screenshot_max_per_account,
+            max_total_mb=config.screenshot_max_total_mb,
+        )
+        self.screenshot_tasks: Dict[int, asyncio.Task] = {}
+        self.admission = AdmissionController(capacity=config.browser_op_capacity)
+        self.scheduler = PollScheduler(
+            min_interval=config.poll_min_interval,
+            max_interval=config.poll_max_interval,
+            base_interval=config.poll_base_interval,
+            backoff=config.poll_backoff,
+            jitter=config.poll_jitter,
+            max_polls_per_second=config.max_polls_per_second,
+        )
         self.previous_counts: Dict[int, dict] = {}  # 存储上一次的计数用于比较
         
         os.makedirs(user_data_dir, exist_ok=True)
@@ -20,28 +129,122 @@ class BrowserManager:
     async def init_playwright(self):
         if not self.playwright:
             self.playwright = await async_playwright().start()
+        if config.browser_pool and not self.pool:
+            self.pool = BrowserPool(
+                self.playwright,
+                self.user_data_dir,
+                accounts_per_browser=config.accounts_per_browser,
+                launch_args=BROWSER_ARGS,
+            )
 
-    async def create_browser_session(self, account_id: int) -> Browser:
+    async def create_browser_session(self, account_id: int, headless: bool = False) -> BrowserContext:
         await self.init_playwright()
         
-        session_dir = os.path.join(self.user_data_dir, f"account_{account_id}")
-        os.makedirs(session_dir, exist_ok=True)
+        if self.pool:
+            # 共享进程池：每个账户一个独立的BrowserContext
+            browser = await self.pool.acquire_context(account_id, headless=headless, viewport=VIEWPORT)
+        else:
+            session_dir = os.path.join(self.user_data_dir, f"account_{account_id}")
+            os.makedirs(session_dir, exist_ok=True)
+            
+            browser = await self.playwright.chromium.launch_persistent_context(
+                user_data_dir=session_dir,
+                headless=headless,
+                viewport=VIEWPORT,
+                args=BROWSER_ARGS,
+            )
         
-        browser = await self.playwright.chromium.launch_persistent_context(
-            user_data_dir=session_dir,
-            headless=False,
-            viewport={'width': 1280, 'height': 720},
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--no-first-run',
-                '--disable-default-apps',
-                '--disable-features=TranslateUI',
-            ],
-        )
+        # 无头监控只需要页面数据，不加载图片、媒体、字体和跟踪脚本
+        if headless and config.block_resources:
+            await browser.route("**/*", _block_heavy_resources)
         
         self.browsers[account_id] = browser
+        self.session_headless[account_id] = headless
+        browser.on("close", lambda _: self._on_browser_closed(account_id, browser))
         return browser
 
+    async def ensure_session(self, account_id: int, headless: bool):
+        """
+        确保账户会话为指定模式（无头监控 / 可见浏览器登录）
+        模式不同时先保存登录状态再重新打开，监控任务和计数记录不受影响
+        """
+        if account_id in self.browsers:
+            if self.session_headless.get(account_id) == headless:
+                return
+            await self.persist_session(account_id)
+            await self._close_session(account_id)
+        await self.create_browser_session(account_id, headless=headless)
+
+    async def open_for_monitoring(self, account_id: int):
+        """没有会话时按监控配置打开（已登录的账户可以直接无头运行）"""
+        if account_id not in self.browsers:
+            await self.create_browser_session(account_id, headless=config.headless_monitoring)
+
+    async def switch_to_monitoring_profile(self, account_id: int, band_id: str) -> bool:
+        """
+        登录完成后切换到无头监控会话并打开成员页面
+        无头会话无法进入成员页面时回到可见浏览器，返回False
+        """
+        if not config.headless_monitoring or self.session_headless.get(account_id):
+            return True
+        
+        await self.ensure_session(account_id, headless=True)
+        if band_id and await self.try_direct_member_page_access(account_id, band_id):
+            self._log(account_id).info("Switched to headless monitoring session")
+            return True
+        
+        self._log(account_id).warning("Headless session could not open member page, back to visible browser")
+        await self.ensure_session(account_id, headless=False)
+        if band_id:
+            await self.navigate_to_band_member_page(account_id, band_id)
+        return False
+
+    def _on_browser_closed(self, account_id: int, browser: BrowserContext):
+        if self.browsers.get(account_id) is browser and account_id in self.page_states:
+            self.page_states[account_id].mark_closed()
+
+    def _track_page(self, account_id: int, page: Page):
+        """订阅页面导航和关闭事件，维护状态表"""
+        state = PageState()
+        state.set_url(page.url)
+        self.page_states[account_id] = state
+
+        def on_navigated(frame):
+            if frame == page.main_frame and self.pages.get(account_id) is page:
+                if frame.url == state.current_url:
+                    # 刷新同一页面
+                    return
+                was_on_member_page = state.on_member_page
+                state.set_url(frame.url)
+                self.events.publish(PageNavigated(account_id, frame.url, state.on_member_page, was_on_member_page))
+
+        def on_close(_):
+            if self.pages.get(account_id) is page:
+                state.mark_closed()
+
+        page.on("framenavigated", on_navigated)
+        page.on("close", on_close)
+
+    def _log(self, account_id: int):
+        return account_logger(logger, account_id)
+
+    def get_page_state(self, account_id: int) -> Optional[dict]:
+        """
+        从状态表读取浏览器和页面状态（不访问浏览器）
+        浏览器已打开但页面尚未跟踪时返回None，调用方可回退到 check_browser_and_page_status
+        """
+        state = self.page_states.get(account_id)
+        if state:
+            return state.to_dict()
+        if account_id in self.browsers:
+            return None
+        return {'browser_open': False, 'on_member_page': False, 'needs_login': True}
+
+    async def persist_session(self, account_id: int):
+        """把会话状态写回磁盘（持久化目录模式下由Chromium自动完成）"""
+        if self.pool:
+            await self.pool.save_state(account_id)
+
     async def get_or_create_page(self, account_id: int) -> Page:
         if account_id not in self.browsers:
             await self.create_browser_session(account_id)
@@ -54,6 +257,9 @@ class BrowserManager:
                 self.pages[account_id] = pages[0]
             else:
                 self.pages[account_id] = await browser.new_page()
+            self._track_page(account_id, self.pages[account_id])
+            if config.poll_mode == 'network':
+                self.network_counts.attach(account_id, self.pages[account_id])
         
         return self.pages[account_id]
 
@@ -62,7 +268,8 @@ class BrowserManager:
             page = await self.get_or_create_page(account_id)
             
             # 登录流程
-            await page.goto('https://auth.band.us/email_login?keep_login=true')
+            async with self.admission.admit(account_id, "navigate"):
+                await page.goto('https://auth.band.us/email_login?keep_login=true')
             await page.fill('input[id="input_email"]', username)
             await page.wait_for_timeout(800)
             await page.click('button[type="submit"]')
@@ -75,16 +282,17 @@ class BrowserManager:
             # 检查是否登录成功 - 等待跳转到band页面或主页
             try:
                 await page.wait_for_url('https://www.band.us/**', timeout=3600000)
+                await self.persist_session(account_id)
                 return True
             except:
                 # 如果没有跳转，检查是否还在登录页面
                 if 'auth.band.us' in page.url:
-                    print(f"Login failed for account {account_id}: Still on login page")
+                    self._log(account_id).warning("Login failed: still on login page")
                     return False
                 return True
                 
         except Exception as e:
-            print(f"Login failed for account {account_id}: {e}")
+            self._log(account_id).error("Login failed: %s", e)
             return False
 
     async def try_direct_member_page_access(self, account_id: int, band_id: str) -> bool:
@@ -96,8 +304,9 @@ class BrowserManager:
             page = await self.get_or_create_page(account_id)
             member_url = f"https://band.us/band/{band_id}/member"
             
-            print(f"Account {account_id}: Trying direct access to {member_url}")
-            await page.goto(member_url, timeout=10000)
+            self._log(account_id).info("Trying direct access to %s", member_url)
+            async with self.admission.admit(account_id, "navigate"):
+                await page.goto(member_url, timeout=10000)
             await page.wait_for_timeout(3000)
             
             # 检查是否成功加载成员页面（而不是被重定向到登录页面）
@@ -107,17 +316,17 @@ class BrowserManager:
                 try:
                     # 等待成员页面的关键元素加载
                     await page.wait_for_selector('.bandMemberList, .member-list, [class*="member"]', timeout=5000)
-                    print(f"Account {account_id}: Direct access successful - found member content")
+                    self._log(account_id).info("Direct access successful - found member content")
                     return True
                 except:
-                    print(f"Account {account_id}: Direct access failed - no member content found")
+                    self._log(account_id).warning("Direct access failed - no member content found")
                     return False
             else:
-                print(f"Account {account_id}: Direct access failed - redirected to {current_url}")
+                self._log(account_id).warning("Direct access failed - redirected to %s", current_url)
                 return False
                 
         except Exception as e:
-            print(f"Account {account_id}: Direct access exception: {e}")
+            self._log(account_id).warning("Direct access exception: %s", e)
             return False
     
     async def check_member_page_access(self, account_id: int) -> bool:
@@ -150,7 +359,8 @@ class BrowserManager:
             if band_id:
                 # 如果提供了band_id，直接导航到成员页面
                 member_url = f"https://band.us/band/{band_id}/member"
-                await page.goto(member_url)
+                async with self.admission.admit(account_id, "navigate"):
+                    await page.goto(member_url)
                 await page.wait_for_timeout(2000)
                 return band_id
             else:
@@ -162,14 +372,14 @@ class BrowserManager:
                     match = re.search(r'https://www\.band\.us/band/(\d+)/member', page.url)
                     if match:
                         extracted_band_id = match.group(1)
-                        print(f"Extracted band ID: {extracted_band_id}")
+                        self._log(account_id).info("Extracted band ID: %s", extracted_band_id)
                         return extracted_band_id
                 except Exception as e:
-                    print(f"Failed to get band ID for account {account_id}: {e}")
+                    self._log(account_id).warning("Failed to get band ID: %s", e)
                     return None
                     
         except Exception as e:
-            print(f"Failed to navigate to band member page for account {account_id}: {e}")
+            self._log(account_id).error("Failed to navigate to band member page: %s", e)
             return None
     
     async def get_current_band_id(self, account_id: int) -> str:
@@ -185,29 +395,65 @@ class BrowserManager:
                 return match.group(1)
             return None
         except Exception as e:
-            print(f"Failed to get current band ID for account {account_id}: {e}")
+            self._log(account_id).warning("Failed to get current band ID: %s", e)
             return None
 
-    async def capture_screenshot(self, account_id: int, reason: str = "change") -> str:
+    async def capture_screenshot(self, account_id: int, reason: str = "change", force: bool = False) -> str:
         """
         捕获页面截图并保存
-        返回截图文件路径
+        返回截图文件路径；与上一张相同被跳过时返回None（force=True时总是保存）
         """
         try:
             page = await self.get_or_create_page(account_id)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"account_{account_id}_{reason}_{timestamp}.png"
-            filepath = os.path.join("screenshots", filename)
-            
-            await page.screenshot(path=filepath, full_page=True)
-            print(f"Screenshot saved: {filepath}")
+            # 网络模式下页面没有随轮询刷新，截图前先刷新，使截图与新计数一致
+            if account_id in self.stale_dom:
+                async with self.admission.admit(account_id, "reload"):
+                    with POLL_STAGE_SECONDS.time(stage="reload"):
+                        await page.reload()
+                        await page.wait_for_load_state('networkidle', timeout=5000)
+                self.stale_dom.discard(account_id)
+            with POLL_STAGE_SECONDS.time(stage="screenshot"):
+                filepath = await self.screenshots.capture(
+                    page, account_id, reason, force=force,
+                    guard=self.admission.admit(account_id, "screenshot")
+                )
+            if filepath:
+                self._log(account_id).info("Screenshot saved: %s", filepath)
+                self.events.publish(ScreenshotSaved(account_id, filepath))
             return filepath
         except Exception as e:
-            print(f"Failed to capture screenshot for account {account_id}: {e}")
+            FAILURES_TOTAL.inc(type="screenshot")
+            self._log(account_id).warning("Failed to capture screenshot: %s", e)
             return None
 
-    async def check_browser_and_page_status(self, account_id: int) -> dict:
-        """检查浏览器状态和页面位置"""
+    async def on_event(self, event):
+        """事件总线订阅者：计数首次记录或变化时截图"""
+        if not isinstance(event, CountChanged):
+            return
+        # 会话已关闭（如停止时最后一次轮询的事件）时不为截图重新打开浏览器
+        if event.account_id not in self.browsers:
+            return
+        if event.previous:
+            member_change = event.friend_count - event.previous[0]
+            request_change = event.friend_requests - event.previous[1]
+            reason = f"member_{member_change:+d}_request_{request_change:+d}"
+        else:
+            reason = "initial"
+        self.schedule_screenshot(event.account_id, reason)
+
+    def schedule_screenshot(self, account_id: int, reason: str):
+        """后台截图，不阻塞监控循环"""
+        task = asyncio.create_task(self.capture_screenshot(account_id, reason))
+        self.screenshot_tasks[account_id] = task
+        task.add_done_callback(
+            lambda t: self.screenshot_tasks.pop(account_id, None) if self.screenshot_tasks.get(account_id) is t else None
+        )
+
+    async def check_browser_and_page_status(self, account_id: int, timeout: Optional[float] = 3.0) -> dict:
+        """
+        检查浏览器状态和页面位置
+        页面在 timeout 秒内未加载完成视为浏览器已关闭；timeout 为None时不限时，由调用方控制超时
+        """
         try:
             if account_id not in self.browsers:
                 return {'browser_open': False, 'on_member_page': False, 'needs_login': True}
@@ -216,11 +462,11 @@ class BrowserManager:
             
             # 检查浏览器是否可访问
             try:
-                await page.wait_for_load_state('domcontentloaded', timeout=3000)
+                await page.wait_for_load_state('domcontentloaded', timeout=timeout * 1000 if timeout else 0)
                 current_url = page.url
                 
                 # 检查是否在成员页面
-                on_member_page = '/member' in current_url and 'band.us/band/' in current_url
+                on_member_page = is_member_page_url(current_url)
                 
                 return {
                     'browser_open': True,
@@ -228,30 +474,59 @@ class BrowserManager:
                     'needs_login': not on_member_page,
                     'current_url': current_url
                 }
-            except:
+            except Exception:
+                # 不吞掉取消，调用方的超时才能生效
                 return {'browser_open': False, 'on_member_page': False, 'needs_login': True}
                 
         except Exception as e:
-            print(f"Error checking browser status for account {account_id}: {e}")
+            self._log(account_id).warning("Error checking browser status: %s", e)
             return {'browser_open': False, 'on_member_page': False, 'needs_login': True}
 
     async def get_member_count_and_requests(self, account_id: int, refresh_page: bool = False) -> dict:
+        start = time.perf_counter()
+        data = await self._read_counts(account_id, refresh_page)
+        if data.get('browser_closed'):
+            result = 'browser_closed'
+        elif data.get('needs_navigation'):
+            result = 'needs_navigation'
+        else:
+            result = 'ok'
+        POLL_SECONDS.observe(time.perf_counter() - start, result=result)
+        return data
+
+    async def _read_counts(self, account_id: int, refresh_page: bool) -> dict:
+        log = self._log(account_id)
         try:
             page = await self.get_or_create_page(account_id)
             
+            # 网络模式：直接请求成员页面使用的数据接口，失败时回退到刷新+DOM抓取
+            if refresh_page and config.poll_mode == 'network' and self.network_counts.is_ready(account_id):
+                with POLL_STAGE_SECONDS.time(stage="network_fetch"):
+                    data = await self.network_counts.poll(account_id, page)
+                if data:
+                    self.stale_dom.add(account_id)
+                    return data
+                FAILURES_TOTAL.inc(type="network_fetch")
+            
             # 刷新页面（如果需要）
             if refresh_page:
                 try:
-                    await page.reload()
-                    await page.wait_for_load_state('networkidle', timeout=5000)
+                    async with self.admission.admit(account_id, "reload"):
+                        with POLL_STAGE_SECONDS.time(stage="reload"):
+                            await page.reload()
+                            await page.wait_for_load_state('networkidle', timeout=5000)
+                    self.stale_dom.discard(account_id)
                 except Exception as e:
-                    print(f"Failed to refresh page for account {account_id}: {e}")
+                    FAILURES_TOTAL.inc(type="reload")
+                    self._log(account_id).warning("Failed to refresh page: %s", e)
             
             # 检查浏览器是否已关闭
             try:
-                await page.wait_for_load_state('domcontentloaded', timeout=3000)
+                with POLL_STAGE_SECONDS.time(stage="dom_ready"):
+                    await page.wait_for_load_state('domcontentloaded', timeout=3000)
             except Exception as e:
-                print(f"Page not accessible for account {account_id}, browser may be closed: {e}")
+                FAILURES_TOTAL.inc(type="browser_closed")
+                self._log(account_id).warning("Page not accessible, browser may be closed: %s", e)
                 return {'member_count': 0, 'friend_requests': 0, 'browser_closed': True}
             
             result = {
@@ -263,66 +538,87 @@ class BrowserManager:
             
             # 获取Band名称
             try:
-                band_name_element = await page.wait_for_selector('h1.bandName a.uriText', timeout=5000)
+                with POLL_STAGE_SECONDS.time(stage="selector_band_name"):
+                    band_name_element = await page.wait_for_selector('h1.bandName a.uriText', timeout=5000)
                 band_name_text = await band_name_element.text_content()
                 result['band_name'] = band_name_text.strip() if band_name_text else None
-                print(f"Band name: {result['band_name']}")
+                log.debug("Band name: %s", result['band_name'])
             except Exception as e:
-                print(f"Failed to get band name: {e}")
+                FAILURES_TOTAL.inc(type="selector_band_name")
+                log.warning("Failed to get band name: %s", e)
             
             # 等待并获取成员数量元素
             try:
-                member_count_element = await page.wait_for_selector('em[class="count sf_color _memberCount"]')
+                with POLL_STAGE_SECONDS.time(stage="selector_member_count"):
+                    member_count_element = await page.wait_for_selector('em[class="count sf_color _memberCount"]')
                 member_count_text = await member_count_element.text_content()
                 result['member_count'] = int(member_count_text) if member_count_text and member_count_text.isdigit() else 0
-                print(f"Member count: {result['member_count']}")
+                log.debug("Member count: %s", result['member_count'])
             except Exception as e:
-                print(f"Failed to get member count: {e}")
+                FAILURES_TOTAL.inc(type="selector_member_count")
+                log.warning("Failed to get member count: %s", e)
                 # 如果无法获取计数，可能需要重新导航
                 result['needs_navigation'] = True
             
             # 尝试获取好友请求数量
             try:
-                join_status_element = await page.wait_for_selector('a[class="joinStatus"]', timeout=5000)
+                with POLL_STAGE_SECONDS.time(stage="selector_join_status"):
+                    join_status_element = await page.wait_for_selector('a[class="joinStatus"]', timeout=5000)
                 if  join_status_element:
                     join_status_text = await join_status_element.text_content()
                     # 正则提取好友请求数量（格式如：pending/123）
-                    print(f"Join status text: {join_status_text}")
+                    log.debug("Join status text: %s", join_status_text)
                     import re
                     match = re.search(r'.*(\d+)$', join_status_text)
-                    print(f"Match: {match}")
+                    log.debug("Match: %s", match)
                     if match:
                         result['friend_requests'] = int(match.group(1)) if match.group(1).isdigit() else 0
-                        print(f"Friend requests: {result['friend_requests']}")
+                        log.debug("Friend requests: %s", result['friend_requests'])
             except Exception as e:
-                print(f"Failed to get friend requests: {e}")
+                FAILURES_TOTAL.inc(type="selector_join_status")
+                log.warning("Failed to get friend requests: %s", e)
             
             return result
             
         except Exception as e:
-            print(f"Failed to get member count and requests for account {account_id}: {e}")
+            FAILURES_TOTAL.inc(type="poll")
+            log.error("Failed to get member count and requests: %s", e)
             return {'member_count': 0, 'friend_requests': 0, 'browser_closed': True}
 
-    async def start_monitoring(self, account_id: int, callback=None):
+    async def start_monitoring(self, account_id: int):
+        """启动监控循环，轮询结果以事件发布（CountChanged / BandNameChanged / BrowserClosed）"""
         if account_id in self.monitoring_tasks:
             self.monitoring_tasks[account_id].cancel()
         
+        self.scheduler.register(account_id)
+        
         async def monitor_loop():
+            log = self._log(account_id)
             refresh_counter = 0
+            last_band_name = None
             while True:
                 try:
-                    # 每10秒刷新一次页面（每次循环都刷新）
+                    # 按调度器安排的时间轮询（间隔随账户活跃程度自适应）
+                    lag = await self.scheduler.wait_turn(account_id)
+                    MONITOR_LOOP_LAG_SECONDS.observe(lag)
                     refresh_page = True
                     
                     # 获取成员数量和好友请求数量
                     data = await self.get_member_count_and_requests(account_id, refresh_page=refresh_page)
                     
+                    state = self.page_states.get(account_id)
                     if data.get('browser_closed', False):
-                        print(f"Browser closed for account {account_id}, stopping monitoring")
-                        if callback:
-                            await callback(account_id, None, None, datetime.now().isoformat(), browser_closed=True)
+                        if state:
+                            state.mark_closed()
+                        log.info("Browser closed, stopping monitoring")
+                        self.events.publish(BrowserClosed(account_id, datetime.now().isoformat()))
                         break
                     
+                    if state:
+                        state.browser_open = True
+                        state.last_poll_success = datetime.now().isoformat()
+                    LAST_POLL_SUCCESS_AGE.touch(account_id=account_id)
+                    
                     # 检查数量是否发生变化
                     current_counts = {
                         'member_count': data['member_count'],
@@ -330,45 +626,46 @@ class BrowserManager:
                     }
                     
                     previous_counts = self.previous_counts.get(account_id, {})
+                    changed = bool(previous_counts) and current_counts != previous_counts
                     
-                    # 如果是第一次记录或数量发生变化，保存截图
-                    if (not previous_counts or 
-                        current_counts['member_count'] != previous_counts.get('member_count') or 
-                        current_counts['friend_requests'] != previous_counts.get('friend_requests')):
-                        
-                        # 构建变化描述
+                    # 第一次记录或数量发生变化时发布事件（写库、截图等由订阅者处理）
+                    if not previous_counts or changed:
+                        previous = None
                         if previous_counts:
-                            member_change = current_counts['member_count'] - previous_counts.get('member_count', 0)
-                            request_change = current_counts['friend_requests'] - previous_counts.get('friend_requests', 0)
-                            reason = f"member_{member_change:+d}_request_{request_change:+d}"
-                            print(f"Account {account_id}: Count changed - Members: {member_change:+d}, Requests: {request_change:+d}")
+                            previous = (previous_counts['member_count'], previous_counts['friend_requests'])
+                            log.info("Count changed - Members: %+d, Requests: %+d",
+                                     current_counts['member_count'] - previous[0],
+                                     current_counts['friend_requests'] - previous[1])
                         else:
-                            reason = "initial"
-                            print(f"Account {account_id}: Initial count recorded - Members: {current_counts['member_count']}, Requests: {current_counts['friend_requests']}")
+                            log.info("Initial count recorded - Members: %s, Requests: %s", current_counts['member_count'], current_counts['friend_requests'])
                         
-                        # 保存截图
-                        screenshot_path = await self.capture_screenshot(account_id, reason)
+                        self.events.publish(CountChanged(
+                            account_id,
+                            current_counts['member_count'],
+                            current_counts['friend_requests'],
+                            datetime.now().isoformat(),
+                            previous
+                        ))
                         
                         # 更新记录的计数
                         self.previous_counts[account_id] = current_counts.copy()
                     
-                    if callback:
-                        await callback(
-                            account_id, 
-                            data['member_count'], 
-                            data['friend_requests'],
-                            datetime.now().isoformat(),
-                            browser_closed=False,
-                            band_name=data.get('band_name')
-                        )
+                    band_name = data.get('band_name')
+                    if band_name and band_name != last_band_name:
+                        self.events.publish(BandNameChanged(account_id, band_name))
+                        last_band_name = band_name
                     
                     refresh_counter += 1
-                    await asyncio.sleep(10)
+                    # 定期保存会话状态（每30次轮询）
+                    if refresh_counter % 30 == 0:
+                        await self.persist_session(account_id)
+                    self.scheduler.record(account_id, changed)
                 except asyncio.CancelledError:
                     break
                 except Exception as e:
-                    print(f"Monitoring error for account {account_id}: {e}")
-                    await asyncio.sleep(10)
+                    FAILURES_TOTAL.inc(type="monitor_loop")
+                    log.error("Monitoring error: %s", e)
+                    self.scheduler.record(account_id, False)
         
         task = asyncio.create_task(monitor_loop())
         self.monitoring_tasks[account_id] = task
@@ -377,6 +674,7 @@ class BrowserManager:
         if account_id in self.monitoring_tasks:
             self.monitoring_tasks[account_id].cancel()
             del self.monitoring_tasks[account_id]
+        self.scheduler.unregister(account_id)
         
         # 保留计数记录，暂停时不清理，以便恢复监控时继续比较
 
@@ -384,21 +682,43 @@ class BrowserManager:
         if account_id in self.monitoring_tasks:
             self.monitoring_tasks[account_id].cancel()
             del self.monitoring_tasks[account_id]
+        self.scheduler.unregister(account_id)
         
+        task = self.screenshot_tasks.pop(account_id, None)
+        if task:
+            task.cancel()
+        self.screenshots.forget(account_id)
+        
+        await self._close_session(account_id)
+        LAST_POLL_SUCCESS_AGE.remove(account_id=account_id)
+        
+        # 清理计数记录
+        if account_id in self.previous_counts:
+            del self.previous_counts[account_id]
+
+    async def _close_session(self, account_id: int):
+        """关闭账户的浏览器会话（页面、状态表、浏览器上下文）"""
         if account_id in self.pages:
             del self.pages[account_id]
+        self.page_states.pop(account_id, None)
+        self.network_counts.forget(account_id)
+        self.stale_dom.discard(account_id)
             
         if account_id in self.browsers:
-            await self.browsers[account_id].close()
+            if self.pool:
+                await self.pool.release_context(account_id)
+            else:
+                await self.browsers[account_id].close()
             del self.browsers[account_id]
-        
-        # 清理计数记录
-        if account_id in self.previous_counts:
-            del self.previous_counts[account_id]
+        self.session_headless.pop(account_id, None)
 
     async def close_all(self):
-        for account_id in list(self.monitoring_tasks.keys()):
+        for account_id in list(set(self.monitoring_tasks) | set(self.browsers)):
             await self.close_browser(account_id)
         
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+        
         if self.playwright:
             await self.playwright.stop()
\ No newline at end of file
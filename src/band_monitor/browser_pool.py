@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List
+from playwright.async_api import Browser, BrowserContext, Playwright
+
+logger = logging.getLogger(__name__)
+
+STORAGE_STATE_FILE = "storage_state.json"
+
+
+class _BrowserSlot:
+    """一个Chromium进程及其承载的账户"""
+
+    def __init__(self, browser: Browser, headless: bool):
+        self.browser = browser
+        self.headless = headless
+        self.account_ids: set = set()
+
+
+class BrowserPool:
+    """
+    共享浏览器池：N个Chromium进程，每个进程承载多个相互隔离的BrowserContext
+    每个账户的cookies和storage保存在 browser_sessions/account_{id}/storage_state.json
+    """
+
+    def __init__(self, playwright: Playwright, user_data_dir: str, accounts_per_browser: int = 20, launch_args: List[str] = None):
+        self.playwright = playwright
+        self.user_data_dir = user_data_dir
+        self.accounts_per_browser = max(1, accounts_per_browser)
+        self.launch_args = launch_args or []
+        self._slots: List[_BrowserSlot] = []
+        self._contexts: Dict[int, BrowserContext] = {}
+        self._account_slots: Dict[int, _BrowserSlot] = {}
+        self._lock = asyncio.Lock()
+
+    def session_dir(self, account_id: int) -> str:
+        return os.path.join(self.user_data_dir, f"account_{account_id}")
+
+    def storage_state_path(self, account_id: int) -> str:
+        return os.path.join(self.session_dir(account_id), STORAGE_STATE_FILE)
+
+    async def _migrate_persistent_profile(self, account_id: int):
+        """旧版持久化目录（launch_persistent_context）迁移为storage_state文件"""
+        session_dir = self.session_dir(account_id)
+        if os.path.exists(self.storage_state_path(account_id)) or not os.path.isdir(os.path.join(session_dir, "Default")):
+            return
+        try:
+            context = await self.playwright.chromium.launch_persistent_context(
+                user_data_dir=session_dir,
+                headless=True,
+                args=self.launch_args,
+            )
+            try:
+                await context.storage_state(path=self.storage_state_path(account_id))
+                logger.info("Migrated persistent profile to storage state", extra={"account_id": account_id})
+            finally:
+                await context.close()
+        except Exception as e:
+            logger.warning("Failed to migrate persistent profile: %s", e, extra={"account_id": account_id})
+
+    async def _get_slot(self, headless: bool) -> _BrowserSlot:
+        # 崩溃的进程可能还没触发disconnected事件，先清理掉
+        for slot in [slot for slot in self._slots if not slot.browser.is_connected()]:
+            self._drop_slot(slot)
+            await self._close_slot(slot)
+
+        for slot in self._slots:
+            if slot.headless == headless and len(slot.account_ids) < self.accounts_per_browser:
+                return slot
+
+        browser = await self.playwright.chromium.launch(headless=headless, args=self.launch_args)
+        slot = _BrowserSlot(browser, headless)
+        self._slots.append(slot)
+        # Chromium进程崩溃或被杀时移除对应的slot
+        browser.on("disconnected", lambda _: self._drop_slot(slot))
+        logger.info("Launched Chromium process #%d (headless=%s)", len(self._slots), headless)
+        return slot
+
+    async def acquire_context(self, account_id: int, headless: bool = False, **context_options) -> BrowserContext:
+        """为账户分配一个BrowserContext（已存在则直接返回）"""
+        async with self._lock:
+            if account_id in self._contexts:
+                return self._contexts[account_id]
+
+            os.makedirs(self.session_dir(account_id), exist_ok=True)
+            await self._migrate_persistent_profile(account_id)
+
+            state_path = self.storage_state_path(account_id)
+            if os.path.exists(state_path):
+                context_options['storage_state'] = state_path
+
+            slot = await self._get_slot(headless)
+            context = await slot.browser.new_context(**context_options)
+            slot.account_ids.add(account_id)
+            self._contexts[account_id] = context
+            self._account_slots[account_id] = slot
+
+            # 用户手动关闭窗口时同步清理
+            context.on("close", lambda _: self._forget(account_id, context))
+            return context
+
+    def _forget(self, account_id: int, context: BrowserContext):
+        if self._contexts.get(account_id) is not context:
+            return
+        del self._contexts[account_id]
+        slot = self._account_slots.pop(account_id, None)
+        if slot:
+            slot.account_ids.discard(account_id)
+
+    def _drop_slot(self, slot: _BrowserSlot):
+        """移除已断开的进程及其上的账户context"""
+        if slot in self._slots:
+            self._slots.remove(slot)
+            logger.warning("Chromium process disconnected, dropped %d contexts", len(slot.account_ids))
+        for account_id in list(slot.account_ids):
+            self._contexts.pop(account_id, None)
+            self._account_slots.pop(account_id, None)
+        slot.account_ids.clear()
+
+    async def save_state(self, account_id: int) -> bool:
+        """把账户的cookies和storage写回磁盘"""
+        context = self._contexts.get(account_id)
+        if not context:
+            return False
+        try:
+            tmp_path = self.storage_state_path(account_id) + ".tmp"
+            await context.storage_state(path=tmp_path)
+            os.replace(tmp_path, self.storage_state_path(account_id))
+            return True
+        except Exception as e:
+            logger.warning("Failed to save storage state: %s", e, extra={"account_id": account_id})
+            return False
+
+    async def release_context(self, account_id: int):
+        """保存状态并关闭账户的BrowserContext，空闲进程随之退出"""
+        await self.save_state(account_id)
+        async with self._lock:
+            context = self._contexts.get(account_id)
+            slot = self._account_slots.get(account_id)
+            if context:
+                self._forget(account_id, context)
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            if slot and not slot.account_ids:
+                await self._close_slot(slot)
+
+    async def _close_slot(self, slot: _BrowserSlot):
+        if slot in self._slots:
+            self._slots.remove(slot)
+        try:
+            await slot.browser.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        for account_id in list(self._contexts.keys()):
+            await self.release_context(account_id)
+        for slot in list(self._slots):
+            await self._close_slot(slot)
+
+    def stats(self) -> dict:
+        return {
+            "processes": len(self._slots),
+            "contexts": len(self._contexts),
+            "accounts_per_browser": self.accounts_per_browser,
+            "slots": [
+                {"headless": slot.headless, "accounts": sorted(slot.account_ids)}
+                for slot in self._slots
+            ],
+        }
@@ -0,0 +1,28 @@
+from typing import Any, Dict
+
+
+class ChangeTracker:
+    """
+    监控数据的变化检测：按账户记录每个字段最近一次写入数据库的值，
+    回调上报的值与之相同时不再写库或触发后续处理
+    """
+
+    def __init__(self):
+        self._persisted: Dict[int, Dict[str, Any]] = {}
+
+    def is_changed(self, account_id: int, field: str, value: Any) -> bool:
+        """值与上次写入的不同（或尚未记录）时返回True"""
+        fields = self._persisted.get(account_id)
+        return fields is None or field not in fields or fields[field] != value
+
+    def mark(self, account_id: int, field: str, value: Any):
+        """记录已写入数据库的值"""
+        self._persisted.setdefault(account_id, {})[field] = value
+
+    def discard(self, account_id: int, field: str):
+        fields = self._persisted.get(account_id)
+        if fields:
+            fields.pop(field, None)
+
+    def forget(self, account_id: int):
+        self._persisted.pop(account_id, None)
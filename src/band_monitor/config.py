@@ -1,16 +1,128 @@
 import tomli
 import os
+import socket
 
 CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), '..', 'config.toml')
 
 class Config:
     def __init__(self):
         self.enable_sync = True
+        # 浏览器池：多个账户共享Chromium进程
+        self.browser_pool = True
+        self.accounts_per_browser = 20
+        # 轮询方式：network（拦截XHR，失败回退DOM）或 dom（整页刷新+选择器）
+        self.poll_mode = 'network'
+        # 计数写缓冲：刷新间隔（毫秒）和触发立即刷新的待写账户数
+        self.count_flush_interval_ms = 1000
+        self.count_flush_max_pending = 200
+        # 链接刷新时浏览器状态探测的并发数和单次超时（秒）
+        self.probe_concurrency = 10
+        self.probe_timeout = 5.0
+        # Redis连接池大小和熔断期间最多暂存的链接更新数
+        self.redis_max_connections = 10
+        self.redis_max_pending_updates = 100
+        # 链接增量同步之外，每隔多少秒全量替换一次Redis链接集合，修正偏差（0为不定期全量同步）
+        self.link_full_resync_interval = 300.0
+        # 截图：格式（jpeg/webp/png）、质量、只截取的区域选择器、每账户保留数量、目录总大小上限（MB）
+        self.screenshot_format = 'jpeg'
+        self.screenshot_quality = 70
+        self.screenshot_clip_selector = ''
+        self.screenshot_max_per_account = 50
+        self.screenshot_max_total_mb = 200
+        # 计数历史：原始变化点和每分钟汇总的保留天数（每小时汇总永久保留）
+        self.history_raw_retention_days = 30
+        self.history_minute_retention_days = 90
+        # 轮询调度：间隔范围（秒）、初始间隔、无变化时的退避倍数、随机抖动比例、全局每秒轮询上限
+        self.poll_min_interval = 5.0
+        self.poll_max_interval = 60.0
+        self.poll_base_interval = 10.0
+        self.poll_backoff = 1.5
+        self.poll_jitter = 0.2
+        self.max_polls_per_second = 5.0
+        # 同时进行的浏览器重操作容量（导航占3、刷新占2、截图占1）
+        self.browser_op_capacity = 8
+        # 登录后以无头浏览器监控，并拦截图片/媒体/字体/跟踪脚本；需要手动登录时才打开可见浏览器
+        self.headless_monitoring = True
+        self.block_resources = True
+        # 批量启动/暂停/恢复/关闭时同时处理的账户数
+        self.bulk_concurrency = 5
+        # 重启后按批次恢复RUNNING账户的会话：每批数量、批次间隔（秒）
+        self.restore_on_startup = True
+        self.restore_wave_size = 5
+        self.restore_wave_interval = 10.0
+        # 多worker分片（同一台机器上的多个进程共用本地数据库）：worker标识、其他worker访问本worker的地址、租约有效期/心跳间隔（秒）、单worker账户上限（0为不限）
+        self.sharding = False
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.worker_url = ''
+        self.lease_ttl = 30.0
+        self.heartbeat_interval = 10.0
+        self.max_accounts_per_worker = 0
+        # 日志：级别、JSON日志文件（按大小轮转）、重复消息限流（每个窗口内同一消息最多输出的条数）
+        self.log_level = 'INFO'
+        self.log_file = 'logs/band_monitor.log'
+        self.log_max_mb = 10
+        self.log_backup_count = 5
+        self.log_rate_limit_interval = 60.0
+        self.log_rate_limit_burst = 5
+        # 账户列表接口每页默认条数
+        self.accounts_page_size = 200
+        # 进程内账户缓存的最大账户数（0为不缓存；分片模式下其他worker也会写数据库，不使用缓存）
+        self.account_cache_size = 1000
+        # 事件总线中尽力而为的订阅者（截图、仪表盘推送）的队列上限，满时丢弃最早的事件
+        self.event_queue_size = 1000
         try:
             with open(CONFIG_PATH, 'rb') as f:
                 data = tomli.load(f)
                 self.enable_sync = bool(data.get('enableSync', False))
+                self.browser_pool = bool(data.get('browserPool', True))
+                self.accounts_per_browser = int(data.get('accountsPerBrowser', 20))
+                self.poll_mode = str(data.get('pollMode', 'network'))
+                self.count_flush_interval_ms = int(data.get('countFlushIntervalMs', 1000))
+                self.count_flush_max_pending = int(data.get('countFlushMaxPending', 200))
+                self.probe_concurrency = int(data.get('probeConcurrency', 10))
+                self.probe_timeout = float(data.get('probeTimeout', 5.0))
+                self.redis_max_connections = int(data.get('redisMaxConnections', 10))
+                self.redis_max_pending_updates = int(data.get('redisMaxPendingUpdates', 100))
+                self.link_full_resync_interval = float(data.get('linkFullResyncInterval', 300.0))
+                self.screenshot_format = str(data.get('screenshotFormat', 'jpeg'))
+                self.screenshot_quality = int(data.get('screenshotQuality', 70))
+                self.screenshot_clip_selector = str(data.get('screenshotClipSelector', ''))
+                self.screenshot_max_per_account = int(data.get('screenshotMaxPerAccount', 50))
+                self.screenshot_max_total_mb = int(data.get('screenshotMaxTotalMb', 200))
+                self.history_raw_retention_days = int(data.get('historyRawRetentionDays', 30))
+                self.history_minute_retention_days = int(data.get('historyMinuteRetentionDays', 90))
+                self.poll_min_interval = float(data.get('pollMinInterval', 5.0))
+                self.poll_max_interval = float(data.get('pollMaxInterval', 60.0))
+                self.poll_base_interval = float(data.get('pollBaseInterval', 10.0))
+                self.poll_backoff = float(data.get('pollBackoff', 1.5))
+                self.poll_jitter = float(data.get('pollJitter', 0.2))
+                self.max_polls_per_second = float(data.get('maxPollsPerSecond', 5.0))
+                self.browser_op_capacity = int(data.get('browserOpCapacity', 8))
+                self.headless_monitoring = bool(data.get('headlessMonitoring', True))
+                self.block_resources = bool(data.get('blockResources', True))
+                self.bulk_concurrency = int(data.get('bulkConcurrency', 5))
+                self.restore_on_startup = bool(data.get('restoreOnStartup', True))
+                self.restore_wave_size = int(data.get('restoreWaveSize', 5))
+                self.restore_wave_interval = float(data.get('restoreWaveInterval', 10.0))
+                self.sharding = bool(data.get('sharding', False))
+                self.worker_id = str(data.get('workerId') or self.worker_id)
+                self.worker_url = str(data.get('workerUrl', ''))
+                self.lease_ttl = float(data.get('leaseTtl', 30.0))
+                self.heartbeat_interval = float(data.get('heartbeatInterval', 10.0))
+                self.max_accounts_per_worker = int(data.get('maxAccountsPerWorker', 0))
+                self.log_level = str(data.get('logLevel', 'INFO'))
+                self.log_file = str(data.get('logFile', 'logs/band_monitor.log'))
+                self.log_max_mb = int(data.get('logMaxMb', 10))
+                self.log_backup_count = int(data.get('logBackupCount', 5))
+                self.log_rate_limit_interval = float(data.get('logRateLimitInterval', 60.0))
+                self.log_rate_limit_burst = int(data.get('logRateLimitBurst', 5))
+                self.accounts_page_size = int(data.get('accountsPageSize', 200))
+                self.account_cache_size = int(data.get('accountCacheSize', 1000))
+                self.event_queue_size = int(data.get('eventQueueSize', 1000))
         except Exception:
             self.enable_sync = True  # 默认开启
+        # 同一台机器运行多个worker时用环境变量区分
+        self.worker_id = os.getenv('WORKER_ID', self.worker_id)
+        self.worker_url = os.getenv('WORKER_URL', self.worker_url)
 
-config = Config() 
\ No newline at end of file
+config = Config()
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+from .database import Database
+from .change_tracker import ChangeTracker
+
+logger = logging.getLogger(__name__)
+
+
+class CountWriteBuffer:
+    """
+    计数写缓冲：按账户合并每次轮询的计数，只写入真正变化的行，
+    每 flush_interval_ms 毫秒或累计 max_pending 个账户时用一个 executemany 事务批量落库
+    """
+
+    def __init__(self, db: Database, flush_interval_ms: int = 1000, max_pending: int = 200,
+                 tracker: Optional[ChangeTracker] = None):
+        self.db = db
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max(1, max_pending)
+        # account_id -> (friend_count, friend_requests, timestamp)
+        self._pending: Dict[int, Tuple[int, int, str]] = {}
+        # 最近一次写入数据库的 (friend_count, friend_requests)，记录在 "counts" 字段
+        self.tracker = tracker or ChangeTracker()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"submitted": 0, "skipped": 0, "written": 0, "flushes": 0}
+
+    def submit(self, account_id: int, friend_count: int, friend_requests: int, timestamp: str):
+        """登记一次轮询结果（不访问数据库）"""
+        self.stats["submitted"] += 1
+        counts = (friend_count, friend_requests)
+        if account_id not in self._pending and not self.tracker.is_changed(account_id, "counts", counts):
+            self.stats["skipped"] += 1
+            return
+
+        self._pending[account_id] = (friend_count, friend_requests, timestamp)
+        if len(self._pending) >= self.max_pending and self._wakeup:
+            self._wakeup.set()
+
+    def mark_persisted(self, account_id: int, friend_count: int, friend_requests: int):
+        """其他路径（如 set_initial_counts）已直接写库时同步记录"""
+        self._pending.pop(account_id, None)
+        self.tracker.mark(account_id, "counts", (friend_count, friend_requests))
+
+    def forget(self, account_id: int):
+        self._pending.pop(account_id, None)
+        self.tracker.discard(account_id, "counts")
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+
+            # 合并后仍与已落库值相同的账户无需写入
+            rows = [
+                (account_id, friend_count, friend_requests, timestamp)
+                for account_id, (friend_count, friend_requests, timestamp) in batch.items()
+                if self.tracker.is_changed(account_id, "counts", (friend_count, friend_requests))
+            ]
+            if not rows:
+                return 0
+
+            try:
+                await self.db.update_current_counts_many(rows)
+            except Exception as e:
+                logger.error("Failed to flush %d count updates: %s", len(rows), e)
+                # 放回缓冲区，保留期间到达的更新
+                for account_id, friend_count, friend_requests, timestamp in rows:
+                    self._pending.setdefault(account_id, (friend_count, friend_requests, timestamp))
+                return 0
+
+            for account_id, friend_count, friend_requests, _ in rows:
+                self.tracker.mark(account_id, "counts", (friend_count, friend_requests))
+            self.stats["written"] += len(rows)
+            self.stats["flushes"] += 1
+            return len(rows)
+
+    def start(self):
+        if self._task:
+            return
+        self._wakeup = asyncio.Event()
+
+        async def flush_loop():
+            while True:
+                try:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wakeup.clear()
+                    await self.flush()
+                except asyncio.CancelledError:
+                    break
+                except Exception as e:
+                    logger.error("Error in count flush loop: %s", e)
+
+        self._task = asyncio.create_task(flush_loop())
+
+    async def stop(self):
+        """停止定时刷新并把剩余数据写入数据库"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
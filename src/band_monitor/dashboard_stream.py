@@ -0,0 +1,87 @@
+import asyncio
+import json
+import logging
+from typing import Optional, Set
+from .database import Database, LISTING_COLUMNS
+from .events import ScreenshotSaved
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardStream:
+    """
+    仪表盘推送：汇总数据库写入和截图事件，按账户向所有SSE订阅者推送变化
+    短时间内的多次变更合并为一次读取，没有订阅者时不做任何事
+    """
+
+    def __init__(self, db: Database, debounce: float = 0.2, queue_size: int = 256):
+        self.db = db
+        self.debounce = debounce
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._pending_ids: Set[int] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: dict):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # 客户端跟不上，丢弃积压并让它重新拉取完整列表
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+    def notify(self, account_id: int):
+        """数据库变更监听器"""
+        if not self._subscribers:
+            return
+        self._pending_ids.add(account_id)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.debounce)
+        # 读取期间新到达的变更在本任务中继续处理（notify 只在没有任务运行时才创建新任务）
+        while self._pending_ids:
+            account_ids, self._pending_ids = self._pending_ids, set()
+            try:
+                accounts = await self.db.get_accounts(list(account_ids))
+            except Exception as e:
+                logger.error("Failed to load changed accounts for dashboard: %s", e)
+                continue
+
+            found = set()
+            for account in accounts:
+                found.add(account.id)
+                # 与账户列表接口相同的字段（不含密码）
+                self.publish({"type": "account", "account": account.model_dump(include=set(LISTING_COLUMNS))})
+            for account_id in account_ids - found:
+                self.publish({"type": "deleted", "id": account_id})
+
+    async def on_event(self, event):
+        """事件总线订阅者：截图保存后推送给仪表盘"""
+        if isinstance(event, ScreenshotSaved) and self._subscribers:
+            self.publish({"type": "screenshot", "id": event.account_id, "path": event.path})
+
+    async def events(self, queue: asyncio.Queue, keepalive: float = 15.0):
+        """SSE消息生成器"""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            self.unsubscribe(queue)
@@ -1,14 +1,174 @@
 import aiosqlite
 import asyncio
-from typing import List, Optional
-from .models import Account, MonitorStatus
+import logging
+import operator
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from .models import ACCOUNT_FIELDS, Account, AccountRecord, MonitorStatus
+from .metrics import DB_QUERY_SECONDS, FAILURES_TOTAL, instrument_methods
+from .account_cache import AccountCache
 
+logger = logging.getLogger(__name__)
+
+# 计数历史的汇总粒度（秒）
+ROLLUP_STEPS = (60, 3600)
+# 汇总查询最多返回的数据点数（区间长度 / step）
+HISTORY_MAX_POINTS = 10000
+
+# 只记录变化点：与该账户最近一条样本相同则不插入
+_INSERT_SAMPLE_SQL = """
+    INSERT OR REPLACE INTO count_samples (account_id, ts, friend_count, friend_requests)
+    SELECT ?, ?, ?, ?
+    WHERE NOT EXISTS (
+        SELECT 1 FROM (
+            SELECT friend_count, friend_requests FROM count_samples
+            WHERE account_id = ? ORDER BY ts DESC LIMIT 1
+        ) WHERE friend_count = ? AND friend_requests = ?
+    )
+"""
+
+
+# 当前成员数：未记录（NULL或0）时回退到 friend_count，与 _AccountRowMapper 一致
+CURRENT_FRIEND_COUNT_SQL = "COALESCE(NULLIF(current_friend_count, 0), friend_count, 0)"
+
+# 账户列表可返回的字段及其查询表达式（与 _AccountRowMapper 的默认值一致），不含密码
+LISTING_COLUMNS = {
+    "id": "id",
+    "username": "username",
+    "status": "status",
+    "friend_count": "COALESCE(friend_count, 0)",
+    "current_friend_count": CURRENT_FRIEND_COUNT_SQL,
+    "current_friend_requests": "COALESCE(current_friend_requests, 0)",
+    "initial_friend_count": "COALESCE(initial_friend_count, 0)",
+    "initial_friend_requests": "COALESCE(initial_friend_requests, 0)",
+    "last_updated": "last_updated",
+    "band_id": "band_id",
+    "band_name": "band_name",
+    "target_friend_count": "COALESCE(target_friend_count, 10)",
+    "notes": "notes",
+    "link": "link",
+}
+
+
+_STATUSES = {status.value: status for status in MonitorStatus}
+
+
+class _AccountRowMapper:
+    """
+    accounts行到账户字段的映射：按查询结果的列布局预先解析每个字段的列下标，
+    逐行只做一次下标取值和默认值处理（旧版本数据库缺少的列取None）
+    """
+
+    def __init__(self, columns: Tuple[str, ...]):
+        positions = {name: index for index, name in enumerate(columns)}
+        indices = [positions.get(field) for field in ACCOUNT_FIELDS]
+        if None in indices:
+            self._fetch = lambda row: tuple(None if index is None else row[index] for index in indices)
+        else:
+            self._fetch = operator.itemgetter(*indices)
+
+    def values(self, row) -> tuple:
+        """按 ACCOUNT_FIELDS 顺序返回字段值"""
+        (account_id, username, password, status, friend_count, current_friend_count, current_friend_requests,
+         initial_friend_count, initial_friend_requests, last_updated, band_id, band_name, target_friend_count,
+         notes, link) = self._fetch(row)
+        friend_count = friend_count or 0
+        return (
+            account_id, username, password, _STATUSES.get(status) or MonitorStatus(status), friend_count,
+            current_friend_count or friend_count, current_friend_requests or 0,
+            initial_friend_count or 0, initial_friend_requests or 0, last_updated, band_id, band_name,
+            10 if target_friend_count is None else target_friend_count, notes, link,
+        )
+
+    def account(self, row) -> Account:
+        return Account(**dict(zip(ACCOUNT_FIELDS, self.values(row))))
+
+    def record(self, row) -> AccountRecord:
+        return AccountRecord._make(self.values(row))
+
+
+def _to_epoch(timestamp: Optional[str]) -> int:
+    if timestamp:
+        try:
+            return int(datetime.fromisoformat(timestamp).timestamp())
+        except ValueError:
+            pass
+    return int(time.time())
+
+
+def _sample_params(account_id: int, friend_count: int, friend_requests: int, timestamp: Optional[str]) -> tuple:
+    return (account_id, _to_epoch(timestamp), friend_count, friend_requests, account_id, friend_count, friend_requests)
+
+# 按ID读取账户的方法大多由缓存返回，不计入数据库耗时；缓存未命中时的查询在 _load_records 中单独计时
+@instrument_methods(DB_QUERY_SECONDS, failure_type="db",
+                    exclude=("connect", "close", "get_account", "get_account_record", "get_accounts"))
 class Database:
-    def __init__(self, db_path: str = "band_monitor.db"):
+    def __init__(self, db_path: str = "band_monitor.db", cache_size: int = 1000):
         self.db_path = db_path
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._change_listeners: List[Callable[[int], None]] = []
+        # 账户表版本：每次提交账户变更时递增，配合进程启动标识生成列表的ETag
+        self.accounts_version = 0
+        self._instance_tag = format(time.time_ns(), "x")
+        # 按列布局缓存的行映射器，表结构不变时只解析一次
+        self._row_mappers: Dict[Tuple[str, ...], _AccountRowMapper] = {}
+        # 按ID读取账户时的缓存，写事务提交后失效
+        self.account_cache = AccountCache(cache_size)
+
+    async def connect(self) -> aiosqlite.Connection:
+        """返回长连接（首次调用时打开），WAL模式 + 预编译语句缓存"""
+        if self._conn is None:
+            conn = await aiosqlite.connect(self.db_path, cached_statements=256)
+            conn.row_factory = aiosqlite.Row
+            await conn.execute("PRAGMA journal_mode=WAL")
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+        return self._conn
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def add_change_listener(self, listener: Callable[[int], None]):
+        """注册账户变更监听器，写事务提交后以账户ID同步调用"""
+        self._change_listeners.append(listener)
+
+    def _notify_change(self, account_ids: Iterable[int]):
+        account_ids = list(account_ids)
+        if account_ids:
+            self.accounts_version += 1
+        for account_id in account_ids:
+            self.account_cache.invalidate(account_id)
+        for account_id in account_ids:
+            for listener in self._change_listeners:
+                try:
+                    listener(account_id)
+                except Exception as e:
+                    logger.error("Account change listener failed: %s", e, extra={"account_id": account_id})
+
+    @asynccontextmanager
+    async def _transaction(self, *changed_ids: int):
+        """串行化写操作，正常结束时提交并通知变更的账户，异常时回滚"""
+        db = await self.connect()
+        async with self._write_lock:
+            try:
+                yield db
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                # 事务期间的读取可能看到了未提交的数据，使正在进行的读取不写入缓存
+                self.accounts_version += 1
+                for account_id in changed_ids:
+                    self.account_cache.invalidate(account_id)
+                raise
+        self._notify_change(changed_ids)
 
     async def init_db(self):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction() as db:
             # Create table with original schema first
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS accounts (
@@ -49,102 +209,208 @@ class Database:
             # Update existing accounts with default target_friend_count if it's 0 or NULL
             await db.execute("UPDATE accounts SET target_friend_count = 10 WHERE target_friend_count IS NULL OR target_friend_count = 0")
             
-            await db.commit()
+            # 活跃账户查询按状态过滤
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_accounts_status ON accounts(status)")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_accounts_band ON accounts(band_id)")
+            
+            # 计数历史：只保存变化点，按账户+时间聚簇；汇总表由 compact_count_history 生成
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS count_samples (
+                    account_id INTEGER NOT NULL,
+                    ts INTEGER NOT NULL,
+                    friend_count INTEGER NOT NULL,
+                    friend_requests INTEGER NOT NULL,
+                    PRIMARY KEY (account_id, ts)
+                ) WITHOUT ROWID
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS count_rollups (
+                    account_id INTEGER NOT NULL,
+                    step INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    friend_count_min INTEGER NOT NULL,
+                    friend_count_max INTEGER NOT NULL,
+                    friend_count_last INTEGER NOT NULL,
+                    friend_requests_min INTEGER NOT NULL,
+                    friend_requests_max INTEGER NOT NULL,
+                    friend_requests_last INTEGER NOT NULL,
+                    PRIMARY KEY (account_id, step, bucket)
+                ) WITHOUT ROWID
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS count_rollup_state (
+                    step INTEGER PRIMARY KEY,
+                    compacted_until INTEGER NOT NULL
+                )
+            """)
+            
+            # 多worker分片：worker心跳和账户租约（时间为Unix秒）
+            # 只支持同一台机器上的多个worker：WAL模式的SQLite不能放在网络文件系统上供多台机器共用
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    worker_id TEXT PRIMARY KEY,
+                    url TEXT,
+                    heartbeat_at REAL NOT NULL,
+                    host TEXT
+                )
+            """)
+            cursor = await db.execute("PRAGMA table_info(workers)")
+            if 'host' not in [column[1] for column in await cursor.fetchall()]:
+                await db.execute("ALTER TABLE workers ADD COLUMN host TEXT")
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS account_leases (
+                    account_id INTEGER PRIMARY KEY,
+                    worker_id TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_account_leases_worker ON account_leases(worker_id)")
 
     async def add_account(self, username: str, password: str, link: str = None) -> int:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction() as db:
             cursor = await db.execute(
                 "INSERT INTO accounts (username, password, target_friend_count, link) VALUES (?, ?, 10, ?)",
                 (username, password, link)
             )
-            await db.commit()
-            return cursor.lastrowid
+        self._notify_change([cursor.lastrowid])
+        return cursor.lastrowid
+
+    async def add_accounts(self, accounts: List[tuple]) -> List[Optional[int]]:
+        """
+        在一个事务中批量添加账户 [(username, password, link), ...]
+        返回与输入顺序对应的账户ID，用户名已存在的返回None
+        """
+        account_ids = []
+        async with self._transaction() as db:
+            for username, password, link in accounts:
+                cursor = await db.execute(
+                    "INSERT OR IGNORE INTO accounts (username, password, target_friend_count, link) VALUES (?, ?, 10, ?)",
+                    (username, password, link)
+                )
+                account_ids.append(cursor.lastrowid if cursor.rowcount else None)
+        self._notify_change([account_id for account_id in account_ids if account_id is not None])
+        return account_ids
+
+    def _row_mapper(self, cursor) -> _AccountRowMapper:
+        columns = tuple(column[0] for column in cursor.description)
+        mapper = self._row_mappers.get(columns)
+        if mapper is None:
+            mapper = self._row_mappers[columns] = _AccountRowMapper(columns)
+        return mapper
+
+    async def _fetch_accounts(self, sql: str, params: tuple = ()) -> List[Account]:
+        db = await self.connect()
+        cursor = await db.execute(sql, params)
+        rows = await cursor.fetchall()
+        mapper = self._row_mapper(cursor)
+        return [mapper.account(row) for row in rows]
+
+    async def _fetch_records(self, sql: str, params: tuple = ()) -> List[AccountRecord]:
+        db = await self.connect()
+        cursor = await db.execute(sql, params)
+        rows = await cursor.fetchall()
+        mapper = self._row_mapper(cursor)
+        return [mapper.record(row) for row in rows]
+
+    async def _load_records(self, account_ids: List[int]) -> List[AccountRecord]:
+        """
+        从数据库读取并写入缓存；读取与写操作共用连接，有写事务进行中（可能读到未提交的数据）
+        或读取期间有账户提交了变更、事务回滚时不写入，避免缓存旧数据
+        """
+        version = self.accounts_version
+        writing = self._write_lock.locked()
+        placeholders = ",".join("?" * len(account_ids))
+        with DB_QUERY_SECONDS.time(method="load_records"):
+            try:
+                records = await self._fetch_records(
+                    f"SELECT * FROM accounts WHERE id IN ({placeholders})", tuple(account_ids)
+                )
+            except Exception:
+                FAILURES_TOTAL.inc(type="db")
+                raise
+        if not writing and not self._write_lock.locked() and self.accounts_version == version:
+            for record in records:
+                self.account_cache.put(record)
+        return records
 
     async def get_account(self, account_id: int) -> Optional[Account]:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row  # Enable named access
-            cursor = await db.execute(
-                "SELECT * FROM accounts WHERE id = ?", (account_id,)
-            )
-            row = await cursor.fetchone()
-            if row:
-                # Use safe dictionary-style access for sqlite Row
-                def safe_get(row, key, default=None):
-                    try:
-                        return row[key] if key in row.keys() else default
-                    except (KeyError, IndexError):
-                        return default
-                
-                account_data = {
-                    "id": row["id"],
-                    "username": row["username"], 
-                    "password": row["password"],
-                    "status": MonitorStatus(row["status"]),
-                    "last_updated": row["last_updated"],
-                    "friend_count": safe_get(row, "friend_count", 0) or 0,
-                    "band_id": safe_get(row, "band_id"),
-                    "band_name": safe_get(row, "band_name"),
-                    "current_friend_count": safe_get(row, "current_friend_count") or safe_get(row, "friend_count", 0) or 0,
-                    "current_friend_requests": safe_get(row, "current_friend_requests", 0) or 0,
-                    "initial_friend_count": safe_get(row, "initial_friend_count", 0) or 0,
-                    "initial_friend_requests": safe_get(row, "initial_friend_requests", 0) or 0,
-                    "target_friend_count": safe_get(row, "target_friend_count", 10),
-                    "notes": safe_get(row, "notes"),
-                    "link": safe_get(row, "link"),
-                }
-                
-                return Account(**account_data)
-            return None
+        record = await self.get_account_record(account_id)
+        return record.to_account() if record else None
+
+    async def get_account_record(self, account_id: int) -> Optional[AccountRecord]:
+        """与 get_account 相同，返回不做校验的 AccountRecord（内部使用）"""
+        record = self.account_cache.get(account_id)
+        if record is None:
+            records = await self._load_records([account_id])
+            record = records[0] if records else None
+        return record
+
+    async def get_accounts(self, account_ids: List[int]) -> List[Account]:
+        records = {}
+        missing = []
+        for account_id in dict.fromkeys(account_ids):
+            record = self.account_cache.get(account_id)
+            if record is None:
+                missing.append(account_id)
+            else:
+                records[account_id] = record
+        if missing:
+            for record in await self._load_records(missing):
+                records[record.id] = record
+        return [record.to_account() for record in records.values()]
 
     async def get_all_accounts(self) -> List[Account]:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row  # Enable named access
-            cursor = await db.execute("SELECT * FROM accounts")
-            rows = await cursor.fetchall()
-            accounts = []
-            for row in rows:
-                # Use safe dictionary-style access for sqlite Row
-                def safe_get(row, key, default=None):
-                    try:
-                        return row[key] if key in row.keys() else default
-                    except (KeyError, IndexError):
-                        return default
-                
-                account_data = {
-                    "id": row["id"],
-                    "username": row["username"], 
-                    "password": row["password"],
-                    "status": MonitorStatus(row["status"]),
-                    "last_updated": row["last_updated"],
-                    "friend_count": safe_get(row, "friend_count", 0) or 0,
-                    "band_id": safe_get(row, "band_id"),
-                    "band_name": safe_get(row, "band_name"),
-                    "current_friend_count": safe_get(row, "current_friend_count") or safe_get(row, "friend_count", 0) or 0,
-                    "current_friend_requests": safe_get(row, "current_friend_requests", 0) or 0,
-                    "initial_friend_count": safe_get(row, "initial_friend_count", 0) or 0,
-                    "initial_friend_requests": safe_get(row, "initial_friend_requests", 0) or 0,
-                    "target_friend_count": safe_get(row, "target_friend_count", 10),
-                    "notes": safe_get(row, "notes"),
-                    "link": safe_get(row, "link"),
-                }
-                
-                accounts.append(Account(**account_data))
-            return accounts
+        return await self._fetch_accounts("SELECT * FROM accounts")
+
+    async def get_accounts_version(self, shared: bool = False) -> str:
+        """
+        账户表的版本标识，未变化时不访问数据库
+        shared=True（多个进程共用数据库）时加上SQLite的data_version，以感知其他连接提交的变更
+        """
+        version = f"{self._instance_tag}-{self.accounts_version}"
+        if shared:
+            db = await self.connect()
+            cursor = await db.execute("PRAGMA data_version")
+            row = await cursor.fetchone()
+            version += f"-{row[0]}"
+        return version
+
+    async def list_accounts(self, fields: List[str], status: Optional[str] = None, band_id: Optional[str] = None,
+                            after_id: int = 0, limit: int = 200) -> Tuple[List[dict], Optional[int]]:
+        """
+        按ID游标分页列出账户，只查询 fields 中的列（见 LISTING_COLUMNS）
+        返回 (账户字典列表, 下一页的游标)，没有下一页时游标为None
+        """
+        columns = ", ".join(f"{LISTING_COLUMNS[field]} AS {field}" for field in fields)
+        conditions, params = ["id > ?"], [after_id]
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if band_id:
+            conditions.append("band_id = ?")
+            params.append(band_id)
+        db = await self.connect()
+        cursor = await db.execute(
+            f"SELECT id, {columns} FROM accounts WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?",
+            params + [limit + 1]
+        )
+        rows = await cursor.fetchall()
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [dict(zip(fields, row[1:])) for row in rows[:limit]], next_cursor
 
     async def update_account_status(self, account_id: int, status: MonitorStatus):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction(account_id) as db:
             await db.execute(
                 "UPDATE accounts SET status = ? WHERE id = ?",
                 (status.value, account_id)
             )
-            await db.commit()
 
     async def update_friend_count(self, account_id: int, count: int, timestamp: str):
         """向后兼容的方法"""
         await self.update_current_counts(account_id, count, None, timestamp)
     
     async def update_current_counts(self, account_id: int, friend_count: int, friend_requests: int, timestamp: str):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction(account_id) as db:
             # 先获取初始计数来计算增量
             cursor = await db.execute(
                 "SELECT initial_friend_count, initial_friend_requests FROM accounts WHERE id = ?", 
@@ -166,6 +432,7 @@ class Database:
                         "UPDATE accounts SET current_friend_count = ?, current_friend_requests = ?, friend_count = ?, last_updated = ? WHERE id = ?",
                         (friend_count, friend_requests, increment, timestamp, account_id)
                     )
+                    await db.execute(_INSERT_SAMPLE_SQL, _sample_params(account_id, friend_count, friend_requests, timestamp))
                 else:
                     # 如果只有好友数，假设请求数为0来计算增量
                     current_total = friend_count
@@ -175,8 +442,26 @@ class Database:
                         "UPDATE accounts SET current_friend_count = ?, friend_count = ?, last_updated = ? WHERE id = ?",
                         (friend_count, increment, timestamp, account_id)
                     )
-            
-            await db.commit()
+    
+    async def update_current_counts_many(self, updates: List[tuple]):
+        """
+        批量更新当前计数，单个事务
+        updates: [(account_id, friend_count, friend_requests, timestamp), ...]
+        """
+        async with self._transaction(*(update[0] for update in updates)) as db:
+            await db.executemany(
+                "UPDATE accounts SET current_friend_count = ?, current_friend_requests = ?, "
+                "friend_count = MAX(0, ? + ? - COALESCE(initial_friend_count, 0) - COALESCE(initial_friend_requests, 0)), "
+                "last_updated = ? WHERE id = ?",
+                [
+                    (friend_count, friend_requests, friend_count, friend_requests, timestamp, account_id)
+                    for account_id, friend_count, friend_requests, timestamp in updates
+                ]
+            )
+            await db.executemany(
+                _INSERT_SAMPLE_SQL,
+                [_sample_params(*update) for update in updates]
+            )
     
     async def set_initial_counts(self, account_id: int, friend_count: int, friend_requests: int):
         """
@@ -184,7 +469,7 @@ class Database:
         - 如果初始值未设置（为0或NULL），则设置初始值，并将friend_count重置为0
         - 如果初始值已设置，则只更新当前值，并重新计算friend_count增量
         """
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction(account_id) as db:
             # 检查是否已有初始值
             cursor = await db.execute(
                 "SELECT initial_friend_count, initial_friend_requests FROM accounts WHERE id = ?",
@@ -199,7 +484,8 @@ class Database:
                 
                 # 只有初始值未设置时才设置初始值
                 if initial_total == 0:
-                    print(f"Account {account_id}: Setting initial counts - friends: {friend_count}, requests: {friend_requests}")
+                    logger.info("Setting initial counts - friends: %s, requests: %s", friend_count, friend_requests,
+                                extra={"account_id": account_id})
                     await db.execute(
                         "UPDATE accounts SET initial_friend_count = ?, initial_friend_requests = ?, current_friend_count = ?, current_friend_requests = ?, friend_count = 0 WHERE id = ?",
                         (friend_count, friend_requests, friend_count, friend_requests, account_id)
@@ -208,74 +494,300 @@ class Database:
                     # 如果已有初始值，只更新当前值并重新计算增量
                     current_total = friend_count + friend_requests
                     increment = max(0, current_total - initial_total)
-                    print(f"Account {account_id}: Updating current counts - current: {current_total}, initial: {initial_total}, increment: {increment}")
+                    logger.debug("Updating current counts - current: %s, initial: %s, increment: %s", current_total, initial_total, increment,
+                                 extra={"account_id": account_id})
                     
                     await db.execute(
                         "UPDATE accounts SET current_friend_count = ?, current_friend_requests = ?, friend_count = ? WHERE id = ?",
                         (friend_count, friend_requests, increment, account_id)
                     )
-            
-            await db.commit()
+                
+                await db.execute(_INSERT_SAMPLE_SQL, _sample_params(account_id, friend_count, friend_requests, None))
 
     async def update_band_id(self, account_id: int, band_id: str):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction(account_id) as db:
             await db.execute(
                 "UPDATE accounts SET band_id = ? WHERE id = ?",
                 (band_id, account_id)
             )
-            await db.commit()
     
     async def update_band_info(self, account_id: int, band_id: str, band_name: str):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction(account_id) as db:
             await db.execute(
                 "UPDATE accounts SET band_id = ?, band_name = ? WHERE id = ?",
                 (band_id, band_name, account_id)
             )
-            await db.commit()
     
     async def update_target_and_notes(self, account_id: int, target_friend_count: int, notes: str = None):
-        async with aiosqlite.connect(self.db_path) as db:
-            print(f"Database update: account_id={account_id}, target={target_friend_count}, notes='{notes}'")
-            await db.execute(
+        async with self._transaction(account_id) as db:
+            cursor = await db.execute(
                 "UPDATE accounts SET target_friend_count = ?, notes = ? WHERE id = ?",
                 (target_friend_count, notes, account_id)
             )
-            await db.commit()
-            
-            # 验证更新结果
-            cursor = await db.execute(
-                "SELECT target_friend_count, notes FROM accounts WHERE id = ?",
-                (account_id,)
-            )
-            row = await cursor.fetchone()
-            if row:
-                print(f"After update: target={row[0]}, notes='{row[1]}'")
+            if cursor.rowcount:
+                logger.debug("Updated target=%s, notes=%r", target_friend_count, notes, extra={"account_id": account_id})
             else:
-                print(f"Account {account_id} not found after update")
+                logger.warning("Account not found when updating target and notes", extra={"account_id": account_id})
     
     async def update_link(self, account_id: int, link: str):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction(account_id) as db:
             await db.execute(
                 "UPDATE accounts SET link = ? WHERE id = ?",
                 (link, account_id)
             )
-            await db.commit()
 
-    async def get_active_accounts(self) -> List[Account]:
-        """获取活跃账户 - 正在运行且未达到目标friend_count"""
-        accounts = await self.get_all_accounts()
-        active_accounts = []
+    async def get_active_accounts(self) -> List[AccountRecord]:
+        """获取活跃账户 - 正在运行且未达到目标friend_count（走status索引，只扫描运行中的账户）"""
+        columns = LISTING_COLUMNS
+        return await self._fetch_records(
+            f"""
+            SELECT * FROM accounts
+            WHERE status = ?
+              AND {columns['current_friend_count']} + {columns['current_friend_requests']}
+                  < {columns['initial_friend_count']} + {columns['initial_friend_requests']} + {columns['target_friend_count']}
+            """,
+            (MonitorStatus.RUNNING.value,)
+        )
+
+    async def compact_count_history(self, raw_retention_days: int = 30, minute_retention_days: int = 90):
+        """
+        把上次汇总之后的变化点汇总到每分钟/每小时桶（当前未结束的桶下次会重新计算），
+        并清理超过保留期的原始变化点和分钟汇总
+        """
+        now = int(time.time())
+        async with self._transaction() as db:
+            for step in ROLLUP_STEPS:
+                cursor = await db.execute("SELECT compacted_until FROM count_rollup_state WHERE step = ?", (step,))
+                row = await cursor.fetchone()
+                start = (row[0] // step) * step if row else 0
+                await db.execute("""
+                    INSERT OR REPLACE INTO count_rollups (
+                        account_id, step, bucket,
+                        friend_count_min, friend_count_max, friend_count_last,
+                        friend_requests_min, friend_requests_max, friend_requests_last
+                    )
+                    SELECT account_id, ?, bucket,
+                           MIN(friend_count), MAX(friend_count), MAX(CASE WHEN rn = 1 THEN friend_count END),
+                           MIN(friend_requests), MAX(friend_requests), MAX(CASE WHEN rn = 1 THEN friend_requests END)
+                    FROM (
+                        SELECT account_id, friend_count, friend_requests, (ts / ?) * ? AS bucket,
+                               ROW_NUMBER() OVER (PARTITION BY account_id, ts / ? ORDER BY ts DESC) AS rn
+                        FROM count_samples
+                        WHERE ts >= ? AND ts <= ?
+                    )
+                    GROUP BY account_id, bucket
+                """, (step, step, step, step, start, now))
+                await db.execute(
+                    "INSERT OR REPLACE INTO count_rollup_state (step, compacted_until) VALUES (?, ?)",
+                    (step, now)
+                )
+            
+            # 原始变化点和分钟汇总只保留一段时间，每个账户保留最后一条变化点作为当前状态
+            await db.execute("""
+                DELETE FROM count_samples
+                WHERE ts < ? AND ts < (SELECT MAX(ts) FROM count_samples AS latest WHERE latest.account_id = count_samples.account_id)
+            """, (now - raw_retention_days * 86400,))
+            await db.execute(
+                "DELETE FROM count_rollups WHERE step = ? AND bucket < ?",
+                (ROLLUP_STEPS[0], now - minute_retention_days * 86400)
+            )
+
+    async def get_count_history(self, account_id: int, start: int, end: int, step: int) -> dict:
+        """
+        查询 [start, end] 区间的计数历史
+        step < 60 返回原始变化点（含区间开始前的最后状态），否则从对应粒度的汇总表
+        （加上最近一次汇总之后的原始变化点）按 step 重新分桶，从第一个已知状态起每个桶都有数据点
+        """
+        db = await self.connect()
+        if step < ROLLUP_STEPS[0]:
+            cursor = await db.execute("""
+                SELECT ts, friend_count, friend_requests FROM (
+                    SELECT * FROM (
+                        SELECT ts, friend_count, friend_requests FROM count_samples
+                        WHERE account_id = ? AND ts < ? ORDER BY ts DESC LIMIT 1
+                    )
+                    UNION ALL
+                    SELECT ts, friend_count, friend_requests FROM count_samples
+                    WHERE account_id = ? AND ts >= ? AND ts <= ?
+                ) ORDER BY ts
+            """, (account_id, start, account_id, start, end))
+            rows = await cursor.fetchall()
+            return {
+                "source": "samples",
+                "points": [
+                    {"t": row[0], "friend_count": row[1], "friend_requests": row[2]}
+                    for row in rows
+                ],
+            }
+        
+        source_step = ROLLUP_STEPS[1] if step >= ROLLUP_STEPS[1] else ROLLUP_STEPS[0]
+        step = max(step, source_step)
+        first_bucket = (start // step) * step
+        
+        # 最近一次汇总所在的桶可能不完整，从该桶开始改用原始变化点（包含尚未汇总的变化）
+        cursor = await db.execute("SELECT compacted_until FROM count_rollup_state WHERE step = ?", (source_step,))
+        row = await cursor.fetchone()
+        raw_from = max((row[0] // source_step) * source_step if row else 0, first_bucket)
+        
+        # 区间开始前的最后状态：原始变化点或汇总（原始数据过了保留期时）中较新的一个
+        cursor = await db.execute(
+            "SELECT ts, friend_count, friend_requests FROM count_samples WHERE account_id = ? AND ts < ? ORDER BY ts DESC LIMIT 1",
+            (account_id, first_bucket)
+        )
+        seed = await cursor.fetchone()
+        cursor = await db.execute("""
+            SELECT bucket, friend_count_last, friend_requests_last FROM count_rollups
+            WHERE account_id = ? AND step = ? AND bucket < ? ORDER BY bucket DESC LIMIT 1
+        """, (account_id, source_step, first_bucket))
+        rollup_seed = await cursor.fetchone()
+        if rollup_seed and (seed is None or rollup_seed[0] > seed[0]):
+            seed = rollup_seed
         
-        for account in accounts:
-            # 检查是否正在运行
-            if account.status == MonitorStatus.RUNNING:
-                # 检查是否未达到目标
-                if account.current_total < account.initial_total + account.target_friend_count:
-                    active_accounts.append(account)
+        # (时间, 成员数最小/最大/最后, 申请数最小/最大/最后)，按时间排序
+        cursor = await db.execute("""
+            SELECT bucket, friend_count_min, friend_count_max, friend_count_last,
+                   friend_requests_min, friend_requests_max, friend_requests_last
+            FROM count_rollups
+            WHERE account_id = ? AND step = ? AND bucket >= ? AND bucket < ? AND bucket <= ?
+            ORDER BY bucket
+        """, (account_id, source_step, first_bucket, raw_from, end))
+        entries = list(await cursor.fetchall())
+        cursor = await db.execute(
+            "SELECT ts, friend_count, friend_requests FROM count_samples WHERE account_id = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+            (account_id, raw_from, end)
+        )
+        entries.extend((ts, fc, fc, fc, fr, fr, fr) for ts, fc, fr in await cursor.fetchall())
         
-        return active_accounts
+        # 按 step 重新分桶；没有变化的桶沿用上一个桶的最后状态，且该状态计入本桶的最小/最大值
+        points = []
+        current = (seed[1], seed[2]) if seed else None
+        index = 0
+        bucket = first_bucket
+        while bucket <= end:
+            if current is None:
+                # 第一个已知状态之前没有数据点
+                if index == len(entries):
+                    break
+                bucket = (entries[index][0] // step) * step
+            values = [current[0], current[0], current[1], current[1]] if current else None
+            while index < len(entries) and entries[index][0] < bucket + step:
+                _, fc_min, fc_max, fc_last, fr_min, fr_max, fr_last = entries[index]
+                if values is None:
+                    values = [fc_min, fc_max, fr_min, fr_max]
+                else:
+                    values = [min(values[0], fc_min), max(values[1], fc_max), min(values[2], fr_min), max(values[3], fr_max)]
+                current = (fc_last, fr_last)
+                index += 1
+            points.append({
+                "t": bucket,
+                "friend_count": current[0], "friend_count_min": values[0], "friend_count_max": values[1],
+                "friend_requests": current[1], "friend_requests_min": values[2], "friend_requests_max": values[3],
+            })
+            bucket += step
+        return {"source": f"rollup_{source_step}s", "points": points}
 
     async def delete_account(self, account_id: int):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction(account_id) as db:
             await db.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
-            await db.commit()
\ No newline at end of file
+            await db.execute("DELETE FROM count_samples WHERE account_id = ?", (account_id,))
+            await db.execute("DELETE FROM count_rollups WHERE account_id = ?", (account_id,))
+            await db.execute("DELETE FROM account_leases WHERE account_id = ?", (account_id,))
+
+    async def heartbeat_worker(self, worker_id: str, url: Optional[str], lease_ttl: float,
+                               host: Optional[str] = None) -> Set[int]:
+        """记录worker心跳并续约它持有的全部租约，返回仍由它持有的账户ID"""
+        now = time.time()
+        async with self._transaction() as db:
+            await db.execute(
+                """
+                INSERT INTO workers (worker_id, url, heartbeat_at, host) VALUES (?, ?, ?, ?)
+                ON CONFLICT(worker_id) DO UPDATE SET
+                    url = excluded.url, heartbeat_at = excluded.heartbeat_at, host = excluded.host
+                """,
+                (worker_id, url, now, host)
+            )
+            await db.execute(
+                "UPDATE account_leases SET expires_at = ? WHERE worker_id = ?",
+                (now + lease_ttl, worker_id)
+            )
+            cursor = await db.execute("SELECT account_id FROM account_leases WHERE worker_id = ?", (worker_id,))
+            rows = await cursor.fetchall()
+        return {row[0] for row in rows}
+
+    async def get_live_worker_hosts(self, lease_ttl: float) -> Set[str]:
+        """最近 lease_ttl 秒内有心跳的worker所在的主机"""
+        db = await self.connect()
+        cursor = await db.execute(
+            "SELECT DISTINCT host FROM workers WHERE heartbeat_at >= ? AND host IS NOT NULL",
+            (time.time() - lease_ttl,)
+        )
+        return {row[0] for row in await cursor.fetchall()}
+
+    async def claim_lease(self, account_id: int, worker_id: str, lease_ttl: float) -> bool:
+        """认领账户租约：无人持有、已过期或本来就属于该worker时成功"""
+        now = time.time()
+        async with self._transaction() as db:
+            cursor = await db.execute(
+                """
+                INSERT INTO account_leases (account_id, worker_id, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(account_id) DO UPDATE SET worker_id = excluded.worker_id, expires_at = excluded.expires_at
+                WHERE account_leases.worker_id = excluded.worker_id OR account_leases.expires_at < ?
+                """,
+                (account_id, worker_id, now + lease_ttl, now)
+            )
+        return cursor.rowcount > 0
+
+    async def release_lease(self, account_id: int, worker_id: str):
+        async with self._transaction() as db:
+            await db.execute(
+                "DELETE FROM account_leases WHERE account_id = ? AND worker_id = ?",
+                (account_id, worker_id)
+            )
+
+    async def release_worker(self, worker_id: str):
+        """worker退出：释放全部租约，其他worker可立即接管"""
+        async with self._transaction() as db:
+            await db.execute("DELETE FROM account_leases WHERE worker_id = ?", (worker_id,))
+            await db.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    async def get_lease_owner(self, account_id: int) -> Optional[dict]:
+        """返回持有该账户有效租约的worker（worker_id, url），没有时返回None"""
+        db = await self.connect()
+        cursor = await db.execute(
+            """
+            SELECT l.worker_id, w.url FROM account_leases l
+            LEFT JOIN workers w ON w.worker_id = l.worker_id
+            WHERE l.account_id = ? AND l.expires_at >= ?
+            """,
+            (account_id, time.time())
+        )
+        row = await cursor.fetchone()
+        return {"worker_id": row[0], "url": row[1]} if row else None
+
+    async def get_unleased_running_accounts(self, limit: int) -> List[Account]:
+        """状态为RUNNING但没有有效租约的账户（worker失联后等待接管）"""
+        return await self._fetch_accounts(
+            """
+            SELECT a.* FROM accounts a
+            LEFT JOIN account_leases l ON l.account_id = a.id AND l.expires_at >= ?
+            WHERE a.status = ? AND l.account_id IS NULL
+            ORDER BY a.id
+            LIMIT ?
+            """,
+            (time.time(), MonitorStatus.RUNNING.value, limit)
+        )
+
+    async def get_workers(self) -> List[dict]:
+        db = await self.connect()
+        cursor = await db.execute(
+            """
+            SELECT w.worker_id, w.url, w.heartbeat_at, COUNT(l.account_id)
+            FROM workers w LEFT JOIN account_leases l ON l.worker_id = w.worker_id
+            GROUP BY w.worker_id ORDER BY w.worker_id
+            """
+        )
+        rows = await cursor.fetchall()
+        return [
+            {"worker_id": row[0], "url": row[1], "heartbeat_at": row[2], "accounts": row[3]}
+            for row in rows
+        ]
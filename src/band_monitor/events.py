@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from .models import MonitorStatus
+from .metrics import EVENTS_DROPPED
+
+logger = logging.getLogger(__name__)
+
+
+class CountChanged(NamedTuple):
+    """轮询到的计数与上次不同（previous为None表示本次监控的第一次记录）"""
+    account_id: int
+    friend_count: int
+    friend_requests: int
+    timestamp: str
+    previous: Optional[Tuple[int, int]] = None
+
+
+class BandNameChanged(NamedTuple):
+    account_id: int
+    band_name: str
+
+
+class StatusChanged(NamedTuple):
+    """账户状态已写入数据库"""
+    account_id: int
+    status: MonitorStatus
+
+
+class BrowserClosed(NamedTuple):
+    """监控中发现浏览器已关闭，监控循环已退出"""
+    account_id: int
+    timestamp: str
+
+
+class PageNavigated(NamedTuple):
+    """页面跳转到了新的URL"""
+    account_id: int
+    url: str
+    on_member_page: bool
+    was_on_member_page: bool
+
+
+class TargetReached(NamedTuple):
+    """计数增量达到目标（计数已写入数据库）"""
+    account_id: int
+
+
+class AccountUpdated(NamedTuple):
+    """通过接口修改了账户（field: target / link / deleted）"""
+    account_id: int
+    field: str
+
+
+class LeaseLost(NamedTuple):
+    """分片模式下账户租约被其他worker接管，本地会话已关闭（账户状态不变）"""
+    account_id: int
+
+
+class ScreenshotSaved(NamedTuple):
+    account_id: int
+    path: str
+
+
+Handler = Callable[[NamedTuple], Awaitable[None]]
+
+
+class _Subscriber:
+    def __init__(self, name: str, handler: Handler, event_types: Optional[tuple], queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.event_types = event_types
+        self.queue_size = queue_size
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: Optional[asyncio.Task] = None
+        self.handled = 0
+        self.dropped = 0
+
+
+class EventBus:
+    """
+    监控事件总线：publish 同步投递到各订阅者自己的队列，每个订阅者由单独的任务按顺序处理，
+    处理慢的订阅者不会阻塞监控循环和其他订阅者
+    - 默认队列有上限，满时丢弃该订阅者最早的事件（截图、仪表盘推送等尽力而为的订阅者）
+    - lossless=True 的订阅者使用无上限队列，不丢事件（写库、状态/链接同步）
+    """
+
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._subscribers: List[_Subscriber] = []
+        self._running = False
+
+    def subscribe(self, name: str, handler: Handler, event_types: Sequence[type] = (),
+                  queue_size: Optional[int] = None, lossless: bool = False):
+        """订阅事件，event_types 为空时接收全部事件；在 start 之前或之后调用均可"""
+        queue_size = 0 if lossless else (queue_size or self.queue_size)
+        subscriber = _Subscriber(name, handler, tuple(event_types) or None, queue_size)
+        self._subscribers.append(subscriber)
+        if self._running:
+            subscriber.task = asyncio.create_task(self._consume(subscriber))
+
+    def publish(self, event: NamedTuple):
+        for subscriber in self._subscribers:
+            if subscriber.event_types and not isinstance(event, subscriber.event_types):
+                continue
+            if subscriber.queue.full():
+                subscriber.queue.get_nowait()
+                subscriber.queue.task_done()
+                subscriber.dropped += 1
+                EVENTS_DROPPED.inc(subscriber=subscriber.name)
+                logger.warning("Event queue of subscriber %s is full, dropping oldest event", subscriber.name)
+            subscriber.queue.put_nowait(event)
+
+    async def _consume(self, subscriber: _Subscriber):
+        while True:
+            event = await subscriber.queue.get()
+            try:
+                await subscriber.handler(event)
+                subscriber.handled += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Event subscriber %s failed on %s: %s", subscriber.name, type(event).__name__, e)
+            finally:
+                subscriber.queue.task_done()
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for subscriber in self._subscribers:
+            subscriber.task = asyncio.create_task(self._consume(subscriber))
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """处理完队列中剩余的事件（最多等待 drain_timeout 秒）后停止"""
+        if not self._running:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(subscriber.queue.join() for subscriber in self._subscribers)),
+                timeout=drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Event subscribers did not drain within %.1fs", drain_timeout)
+        self._running = False
+        for subscriber in self._subscribers:
+            if subscriber.task:
+                subscriber.task.cancel()
+                try:
+                    await subscriber.task
+                except asyncio.CancelledError:
+                    pass
+                subscriber.task = None
+            # 丢弃未处理完的事件，队列与当前事件循环解绑，以便再次 start
+            subscriber.queue = asyncio.Queue(maxsize=subscriber.queue_size)
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            subscriber.name: {
+                "queued": subscriber.queue.qsize(),
+                "handled": subscriber.handled,
+                "dropped": subscriber.dropped,
+            }
+            for subscriber in self._subscribers
+        }
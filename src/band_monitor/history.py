@@ -0,0 +1,46 @@
+import asyncio
+import logging
+from typing import Optional
+from .database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryCompactor:
+    """定期把计数变化点汇总为每分钟/每小时数据，并清理过期的原始数据"""
+
+    def __init__(self, db: Database, interval: int = 60, raw_retention_days: int = 30, minute_retention_days: int = 90):
+        self.db = db
+        self.interval = interval
+        self.raw_retention_days = raw_retention_days
+        self.minute_retention_days = minute_retention_days
+        self._task: Optional[asyncio.Task] = None
+
+    async def compact(self):
+        await self.db.compact_count_history(self.raw_retention_days, self.minute_retention_days)
+
+    def start(self):
+        if self._task:
+            return
+
+        async def compact_loop():
+            while True:
+                try:
+                    await self.compact()
+                    await asyncio.sleep(self.interval)
+                except asyncio.CancelledError:
+                    break
+                except Exception as e:
+                    logger.error("Error compacting count history: %s", e)
+                    await asyncio.sleep(self.interval)
+
+        self._task = asyncio.create_task(compact_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,10 +1,14 @@
 import asyncio
-from typing import List, Set
+import time
+from typing import Callable, Dict, List, Optional, Set, Union
 from .database import Database
 from .browser_manager import BrowserManager
 from .redis_client import redis_client
+from .models import Account, AccountRecord
+from .events import AccountUpdated, LeaseLost, PageNavigated, StatusChanged, TargetReached
 import logging
 from .config import config
+from .metrics import FAILURES_TOTAL, LINK_REFRESH_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -15,27 +19,93 @@ class LinkManager:
         self.update_task = None
         self.is_running = False
         self._cached_links: Set[str] = set()
+        self._links_synced = False  # 首次同步使用全量替换，清掉重启前残留的链接
+        # 定期全量替换，修正增量同步与Redis实际内容之间的偏差
+        self._full_resync_interval = config.link_full_resync_interval
+        self._last_full_sync = 0.0
         self._update_frequency = 30  # 默认30秒
         self._min_frequency = 5      # 最小5秒
+        # 浏览器状态探测：并发上限、单次超时，以及超时时沿用的上次结果
+        self._probe_concurrency = config.probe_concurrency
+        self._probe_timeout = config.probe_timeout
+        self._last_page_state: Dict[int, bool] = {}
+        # 重启恢复期间保留的上次链接（账户重新确认前仍视为活跃）
+        self._held_links: Dict[int, str] = {}
+        # 分片模式：只统计本worker持有的账户，各worker的链接在Redis中合并
+        self.owns: Optional[Callable[[int], bool]] = None
+        # 事件触发的更新：等待 _coalesce_delay 秒合并同一批事件，只更新一次
+        self._coalesce_delay = 0.5
+        self._update_requested = False
+        self._requested_task: Optional[asyncio.Task] = None
+    
+    @staticmethod
+    def _account_link(account: Union[Account, AccountRecord]) -> Optional[str]:
+        # 优先使用保存的link，如果没有则使用band_id生成
+        if account.link:
+            return account.link
+        if account.band_id:
+            # 兼容原有逻辑，使用band_id生成链接
+            return f"https://band.us/band/{account.band_id}/member"
+        return None
+    
+    async def hold_links(self, accounts: List[Account]):
+        """保留这些账户当前在Redis中的链接，直到 release_held_link 被调用"""
+        previous_links = await redis_client.get_active_links()
+        for account in accounts:
+            link = self._account_link(account)
+            if link and link in previous_links:
+                self._held_links[account.id] = link
+        logger.info("Holding %d Redis links while sessions are restored", len(self._held_links))
+    
+    def release_held_link(self, account_id: int):
+        self._held_links.pop(account_id, None)
+    
+    async def _probe_on_member_page(self, account_id: int, semaphore: asyncio.Semaphore) -> Optional[bool]:
+        """检查账户是否在成员页面，超时返回None（未知）"""
+        # 优先读取浏览器管理器维护的状态表，不访问浏览器
+        state = self.browser_manager.get_page_state(account_id)
+        if state is not None:
+            return state['on_member_page']
+        
+        async with semaphore:
+            try:
+                status = await asyncio.wait_for(
+                    # 不使用内部的加载超时（超时会被当作浏览器已关闭），由 probe_timeout 判定为未知
+                    self.browser_manager.check_browser_and_page_status(account_id, timeout=None),
+                    timeout=self._probe_timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Browser status probe timed out, keeping last known state", extra={"account_id": account_id})
+                return None
+        return status.get('on_member_page', False)
     
     async def get_active_links(self) -> List[str]:
         """获取当前活跃链接 - 正在运行且在成员页面且未达到目标friend_count"""
-        links = []
         active_accounts = await self.db.get_active_accounts()
         
+        candidates = []
         for account in active_accounts:
-            # 优先使用保存的link，如果没有则使用band_id生成
-            if account.link:
-                # 检查浏览器是否在成员页面
-                status = await self.browser_manager.check_browser_and_page_status(account.id)
-                if status.get('on_member_page', False):
-                    links.append(account.link)
-            elif account.band_id:
-                # 兼容原有逻辑，使用band_id生成链接
-                status = await self.browser_manager.check_browser_and_page_status(account.id)
-                if status.get('on_member_page', False):
-                    member_url = f"https://band.us/band/{account.band_id}/member"
-                    links.append(member_url)
+            if self.owns is not None and not self.owns(account.id):
+                continue
+            link = self._account_link(account)
+            if link:
+                candidates.append((account.id, link))
+        
+        # 并发检查浏览器是否在成员页面
+        semaphore = asyncio.Semaphore(self._probe_concurrency)
+        results = await asyncio.gather(
+            *(self._probe_on_member_page(account_id, semaphore) for account_id, _ in candidates)
+        )
+        
+        links = []
+        last_page_state = {}
+        for (account_id, link), on_member_page in zip(candidates, results):
+            if on_member_page is None:
+                on_member_page = self._last_page_state.get(account_id, False)
+            last_page_state[account_id] = on_member_page
+            if on_member_page or account_id in self._held_links:
+                links.append(link)
+        self._last_page_state = last_page_state
         
         return links
     
@@ -43,35 +113,71 @@ class LinkManager:
         if not config.enable_sync:
             return False
         """更新Redis中的链接"""
+        with LINK_REFRESH_SECONDS.time():
+            return await self._update_redis_links(force)
+    
+    async def _update_redis_links(self, force: bool):
         try:
             active_links = await self.get_active_links()
             current_links = set(active_links)
             
-            # 只有在链接发生变化或强制更新时才更新Redis
-            if force or current_links != self._cached_links:
+            # Redis恢复后先重放熔断期间暂存的更新
+            await redis_client.replay_pending_updates()
+            
+            # 强制更新、首次同步、暂存队列溢出、worker集合丢失或到了定期全量同步时间时全量替换
+            resync_due = (
+                self._full_resync_interval > 0
+                and time.monotonic() - self._last_full_sync >= self._full_resync_interval
+            )
+            if force or not self._links_synced or redis_client.resync_required or resync_due:
                 await redis_client.update_active_links(active_links)
                 self._cached_links = current_links
-                logger.info(f"Updated Redis with {len(active_links)} active links")
+                self._links_synced = True
+                self._last_full_sync = time.monotonic()
+                logger.info("Replaced Redis links with %d active links", len(active_links))
+                return True
+            
+            # 只有在链接发生变化时才同步增删部分
+            if current_links != self._cached_links:
+                added = current_links - self._cached_links
+                removed = self._cached_links - current_links
+                await redis_client.sync_links(added, removed)
+                self._cached_links = current_links
+                logger.info("Synced Redis links: +%d -%d (%d active)", len(added), len(removed), len(current_links))
                 return True
             return False
         except Exception as e:
-            logger.error(f"Failed to update Redis links: {e}")
+            # Redis状态未知，下次全量替换
+            self._links_synced = False
+            FAILURES_TOTAL.inc(type="link_refresh")
+            logger.error("Failed to update Redis links: %s", e)
             return False
     
-    async def trigger_immediate_update(self):
-        if not config.enable_sync:
+    def request_update(self):
+        """请求尽快更新一次链接（事件驱动），短时间内的多次请求合并为一次更新"""
+        if not config.enable_sync or not self.is_running:
             return
-        """触发立即更新（事件驱动）"""
-        if not self.is_running:
+        self._update_requested = True
+        if self._requested_task is None or self._requested_task.done():
+            self._requested_task = asyncio.create_task(self._run_requested_updates())
+    
+    async def _run_requested_updates(self):
+        # 更新期间又有新请求时再更新一次
+        while self._update_requested and self.is_running:
+            await asyncio.sleep(self._coalesce_delay)
+            self._update_requested = False
+            try:
+                if await self.update_redis_links(force=False):
+                    logger.info("Event-driven Redis update applied")
+            except Exception as e:
+                logger.error("Failed to apply event-driven update: %s", e)
+    
+    async def on_event(self, event):
+        """事件总线订阅者：会影响活跃链接的事件触发一次（合并的）更新"""
+        if isinstance(event, PageNavigated) and event.on_member_page == event.was_on_member_page:
             return
-        
-        try:
-            # 立即更新一次
-            updated = await self.update_redis_links(force=False)
-            if updated:
-                logger.info("Immediate Redis update triggered")
-        except Exception as e:
-            logger.error(f"Failed to trigger immediate update: {e}")
+        if isinstance(event, (StatusChanged, PageNavigated, TargetReached, AccountUpdated, LeaseLost)):
+            self.request_update()
     
     async def start_periodic_update(self, interval: int = 30):
         if not config.enable_sync:
@@ -106,7 +212,7 @@ class LinkManager:
                 except asyncio.CancelledError:
                     break
                 except Exception as e:
-                    logger.error(f"Error in link update loop: {e}")
+                    logger.error("Error in link update loop: %s", e)
                     await asyncio.sleep(interval)
         
         self.update_task = asyncio.create_task(update_loop())
@@ -114,6 +220,9 @@ class LinkManager:
     async def stop_periodic_update(self):
         """停止定期更新任务"""
         self.is_running = False
+        if self._requested_task:
+            self._requested_task.cancel()
+            self._requested_task = None
         if self.update_task:
             self.update_task.cancel()
             try:
@@ -0,0 +1,160 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+# LogRecord自带的属性，其余属性视为通过 extra 传入的结构化字段
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "suppressed"}
+
+
+class AccountLogger(logging.LoggerAdapter):
+    """给每条日志带上 account_id 字段，控制台输出时加 "Account N:" 前缀"""
+
+    def process(self, msg, kwargs):
+        extra = dict(kwargs.get("extra") or {})
+        extra.setdefault("account_id", self.extra["account_id"])
+        kwargs["extra"] = extra
+        return msg, kwargs
+
+
+def account_logger(logger: logging.Logger, account_id: int) -> AccountLogger:
+    return AccountLogger(logger, {"account_id": account_id})
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    同一logger、同一级别、同一消息模板（按账户区分）在 interval 秒内最多输出 burst 条，
+    其余丢弃，下一条放行的日志会带上被丢弃的条数
+    """
+
+    def __init__(self, interval: float = 60.0, burst: int = 5):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self._windows: Dict[Tuple, list] = {}  # key -> [窗口开始时间, 已输出条数, 被丢弃条数]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.interval <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.levelno, record.msg, getattr(record, "account_id", None))
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = window[2] if window else 0
+            self._windows[key] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+            if len(self._windows) > 10000:
+                self._prune(now)
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+    def _prune(self, now: float):
+        for key in [key for key, window in self._windows.items() if now - window[0] >= self.interval]:
+            del self._windows[key]
+
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        account_id = getattr(record, "account_id", None)
+        if account_id is not None:
+            message = f"Account {account_id}: {message}"
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            message += f" ({suppressed} similar messages suppressed)"
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name}: {message}"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """每行一个JSON对象，extra 中的字段原样输出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _PreparingQueueHandler(logging.handlers.QueueHandler):
+    """在调用方只做过滤和参数合并，格式化与写入都在后台线程中完成"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # 异常对象不能跨线程保留，先转成文本
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: str = "INFO", log_file: str = "", max_mb: int = 10, backup_count: int = 5,
+                  rate_limit_interval: float = 60.0, rate_limit_burst: int = 5, stream=None):
+    """
+    日志管道：调用方只把日志放进队列（不做I/O），后台线程写控制台和按大小轮转的JSON日志文件
+    重复调用会先停止上一次的管道
+    """
+    global _listener
+    shutdown_logging()
+
+    console = logging.StreamHandler(stream or sys.stdout)
+    console.setFormatter(ConsoleFormatter())
+    handlers = [console]
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_mb * 1024 * 1024, backupCount=backup_count, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _PreparingQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(rate_limit_interval, rate_limit_burst))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """停止后台线程并写完队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -1,31 +1,150 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
-from .models import AccountCreate, MonitorResponse, Account, MonitorStatus
-from .database import Database
+from .models import AccountCreate, MonitorResponse, Account, MonitorStatus, BulkActionRequest
+from .database import Database, HISTORY_MAX_POINTS, LISTING_COLUMNS, ROLLUP_STEPS
 from .browser_manager import BrowserManager
 from .redis_client import redis_client
 from .link_manager import LinkManager
+from .count_buffer import CountWriteBuffer
+from .change_tracker import ChangeTracker
+from .dashboard_stream import DashboardStream
+from .events import (
+    AccountUpdated, BandNameChanged, BrowserClosed, CountChanged, EventBus, LeaseLost, PageNavigated,
+    ScreenshotSaved, StatusChanged, TargetReached
+)
+from .history import HistoryCompactor
+from .metrics import registry as metrics_registry
+from .log import account_logger, setup_logging, shutdown_logging
+from .session_restore import SessionRestorer
+from .sharding import WorkerCoordinator
+import asyncio
+import csv
+import io
+import json
+import logging
 import os
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional, Set
 from .config import config
 
+logger = logging.getLogger(__name__)
+
 # Global instances
-db = Database()
-browser_manager = BrowserManager()
+db = Database(cache_size=0 if config.sharding else config.account_cache_size)
+event_bus = EventBus(queue_size=config.event_queue_size)
+browser_manager = BrowserManager(events=event_bus)
 link_manager = LinkManager(db, browser_manager)
+# 监控回调数据的变化检测：各字段与上次写库的值相同时跳过
+change_tracker = ChangeTracker()
+count_buffer = CountWriteBuffer(
+    db,
+    flush_interval_ms=config.count_flush_interval_ms,
+    max_pending=config.count_flush_max_pending,
+    tracker=change_tracker
+)
+history_compactor = HistoryCompactor(
+    db,
+    raw_retention_days=config.history_raw_retention_days,
+    minute_retention_days=config.history_minute_retention_days
+)
+dashboard_stream = DashboardStream(db)
+db.add_change_listener(dashboard_stream.notify)
+
+# 已达到目标的账户（避免重复发布 TargetReached），修改目标或重新开始时清除
+_targets_reached: Set[int] = set()
+
+async def _set_status(account_id: int, status: MonitorStatus):
+    await db.update_account_status(account_id, status)
+    event_bus.publish(StatusChanged(account_id, status))
+
+async def _check_target(event: CountChanged):
+    if event.account_id in _targets_reached:
+        return
+    account = await db.get_account_record(event.account_id)
+    if not account:
+        return
+    if event.friend_count + event.friend_requests >= account.initial_total + account.target_friend_count:
+        _targets_reached.add(event.account_id)
+        # 先把计数写入数据库，链接更新时该账户已不再活跃
+        await count_buffer.flush()
+        logger.info("Target reached", extra={"account_id": event.account_id})
+        event_bus.publish(TargetReached(event.account_id))
+
+async def _persist_event(event):
+    """事件总线订阅者：把监控数据写入数据库"""
+    if isinstance(event, CountChanged):
+        count_buffer.submit(event.account_id, event.friend_count, event.friend_requests, event.timestamp)
+        await _check_target(event)
+    elif isinstance(event, BandNameChanged):
+        await _save_band_name(event.account_id, event.band_name)
+    elif isinstance(event, BrowserClosed):
+        # 浏览器被关闭，只更新状态为停止，不重置计数
+        await _set_status(event.account_id, MonitorStatus.STOPPED)
+        logger.info("Monitoring stopped due to browser closure", extra={"account_id": event.account_id})
+    elif isinstance(event, StatusChanged):
+        if event.status == MonitorStatus.RUNNING:
+            _targets_reached.discard(event.account_id)
+    elif isinstance(event, AccountUpdated):
+        _targets_reached.discard(event.account_id)
+    elif isinstance(event, LeaseLost):
+        # 账户由其他worker监控和写库，清掉本地记录的状态
+        _targets_reached.discard(event.account_id)
+        change_tracker.forget(event.account_id)
+
+# 各订阅者独立处理事件：写库、Redis链接同步（合并为一次更新）、截图、仪表盘推送
+# 写库和链接同步不能丢事件，截图和仪表盘推送队列满时丢弃最早的事件
+event_bus.subscribe("persistence", _persist_event,
+                    (CountChanged, BandNameChanged, BrowserClosed, StatusChanged, AccountUpdated, LeaseLost),
+                    lossless=True)
+event_bus.subscribe("redis_sync", link_manager.on_event,
+                    (StatusChanged, PageNavigated, TargetReached, AccountUpdated, LeaseLost), lossless=True)
+event_bus.subscribe("screenshots", browser_manager.on_event, (CountChanged,))
+event_bus.subscribe("dashboard", dashboard_stream.on_event, (ScreenshotSaved,))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    setup_logging(
+        level=config.log_level,
+        log_file=config.log_file,
+        max_mb=config.log_max_mb,
+        backup_count=config.log_backup_count,
+        rate_limit_interval=config.log_rate_limit_interval,
+        rate_limit_burst=config.log_rate_limit_burst
+    )
     await db.init_db()
+    event_bus.start()
+    count_buffer.start()
+    history_compactor.start()
     if config.enable_sync:
         await redis_client.connect()
+    if coordinator:
+        # 分片模式：RUNNING账户由各worker通过租约认领后恢复（只支持单台机器）
+        await coordinator.check_single_host()
+        coordinator.start()
+    elif config.restore_on_startup:
+        # 先保留上次的Redis链接再启动定期更新，恢复期间不会清空链接
+        await session_restorer.prepare()
+    if config.enable_sync:
         await link_manager.start_periodic_update(interval=30)  # 每30秒更新一次
+    session_restorer.start()
     yield
+    # 先停止事件来源（恢复任务、租约心跳、监控循环），再处理完总线中剩余的事件，最后写入缓冲的计数
+    await session_restorer.stop()
+    if coordinator:
+        await coordinator.stop()
+    await browser_manager.close_all()
+    await event_bus.stop()
     if config.enable_sync:
         await link_manager.stop_periodic_update()
-        await browser_manager.close_all()
         await redis_client.disconnect()
+    await count_buffer.stop()
+    await history_compactor.stop()
+    await db.close()
+    shutdown_logging()
 
 app = FastAPI(title="Band Monitor API", version="1.0.0", lifespan=lifespan)
 
@@ -58,18 +177,172 @@ async def add_account(account: AccountCreate):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+ACCOUNT_LIST_MAX_LIMIT = 1000
+
 @api_router.get("/accounts", response_model=MonitorResponse)
-async def get_accounts():
+async def get_accounts(
+    request: Request,
+    status: Optional[MonitorStatus] = None,
+    band_id: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的字段名，默认返回除密码外的全部字段"),
+    cursor: int = Query(0, ge=0, description="上一页返回的 next_cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=ACCOUNT_LIST_MAX_LIMIT)
+):
+    """
+    账户列表（不含密码）：按ID游标分页，可按状态和band过滤
+    账户表未变化时根据 If-None-Match 直接返回304，不查询数据库
+    """
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in LISTING_COLUMNS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        selected = list(LISTING_COLUMNS)
     try:
-        accounts = await db.get_all_accounts()
-        return MonitorResponse(
-            success=True,
-            message="Accounts retrieved successfully",
-            data={"accounts": [account.model_dump() for account in accounts]}
+        version = await db.get_accounts_version(shared=config.sharding)
+        etag = f'W/"{version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+        accounts, next_cursor = await db.list_accounts(
+            selected,
+            status=status.value if status else None,
+            band_id=band_id,
+            after_id=cursor,
+            limit=limit or config.accounts_page_size
+        )
+        return JSONResponse(
+            {
+                "success": True,
+                "message": "Accounts retrieved successfully",
+                "data": {"accounts": accounts, "next_cursor": next_cursor}
+            },
+            headers=headers
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/stream/accounts")
+async def stream_accounts():
+    """SSE：账户变化时推送单个账户的最新数据"""
+    queue = dashboard_stream.subscribe()
+    return StreamingResponse(
+        dashboard_stream.events(queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _parse_import_rows(body: bytes, content_type: str) -> list:
+    """解析批量导入数据：JSON数组、{"accounts": [...]} 或带表头 username,password,link 的CSV"""
+    if "csv" in content_type:
+        rows = list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+        for row in rows:
+            if not row.get("link"):
+                row["link"] = None
+        return rows
+    
+    rows = json.loads(body)
+    if isinstance(rows, dict):
+        rows = rows.get("accounts")
+    if not isinstance(rows, list):
+        raise ValueError("expected a list of accounts")
+    return rows
+
+@api_router.post("/accounts/bulk", response_model=MonitorResponse)
+async def bulk_add_accounts(request: Request):
+    try:
+        rows = _parse_import_rows(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import data: {e}")
+    
+    results = []
+    valid = []
+    for index, row in enumerate(rows):
+        try:
+            account = AccountCreate.model_validate(row)
+        except Exception as e:
+            results.append({"row": index, "success": False, "message": str(e)})
+            continue
+        if not account.username.strip() or not account.password:
+            results.append({"row": index, "success": False, "message": "Username and password are required"})
+            continue
+        valid.append((index, account))
+        results.append(None)
+    
+    try:
+        # 所有有效行在一个事务中插入
+        account_ids = await db.add_accounts([(a.username, a.password, a.link) for _, a in valid])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    for (index, account), account_id in zip(valid, account_ids):
+        if account_id is None:
+            results[index] = {"row": index, "username": account.username, "success": False, "message": "Username already exists"}
+        else:
+            results[index] = {"row": index, "username": account.username, "success": True, "account_id": account_id}
+    
+    created = sum(1 for result in results if result["success"])
+    return MonitorResponse(
+        success=True,
+        message=f"Imported {created} of {len(results)} accounts",
+        data={"created": created, "failed": len(results) - created, "results": results}
+    )
+
+# 正在执行的批量操作（保持引用，避免任务被回收）
+_bulk_tasks = set()
+
+async def _run_bulk_action(action: str, account_ids: List[int], accounts: Dict[int, Account],
+                           concurrency: int, progress: asyncio.Queue):
+    """并发执行批量操作，每个账户完成时把结果放入进度队列；与响应流分离，客户端断开不影响执行"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def run_one(account_id: int) -> dict:
+        account = accounts.get(account_id)
+        if account is None:
+            return {"account_id": account_id, "success": False, "message": "Account not found"}
+        async with semaphore:
+            try:
+                result = await _dispatch_account_action(action, account)
+                return {"account_id": account_id, "success": result.success, "message": result.message}
+            except Exception as e:
+                return {"account_id": account_id, "success": False, "message": str(e)}
+    
+    succeeded = 0
+    tasks = [asyncio.create_task(run_one(account_id)) for account_id in account_ids]
+    for finished in asyncio.as_completed(tasks):
+        item = await finished
+        succeeded += item["success"]
+        progress.put_nowait({"type": "progress", **item})
+    
+    progress.put_nowait({"type": "done", "action": action, "total": len(account_ids),
+                         "succeeded": succeeded, "failed": len(account_ids) - succeeded})
+
+@api_router.post("/accounts/bulk/{action}")
+async def bulk_account_action(action: str, request: BulkActionRequest):
+    """批量 start/pause/resume/close，以NDJSON逐行返回每个账户的结果"""
+    if action not in BULK_ACTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown bulk action: {action}")
+    
+    account_ids = list(dict.fromkeys(request.account_ids))
+    accounts = {account.id: account for account in await db.get_accounts(account_ids)}
+    # 请求只能调低并发，上限为配置的 bulkConcurrency
+    concurrency = max(1, min(request.concurrency or config.bulk_concurrency, config.bulk_concurrency))
+    progress = asyncio.Queue()
+    task = asyncio.create_task(_run_bulk_action(action, account_ids, accounts, concurrency, progress))
+    _bulk_tasks.add(task)
+    task.add_done_callback(_bulk_tasks.discard)
+    
+    async def stream():
+        while True:
+            item = await progress.get()
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+            if item["type"] == "done":
+                break
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @api_router.get("/accounts/{account_id}", response_model=MonitorResponse)
 async def get_account(account_id: int):
     try:
@@ -87,177 +360,245 @@ async def get_account(account_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/accounts/{account_id}/start", response_model=MonitorResponse)
-async def start_monitoring(account_id: int):
-    try:
-        account = await db.get_account(account_id)
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
-        # 检查浏览器状态和页面位置
-        browser_status = await browser_manager.check_browser_and_page_status(account_id)
-        print(f"Browser status for account {account_id}: {browser_status}")
-        
-        needs_full_setup = False
-        
-        if browser_status['browser_open'] and browser_status['on_member_page']:
-            # 浏览器已打开且在成员页面，尝试直接获取计数
-            print(f"Account {account_id}: Browser is open and on member page, testing data retrieval")
-            test_data = await browser_manager.get_member_count_and_requests(account_id)
-            
-            if test_data.get('browser_closed', False) or test_data.get('needs_navigation', False):
-                print(f"Account {account_id}: Failed to get data, need full setup")
-                needs_full_setup = True
-            else:
-                print(f"Account {account_id}: Successfully got data, no login needed")
-        else:
-            print(f"Account {account_id}: Browser not open or not on member page, need full setup")
+async def _start_account(account: Account) -> MonitorResponse:
+    """登录（需要时）、记录初始计数并开始监控，Redis链接更新由调用方触发"""
+    account_id = account.id
+    log = account_logger(logger, account_id)
+    
+    # 检查浏览器状态和页面位置
+    browser_status = await browser_manager.check_browser_and_page_status(account_id)
+    log.info("Browser status: %s", browser_status)
+    
+    needs_full_setup = False
+    
+    if browser_status['browser_open'] and browser_status['on_member_page']:
+        # 浏览器已打开且在成员页面，尝试直接获取计数
+        log.info("Browser is open and on member page, testing data retrieval")
+        test_data = await browser_manager.get_member_count_and_requests(account_id)
+        
+        if test_data.get('browser_closed', False) or test_data.get('needs_navigation', False):
+            log.info("Failed to get data, need full setup")
             needs_full_setup = True
-        
+        else:
+            log.info("Successfully got data, no login needed")
+    else:
+        log.info("Browser not open or not on member page, need full setup")
+        needs_full_setup = True
+    
+    if needs_full_setup:
+        # 先尝试直接访问成员页面（如果已有band_id）
+        direct_access_success = False
+        if account.band_id:
+            log.info("Attempting direct navigation to band %s", account.band_id)
+            try:
+                await browser_manager.open_for_monitoring(account_id)
+                direct_access_success = await browser_manager.try_direct_member_page_access(account_id, account.band_id)
+                if direct_access_success:
+                    log.info("Direct access successful")
+                    needs_full_setup = False  # 直接访问成功，不需要完整设置
+                else:
+                    log.info("Direct access failed, proceeding with login")
+            except Exception as e:
+                log.warning("Direct access error: %s, proceeding with login", e)
+        
+        # 如果直接访问失败或没有band_id，执行完整登录流程
         if needs_full_setup:
-            # 先尝试直接访问成员页面（如果已有band_id）
-            direct_access_success = False
-            if account.band_id:
-                print(f"Account {account_id}: Attempting direct navigation to band {account.band_id}")
-                try:
-                    direct_access_success = await browser_manager.try_direct_member_page_access(account_id, account.band_id)
-                    if direct_access_success:
-                        print(f"Account {account_id}: Direct access successful")
-                        needs_full_setup = False  # 直接访问成功，不需要完整设置
-                    else:
-                        print(f"Account {account_id}: Direct access failed, proceeding with login")
-                except Exception as e:
-                    print(f"Account {account_id}: Direct access error: {e}, proceeding with login")
+            # 需要重新登录和导航（可见浏览器，便于手动完成登录）
+            await browser_manager.ensure_session(account_id, headless=False)
+            login_success = await browser_manager.login_to_band(
+                account_id, account.username, account.password
+            )
             
-            # 如果直接访问失败或没有band_id，执行完整登录流程
-            if needs_full_setup:
-                # 需要重新登录和导航
-                login_success = await browser_manager.login_to_band(
-                    account_id, account.username, account.password
-                )
-                
-                if not login_success:
-                    return MonitorResponse(
-                        success=False,
-                        message="Login failed"
-                    )
-                
-                # 导航到Band成员页面并获取Band ID
-                band_id = await browser_manager.navigate_to_band_member_page(account_id, account.band_id)
-                
-                # 如果获取到新的band_id，保存到数据库
-                if band_id and band_id != account.band_id:
-                    await db.update_band_id(account_id, band_id)
-        
-        # 获取初始计数并保存 (只在账户状态为停止时设置初始值)
-        if account.status == MonitorStatus.STOPPED:
-            initial_data = await browser_manager.get_member_count_and_requests(account_id)
-            if not initial_data.get('browser_closed', False):
-                await db.set_initial_counts(
-                    account_id, 
-                    initial_data['member_count'], 
-                    initial_data['friend_requests']
+            if not login_success:
+                return MonitorResponse(
+                    success=False,
+                    message="Login failed"
                 )
-                # 如果获取到Band名称，也保存它
-                if initial_data.get('band_name'):
-                    current_band_id = account.band_id or (await browser_manager.get_current_band_id(account_id))
-                    if current_band_id:
-                        await db.update_band_info(account_id, current_band_id, initial_data['band_name'])
-        
-        async def update_callback(acc_id: int, friend_count: int, friend_requests: int, timestamp: str, browser_closed: bool = False, band_name: str = None):
-            if browser_closed:
-                # 浏览器被关闭，只更新状态为停止，不重置计数
-                await db.update_account_status(acc_id, MonitorStatus.STOPPED)
-                # 触发Redis更新（浏览器关闭会影响活跃链接）
-                if config.enable_sync:
-                    await link_manager.trigger_immediate_update()
-                print(f"Account {acc_id} monitoring stopped due to browser closure")
-            else:
-                # 只有在获取到有效数据时才更新计数
-                if friend_count is not None and friend_requests is not None:
-                    await db.update_current_counts(acc_id, friend_count, friend_requests, timestamp)
-                
-                # 如果获取到Band名称，也更新它
-                if band_name:
-                    account = await db.get_account(acc_id)
-                    if account and account.band_id:
-                        await db.update_band_info(acc_id, account.band_id, band_name)
-        
-        await browser_manager.start_monitoring(account_id, update_callback)
-        await db.update_account_status(account_id, MonitorStatus.RUNNING)
-        
-        # 触发立即更新Redis链接
-        if config.enable_sync:
-            await link_manager.trigger_immediate_update()
-        
-        return MonitorResponse(
-            success=True,
-            message="Monitoring started successfully"
+            
+            # 导航到Band成员页面并获取Band ID
+            band_id = await browser_manager.navigate_to_band_member_page(account_id, account.band_id)
+            
+            # 如果获取到新的band_id，保存到数据库
+            if band_id and band_id != account.band_id:
+                await db.update_band_id(account_id, band_id)
+            
+            # 登录完成，切换到无头监控会话
+            await browser_manager.switch_to_monitoring_profile(account_id, band_id or account.band_id)
+    
+    # 获取初始计数并保存 (只在账户状态为停止时设置初始值)
+    if account.status == MonitorStatus.STOPPED:
+        initial_data = await browser_manager.get_member_count_and_requests(account_id)
+        if not initial_data.get('browser_closed', False):
+            await db.set_initial_counts(
+                account_id, 
+                initial_data['member_count'], 
+                initial_data['friend_requests']
+            )
+            count_buffer.mark_persisted(account_id, initial_data['member_count'], initial_data['friend_requests'])
+            # 如果获取到Band名称，也保存它
+            if initial_data.get('band_name'):
+                current_band_id = account.band_id or (await browser_manager.get_current_band_id(account_id))
+                if current_band_id:
+                    await db.update_band_info(account_id, current_band_id, initial_data['band_name'])
+                    change_tracker.mark(account_id, "band_name", initial_data['band_name'])
+    
+    await browser_manager.start_monitoring(account_id)
+    await _set_status(account_id, MonitorStatus.RUNNING)
+    
+    return MonitorResponse(
+        success=True,
+        message="Monitoring started successfully"
+    )
+
+async def _save_band_name(account_id: int, band_name: str):
+    """Band名称与上次保存的值不同时才写库（首次比较读取缓存中的账户）"""
+    if not change_tracker.is_changed(account_id, "band_name", band_name):
+        return
+    account = await db.get_account_record(account_id)
+    if not account or not account.band_id:
+        return
+    if account.band_name != band_name:
+        await db.update_band_info(account_id, account.band_id, band_name)
+    change_tracker.mark(account_id, "band_name", band_name)
+
+async def _pause_account(account: Account) -> MonitorResponse:
+    await browser_manager.pause_monitoring(account.id)
+    await _set_status(account.id, MonitorStatus.PAUSED)
+    return MonitorResponse(
+        success=True,
+        message="Monitoring paused successfully"
+    )
+
+async def _resume_account(account: Account) -> MonitorResponse:
+    account_id = account.id
+    
+    await browser_manager.start_monitoring(account_id)
+    await _set_status(account_id, MonitorStatus.RUNNING)
+    
+    return MonitorResponse(
+        success=True,
+        message="Monitoring resumed successfully"
+    )
+
+async def _close_account(account: Account) -> MonitorResponse:
+    # 停止监控并关闭浏览器
+    await browser_manager.pause_monitoring(account.id)
+    await browser_manager.close_browser(account.id)
+    await _set_status(account.id, MonitorStatus.STOPPED)
+    return MonitorResponse(
+        success=True,
+        message="Browser closed successfully"
+    )
+
+session_restorer = SessionRestorer(
+    db,
+    browser_manager,
+    link_manager,
+    resume=_resume_account,
+    set_status=_set_status,
+    wave_size=config.restore_wave_size,
+    wave_interval=config.restore_wave_interval
+)
+
+coordinator = WorkerCoordinator(
+    db,
+    browser_manager,
+    session_restorer,
+    worker_id=config.worker_id,
+    url=config.worker_url,
+    lease_ttl=config.lease_ttl,
+    heartbeat_interval=config.heartbeat_interval,
+    max_accounts=config.max_accounts_per_worker
+) if config.sharding else None
+if coordinator:
+    link_manager.owns = coordinator.owns
+
+# 批量操作名称 -> 单个账户的处理函数
+BULK_ACTIONS = {
+    "start": _start_account,
+    "pause": _pause_account,
+    "resume": _resume_account,
+    "close": _close_account,
+}
+
+# 转发给其他worker的请求带此header，接收方直接在本地处理，避免循环转发
+FORWARDED_HEADER = "X-Band-Monitor-Forwarded"
+# 转发的启动命令可能要等待手动登录（最长一小时）
+FORWARD_TIMEOUT = 3900
+
+async def _forward_to_worker(url: str, path: str) -> MonitorResponse:
+    def post():
+        request = urllib.request.Request(
+            url.rstrip("/") + path, data=b"", method="POST", headers={FORWARDED_HEADER: "1"}
         )
-        
+        try:
+            with urllib.request.urlopen(request, timeout=FORWARD_TIMEOUT) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b"{}")
+    
+    status, body = await asyncio.to_thread(post)
+    if status >= 400:
+        raise HTTPException(status_code=status, detail=body.get("detail", "Worker request failed"))
+    return MonitorResponse(**body)
+
+async def _remote_owner_url(account_id: int, forwarded: bool = False) -> Optional[str]:
+    """分片模式下账户由其他worker持有时返回其地址，由本worker处理时返回None"""
+    if coordinator is None or forwarded:
+        return None
+    owner = await coordinator.owner_of(account_id)
+    if owner is None or owner["worker_id"] == coordinator.worker_id:
+        return None
+    if not owner["url"]:
+        raise HTTPException(status_code=503, detail=f"Account is owned by worker {owner['worker_id']} without workerUrl")
+    return owner["url"]
+
+async def _dispatch_account_action(action: str, account: Account, forwarded: bool = False) -> MonitorResponse:
+    """执行账户操作；分片模式下转发给租约持有者，启动/恢复前先认领租约"""
+    owner_url = await _remote_owner_url(account.id, forwarded)
+    if owner_url:
+        return await _forward_to_worker(owner_url, f"/api/accounts/{account.id}/{action}")
+    if coordinator and action in ("start", "resume") and not await coordinator.claim(account.id):
+        raise HTTPException(status_code=409, detail="Account is owned by another worker")
+    
+    result = await BULK_ACTIONS[action](account)
+    
+    if coordinator and action == "close":
+        await coordinator.release(account.id)
+    return result
+
+async def _run_account_action(action: str, account_id: int, forwarded: bool = False) -> MonitorResponse:
+    """单个账户接口的公共流程：查找账户、执行操作（状态变化以事件触发Redis链接更新）"""
+    account = await db.get_account(account_id)
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    return await _dispatch_account_action(action, account, forwarded)
+
+@api_router.post("/accounts/{account_id}/start", response_model=MonitorResponse)
+async def start_monitoring(account_id: int, request: Request):
+    try:
+        return await _run_account_action("start", account_id, FORWARDED_HEADER in request.headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/accounts/{account_id}/pause", response_model=MonitorResponse)
-async def pause_monitoring(account_id: int):
+async def pause_monitoring(account_id: int, request: Request):
     try:
-        account = await db.get_account(account_id)
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
-        await browser_manager.pause_monitoring(account_id)
-        await db.update_account_status(account_id, MonitorStatus.PAUSED)
-        
-        # 触发立即更新Redis链接（暂停后链接会被移除）
-        if config.enable_sync:
-            await link_manager.trigger_immediate_update()
-        
-        return MonitorResponse(
-            success=True,
-            message="Monitoring paused successfully"
-        )
-        
+        return await _run_account_action("pause", account_id, FORWARDED_HEADER in request.headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/accounts/{account_id}/resume", response_model=MonitorResponse)
-async def resume_monitoring(account_id: int):
+async def resume_monitoring(account_id: int, request: Request):
     try:
-        account = await db.get_account(account_id)
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
-        async def update_callback(acc_id: int, friend_count: int, friend_requests: int, timestamp: str, browser_closed: bool = False, band_name: str = None):
-            if browser_closed:
-                # 浏览器被关闭，只更新状态为停止，不重置计数
-                await db.update_account_status(acc_id, MonitorStatus.STOPPED)
-                # 触发Redis更新（浏览器关闭会影响活跃链接）
-                if config.enable_sync:
-                    await link_manager.trigger_immediate_update()
-                print(f"Account {acc_id} monitoring stopped due to browser closure")
-            else:
-                # 只有在获取到有效数据时才更新计数
-                if friend_count is not None and friend_requests is not None:
-                    await db.update_current_counts(acc_id, friend_count, friend_requests, timestamp)
-                
-                # 如果获取到Band名称，也更新它
-                if band_name:
-                    account = await db.get_account(acc_id)
-                    if account and account.band_id:
-                        await db.update_band_info(acc_id, account.band_id, band_name)
-        
-        await browser_manager.start_monitoring(account_id, update_callback)
-        await db.update_account_status(account_id, MonitorStatus.RUNNING)
-        
-        # 触发立即更新Redis链接
-        if config.enable_sync:
-            await link_manager.trigger_immediate_update()
-        
-        return MonitorResponse(
-            success=True,
-            message="Monitoring resumed successfully"
-        )
-        
+        return await _run_account_action("resume", account_id, FORWARDED_HEADER in request.headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -269,11 +610,11 @@ async def delete_account(account_id: int):
             raise HTTPException(status_code=404, detail="Account not found")
         
         await browser_manager.close_browser(account_id)
+        count_buffer.forget(account_id)
+        change_tracker.forget(account_id)
         await db.delete_account(account_id)
-        
-        # 触发立即更新Redis链接（删除后链接会被移除）
-        if config.enable_sync:
-            await link_manager.trigger_immediate_update()
+        # 删除后链接会被移除
+        event_bus.publish(AccountUpdated(account_id, "deleted"))
         
         return MonitorResponse(
             success=True,
@@ -290,21 +631,55 @@ async def get_account_status(account_id: int):
         if not account:
             raise HTTPException(status_code=404, detail="Account not found")
         
-        # 检查浏览器状态
-        browser_status = await browser_manager.check_browser_and_page_status(account_id)
+        # 检查浏览器状态（状态表中没有时才访问浏览器）
+        browser_status = browser_manager.get_page_state(account_id)
+        if browser_status is None:
+            browser_status = await browser_manager.check_browser_and_page_status(account_id)
         
         return MonitorResponse(
             success=True,
             message="Account status retrieved successfully",
             data={
                 "account": account.model_dump(),
-                "browser_status": browser_status
+                "browser_status": browser_status,
+                "poll_interval": browser_manager.scheduler.get_interval(account_id)
             }
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/accounts/{account_id}/history", response_model=MonitorResponse)
+async def get_account_history(
+    account_id: int,
+    start: Optional[int] = Query(None, alias="from", description="开始时间（Unix秒），默认24小时前"),
+    end: Optional[int] = Query(None, alias="to", description="结束时间（Unix秒），默认当前时间"),
+    step: int = Query(60, ge=1, description="时间粒度（秒），小于60返回原始变化点")
+):
+    try:
+        account = await db.get_account(account_id)
+        if not account:
+            raise HTTPException(status_code=404, detail="Account not found")
+        
+        end = end if end is not None else int(time.time())
+        start = start if start is not None else end - 86400
+        if step >= ROLLUP_STEPS[0] and (end - start) // step > HISTORY_MAX_POINTS:
+            raise HTTPException(status_code=400, detail=f"Too many points, use a larger step (max {HISTORY_MAX_POINTS})")
+        # 尚未刷入数据库的计数先写入，保证能查到最新变化
+        await count_buffer.flush()
+        history = await db.get_count_history(account_id, start, end, step)
+        
+        return MonitorResponse(
+            success=True,
+            message="Account history retrieved successfully",
+            data={"account_id": account_id, "from": start, "to": end, "step": step, **history}
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.put("/accounts/{account_id}/target", response_model=MonitorResponse)
 async def update_target(account_id: int, target_data: dict):
     try:
@@ -315,12 +690,11 @@ async def update_target(account_id: int, target_data: dict):
         target_friend_count = target_data.get('target_friend_count', 0)
         notes = target_data.get('notes', None)
         
-        print(f"Updating account {account_id}: target={target_friend_count}, notes={notes}")
+        logger.info("Updating target=%s, notes=%r", target_friend_count, notes, extra={"account_id": account_id})
         await db.update_target_and_notes(account_id, target_friend_count, notes)
         
-        # 触发立即更新Redis链接（目标变化可能影响活跃状态）
-        if config.enable_sync:
-            await link_manager.trigger_immediate_update()
+        # 目标变化可能影响活跃状态
+        event_bus.publish(AccountUpdated(account_id, "target"))
         
         return MonitorResponse(
             success=True,
@@ -340,9 +714,7 @@ async def update_link(account_id: int, link_data: dict):
         link = link_data.get('link', None)
         await db.update_link(account_id, link)
         
-        # 触发立即更新Redis链接
-        if config.enable_sync:
-            await link_manager.trigger_immediate_update()
+        event_bus.publish(AccountUpdated(account_id, "link"))
         
         return MonitorResponse(
             success=True,
@@ -353,38 +725,28 @@ async def update_link(account_id: int, link_data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/accounts/{account_id}/close", response_model=MonitorResponse)
-async def close_browser(account_id: int):
+async def close_browser(account_id: int, request: Request):
     try:
-        account = await db.get_account(account_id)
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
-        # 停止监控并关闭浏览器
-        await browser_manager.pause_monitoring(account_id)
-        await browser_manager.close_browser(account_id)
-        await db.update_account_status(account_id, MonitorStatus.STOPPED)
-        
-        # 触发立即更新Redis链接（浏览器关闭后链接会被移除）
-        if config.enable_sync:
-            await link_manager.trigger_immediate_update()
-        
-        return MonitorResponse(
-            success=True,
-            message="Browser closed successfully"
-        )
-        
+        return await _run_account_action("close", account_id, FORWARDED_HEADER in request.headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/accounts/{account_id}/screenshot", response_model=MonitorResponse)
-async def capture_screenshot(account_id: int):
+async def capture_screenshot(account_id: int, request: Request):
     try:
         account = await db.get_account(account_id)
         if not account:
             raise HTTPException(status_code=404, detail="Account not found")
         
+        # 分片模式下由持有浏览器的worker截图
+        owner_url = await _remote_owner_url(account_id, FORWARDED_HEADER in request.headers)
+        if owner_url:
+            return await _forward_to_worker(owner_url, f"/api/accounts/{account_id}/screenshot")
+        
         # 手动触发截图
-        screenshot_path = await browser_manager.capture_screenshot(account_id, "manual")
+        screenshot_path = await browser_manager.capture_screenshot(account_id, "manual", force=True)
         
         if screenshot_path:
             return MonitorResponse(
@@ -397,7 +759,9 @@ async def capture_screenshot(account_id: int):
                 success=False,
                 message="Failed to capture screenshot"
             )
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -427,6 +791,39 @@ async def force_update_links():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/debug/browser", response_model=MonitorResponse)
+async def debug_browser():
+    try:
+        return MonitorResponse(
+            success=True,
+            message="Browser debug info",
+            data={
+                "admission": browser_manager.admission.metrics(),
+                "pool": browser_manager.pool.stats() if browser_manager.pool else None,
+                "monitoring_accounts": len(browser_manager.monitoring_tasks),
+                "session_restore": session_restorer.stats,
+                "account_cache": db.account_cache.stats(),
+                "events": event_bus.stats()
+            }
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/debug/workers", response_model=MonitorResponse)
+async def debug_workers():
+    try:
+        return MonitorResponse(
+            success=True,
+            message="Worker debug info",
+            data={
+                "sharding": coordinator is not None,
+                "worker_id": coordinator.worker_id if coordinator else None,
+                "workers": await db.get_workers()
+            }
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/debug/redis", response_model=MonitorResponse)
 async def debug_redis():
     try:
@@ -461,6 +858,11 @@ async def debug_redis():
 # Include API router
 app.include_router(api_router)
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus文本格式的指标"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
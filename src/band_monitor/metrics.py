@@ -0,0 +1,186 @@
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# 默认耗时分桶（秒），覆盖从单条SQL到整页刷新
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], list] = {}  # key -> [各分桶计数, 总和, 次数]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class AgeGauge(_Metric):
+    """记录事件发生的时间，抓取时输出距今的秒数（如每个账户上次轮询成功至今）"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._timestamps: Dict[Tuple[str, ...], float] = {}
+
+    def touch(self, **labels):
+        self._timestamps[self._key(labels)] = time.monotonic()
+
+    def remove(self, **labels):
+        self._timestamps.pop(self._key(labels), None)
+
+    def _samples(self) -> List[str]:
+        now = time.monotonic()
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(round(now - ts, 3))}"
+                for key, ts in sorted(self._timestamps.items())]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+POLL_SECONDS = registry.register(Histogram(
+    "band_monitor_poll_seconds", "Duration of one poll of an account", ("result",)))
+POLL_STAGE_SECONDS = registry.register(Histogram(
+    "band_monitor_poll_stage_seconds", "Duration of each poll stage (network fetch, reload, selector waits, screenshot)",
+    ("stage",)))
+MONITOR_LOOP_LAG_SECONDS = registry.register(Histogram(
+    "band_monitor_monitor_loop_lag_seconds", "How late a poll started compared to its scheduled time"))
+DB_QUERY_SECONDS = registry.register(Histogram(
+    "band_monitor_db_query_seconds", "Latency of Database methods", ("method",)))
+REDIS_OP_SECONDS = registry.register(Histogram(
+    "band_monitor_redis_op_seconds", "Latency of Redis operations", ("operation",)))
+LINK_REFRESH_SECONDS = registry.register(Histogram(
+    "band_monitor_link_refresh_seconds", "Duration of a Redis link refresh"))
+LAST_POLL_SUCCESS_AGE = registry.register(AgeGauge(
+    "band_monitor_last_poll_success_age_seconds", "Seconds since the last successful poll", ("account_id",)))
+FAILURES_TOTAL = registry.register(Counter(
+    "band_monitor_failures_total", "Failures by type", ("type",)))
+ACCOUNT_CACHE_LOOKUPS = registry.register(Counter(
+    "band_monitor_account_cache_lookups_total", "Account cache lookups by result (hit/miss)", ("result",)))
+EVENTS_DROPPED = registry.register(Counter(
+    "band_monitor_events_dropped_total", "Events dropped because a subscriber queue was full", ("subscriber",)))
+
+
+def instrument_methods(histogram: Histogram, failure_type: str, label: str = "method", exclude: Sequence[str] = ()):
+    """类装饰器：为所有公开的协程方法记录耗时（按方法名区分），异常时计入失败计数"""
+    def decorate(cls):
+        for name, member in list(vars(cls).items()):
+            if name.startswith("_") or name in exclude or not inspect.iscoroutinefunction(member):
+                continue
+
+            def wrap(method, method_name):
+                @functools.wraps(method)
+                async def wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return await method(*args, **kwargs)
+                    except Exception:
+                        FAILURES_TOTAL.inc(type=failure_type)
+                        raise
+                    finally:
+                        histogram.observe(time.perf_counter() - start, **{label: method_name})
+                return wrapper
+
+            setattr(cls, name, wrap(member, name))
+        return cls
+    return decorate
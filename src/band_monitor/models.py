@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, NamedTuple, Optional
 from enum import Enum
 
 class MonitorStatus(str, Enum):
@@ -64,11 +64,54 @@ class Account(BaseModel):
         """是否达到目标"""
         return self.current_total >= self.target_friend_count if self.target_friend_count > 0 else False
 
+class AccountRecord(NamedTuple):
+    """
+    Account的轻量只读版本（基于tuple，不做pydantic校验），用于链接更新、监控回调等内部热路径
+    字段顺序与 Account 一致
+    """
+    id: int
+    username: str
+    password: str
+    status: MonitorStatus
+    friend_count: int
+    current_friend_count: int
+    current_friend_requests: int
+    initial_friend_count: int
+    initial_friend_requests: int
+    last_updated: Optional[str]
+    band_id: Optional[str]
+    band_name: Optional[str]
+    target_friend_count: int
+    notes: Optional[str]
+    link: Optional[str]
+
+    @property
+    def initial_total(self) -> int:
+        return self.initial_friend_count + self.initial_friend_requests
+
+    @property
+    def current_total(self) -> int:
+        return self.current_friend_count + self.current_friend_requests
+
+    @property
+    def is_target_reached(self) -> bool:
+        return self.current_total >= self.target_friend_count if self.target_friend_count > 0 else False
+
+    def to_account(self) -> Account:
+        return Account(**self._asdict())
+
+# Account 的字段顺序（数据库行映射使用）
+ACCOUNT_FIELDS = AccountRecord._fields
+
 class AccountCreate(BaseModel):
     username: str
     password: str
     link: Optional[str] = None
 
+class BulkActionRequest(BaseModel):
+    account_ids: List[int]
+    concurrency: Optional[int] = None  # 同时处理的账户数，默认且最多为配置 bulkConcurrency
+
 class MonitorResponse(BaseModel):
     success: bool
     message: str
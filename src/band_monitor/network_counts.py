@@ -0,0 +1,192 @@
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, Optional
+from playwright.async_api import Page, Response
+
+logger = logging.getLogger(__name__)
+
+# 成员页面的数据接口域名
+API_HOST_MARKER = "api.band.us"
+
+# JSON字段名 -> 结果字段
+MEMBER_COUNT_KEYS = ("member_count",)
+JOIN_REQUEST_KEYS = ("applicant_count", "join_applicant_count", "pending_member_count", "join_request_count")
+
+# 接口失效后暂停网络模式的时间（秒），连续失效时翻倍
+RETRY_BACKOFF_MIN = 30.0
+RETRY_BACKOFF_MAX = 600.0
+
+# fetch 不允许或不需要转发的请求头
+_SKIPPED_HEADERS = {"cookie", "host", "content-length", "connection", "accept-encoding", "user-agent", "referer", "origin"}
+
+_FETCH_JSON = """
+async ({url, headers}) => {
+    const response = await fetch(url, {credentials: 'include', headers});
+    if (!response.ok) return null;
+    return await response.text();
+}
+"""
+
+
+def _band_id_from_url(url: str) -> Optional[str]:
+    match = re.search(r'band\.us/band/(\d+)', url or "")
+    return match.group(1) if match else None
+
+
+def _find_band(data: Any, band_id: str) -> Optional[dict]:
+    """查找 band_no 为当前监控Band的对象（响应里也可能有推荐Band、Band列表等）"""
+    if isinstance(data, dict):
+        if str(data.get("band_no")) == band_id:
+            return data
+        for value in data.values():
+            found = _find_band(value, band_id)
+            if found is not None:
+                return found
+    elif isinstance(data, list):
+        for item in data:
+            found = _find_band(item, band_id)
+            if found is not None:
+                return found
+    return None
+
+
+def _find_value(data: Any, keys: tuple, band_id: str) -> Optional[int]:
+    """在Band对象中递归查找第一个匹配字段的整数值，跳过嵌套的其他Band"""
+    if isinstance(data, dict):
+        if "band_no" in data and str(data["band_no"]) != band_id:
+            return None
+        for key in keys:
+            value = data.get(key)
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+        for value in data.values():
+            found = _find_value(value, keys, band_id)
+            if found is not None:
+                return found
+    elif isinstance(data, list):
+        for item in data:
+            found = _find_value(item, keys, band_id)
+            if found is not None:
+                return found
+    return None
+
+
+def extract_counts(data: Any, band_id: Optional[str]) -> Dict[str, Any]:
+    """从一个JSON响应中提取当前页面Band（band_id）的字段，响应中没有该Band时返回空"""
+    result = {}
+    band = _find_band(data, band_id) if band_id else None
+    if band is None:
+        return result
+    member_count = _find_value(band, MEMBER_COUNT_KEYS, band_id)
+    if member_count is not None:
+        result['member_count'] = member_count
+    friend_requests = _find_value(band, JOIN_REQUEST_KEYS, band_id)
+    if friend_requests is not None:
+        result['friend_requests'] = friend_requests
+    if isinstance(band.get("name"), str) and band["name"].strip():
+        result['band_name'] = band["name"].strip()
+    return result
+
+
+class NetworkCountExtractor:
+    """
+    从成员页面本身发出的XHR JSON响应中获取成员数、加入申请数和Band名称
+    页面加载时拦截响应并记住提供这些字段的接口，之后轮询时在页面内直接fetch这些接口，
+    不再整页刷新、渲染和等待选择器；任一步失败时返回None，由调用方回退到DOM抓取，
+    并在退避时间内（连续失效时翻倍）停用网络模式，避免每次DOM刷新后重新学习又立即失效
+    """
+
+    def __init__(self):
+        # account_id -> field -> {'url': ..., 'headers': {...}}
+        self.endpoints: Dict[int, Dict[str, dict]] = {}
+        self.last_values: Dict[int, Dict[str, Any]] = {}
+        # account_id -> (连续失效次数, 恢复网络模式的时间)
+        self.backoff: Dict[int, tuple] = {}
+
+    def attach(self, account_id: int, page: Page):
+        """监听页面响应，学习提供计数的接口"""
+        async def on_response(response: Response):
+            try:
+                await self._learn(account_id, response, _band_id_from_url(page.url))
+            except Exception:
+                pass
+
+        page.on("response", on_response)
+
+    async def _learn(self, account_id: int, response: Response, band_id: Optional[str]):
+        request = response.request
+        if API_HOST_MARKER not in response.url or request.method != "GET" or not response.ok:
+            return
+        if "json" not in (response.headers.get("content-type") or ""):
+            return
+
+        found = extract_counts(await response.json(), band_id)
+        if not found:
+            return
+
+        headers = {
+            name: value for name, value in (await request.all_headers()).items()
+            if not name.startswith(":") and not name.startswith("sec-") and name not in _SKIPPED_HEADERS
+        }
+        endpoint = {'url': response.url, 'headers': headers}
+        learned = self.endpoints.setdefault(account_id, {})
+        for field in found:
+            learned[field] = endpoint
+        self.last_values.setdefault(account_id, {}).update(found)
+
+    def is_ready(self, account_id: int) -> bool:
+        backoff = self.backoff.get(account_id)
+        if backoff and time.monotonic() < backoff[1]:
+            return False
+        learned = self.endpoints.get(account_id, {})
+        return 'member_count' in learned and 'friend_requests' in learned
+
+    async def poll(self, account_id: int, page: Page) -> Optional[dict]:
+        """通过页面内fetch获取最新计数，失败返回None"""
+        if not self.is_ready(account_id):
+            return None
+
+        # 同一个接口可能同时提供多个字段，只请求一次
+        requests = {}
+        for endpoint in self.endpoints[account_id].values():
+            requests[endpoint['url']] = endpoint
+
+        band_id = _band_id_from_url(page.url)
+        values: Dict[str, Any] = {}
+        try:
+            for url, endpoint in requests.items():
+                body = await page.evaluate(_FETCH_JSON, {'url': url, 'headers': endpoint['headers']})
+                if body is None:
+                    return self._invalidate(account_id)
+                values.update(extract_counts(json.loads(body), band_id))
+        except Exception as e:
+            logger.warning("Network count fetch failed, falling back to DOM: %s", e, extra={"account_id": account_id})
+            return self._invalidate(account_id)
+
+        if 'member_count' not in values or 'friend_requests' not in values:
+            return self._invalidate(account_id)
+
+        self.backoff.pop(account_id, None)
+        self.last_values.setdefault(account_id, {}).update(values)
+        return {
+            'member_count': values['member_count'],
+            'friend_requests': values['friend_requests'],
+            'browser_closed': False,
+            'band_name': values.get('band_name') or self.last_values[account_id].get('band_name'),
+        }
+
+    def _invalidate(self, account_id: int):
+        """接口失效（签名过期、登录失效等），退避期结束后用DOM刷新时重新学习到的接口"""
+        self.endpoints.pop(account_id, None)
+        failures = self.backoff.get(account_id, (0, 0.0))[0] + 1
+        delay = min(RETRY_BACKOFF_MIN * 2 ** (failures - 1), RETRY_BACKOFF_MAX)
+        self.backoff[account_id] = (failures, time.monotonic() + delay)
+        logger.info("Network count mode paused for %.0fs", delay, extra={"account_id": account_id})
+        return None
+
+    def forget(self, account_id: int):
+        self.endpoints.pop(account_id, None)
+        self.last_values.pop(account_id, None)
+        self.backoff.pop(account_id, None)
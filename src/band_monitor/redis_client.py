@@ -1,117 +1,266 @@
 import redis.asyncio as redis
-from typing import List, Set
+from redis.exceptions import RedisError
+from collections import deque
+from typing import List, Optional, Set
+import asyncio
 import os
 import json
+import time
+import uuid
 import logging
 from .models import Account
 from .config import config
+from .metrics import FAILURES_TOTAL, REDIS_OP_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# 所有worker各自的链接集合（完整key名），合并后写入 links
+WORKER_REGISTRY_KEY = "links:workers"
+
+# 原子合并：跳过已过期（worker失联）的key并从登记表移除，其余SUNIONSTORE到 links
+_MERGE_WORKER_LINKS_SCRIPT = """
+local live = {}
+for _, key in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    if redis.call('EXISTS', key) == 1 then
+        table.insert(live, key)
+    else
+        redis.call('SREM', KEYS[1], key)
+    end
+end
+if #live == 0 then
+    redis.call('DEL', KEYS[2])
+else
+    redis.call('SUNIONSTORE', KEYS[2], unpack(live))
+end
+return #live
+"""
+
+class CircuitOpenError(Exception):
+    """熔断器打开期间拒绝访问Redis"""
+
 class RedisClient:
-    def __init__(self, host: str = "141.164.43.115", port: int = 6379, db: int = 0, password: str = "Haishi"):
+    def __init__(self, host: str = "141.164.43.115", port: int = 6379, db: int = 0, password: str = "Haishi",
+                 max_connections: int = 10, max_pending_updates: int = 100,
+                 failure_threshold: int = 3, base_backoff: float = 1.0, max_backoff: float = 60.0,
+                 worker_id: Optional[str] = None, worker_links_ttl: int = 90):
         self.host = host
         self.port = port
         self.db = db
         self.password = password
+        self.max_connections = max_connections
+        self.pool: Optional[redis.ConnectionPool] = None
         self.client = None
-    
-    async def connect(self):
-        if not config.enable_sync:
-            return
-        if not self.client:
-            self.client = redis.Redis(
+
+        # 分片模式：每个worker只写自己的集合，再合并到 links；集合带过期时间，worker失联后自动移除
+        self.worker_id = worker_id
+        self.worker_links_ttl = worker_links_ttl
+        self.links_key = f"links:worker:{worker_id}" if worker_id else "links"
+        self._worker_links_expected = False  # 本worker写入过非空集合（续期时集合应存在）
+
+        # 熔断器：连续失败 failure_threshold 次后打开，退避时间指数增长
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._backoff = base_backoff
+
+        # 熔断期间暂存的链接更新，恢复后按顺序重放
+        self.max_pending_updates = max_pending_updates
+        self._pending_updates: deque = deque()
+        self._replay_lock = asyncio.Lock()
+        self.resync_required = False  # 暂存队列溢出或worker集合丢失后需要全量同步
+
+    def _get_client(self) -> redis.Redis:
+        if self.client is None:
+            self.pool = redis.ConnectionPool(
                 host=self.host,
                 port=self.port,
                 db=self.db,
                 password=self.password,
+                max_connections=self.max_connections,
                 decode_responses=True,
                 socket_connect_timeout=5,
                 socket_timeout=5,
                 retry_on_timeout=True,
                 health_check_interval=30
             )
-        
-        # 测试连接
+            self.client = redis.Redis(connection_pool=self.pool)
+        return self.client
+
+    @property
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def _record_success(self):
+        if self._consecutive_failures >= self.failure_threshold:
+            logger.info("Redis recovered, closing circuit breaker")
+        self._consecutive_failures = 0
+        self._backoff = self.base_backoff
+        self._open_until = 0.0
+
+    def _record_failure(self, error: Exception):
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= self.failure_threshold:
+            self._open_until = time.monotonic() + self._backoff
+            logger.warning("Redis circuit breaker open for %.1fs after %d failures: %s",
+                           self._backoff, self._consecutive_failures, error)
+            self._backoff = min(self.max_backoff, self._backoff * 2)
+
+    async def _call(self, operation, name: str = "call"):
+        """通过连接池执行Redis操作，熔断期间直接抛出 CircuitOpenError"""
+        if self.circuit_open:
+            FAILURES_TOTAL.inc(type="redis_circuit_open")
+            raise CircuitOpenError("Redis circuit breaker is open")
         try:
-            await self.client.ping()
+            with REDIS_OP_SECONDS.time(operation=name):
+                result = await operation(self._get_client())
+        except (RedisError, OSError) as e:
+            FAILURES_TOTAL.inc(type="redis")
+            self._record_failure(e)
+            raise
+        self._record_success()
+        return result
+
+    async def connect(self):
+        """建立连接池并检查一次连通性（失败只记录，不影响启动）"""
+        if not config.enable_sync:
+            return
+        try:
+            await self._call(lambda client: client.ping(), "ping")
         except Exception as e:
-            # 连接失败，重置client并重新连接
-            self.client = None
-            raise e
-    
+            logger.error("Redis connection check failed: %s", e)
+
     async def disconnect(self):
         if not config.enable_sync:
             return
         if self.client:
-            await self.client.close()
-    
-    async def update_active_links(self, links: List[str]):
-        if not config.enable_sync:
+            await self.client.aclose()
+            self.client = None
+        if self.pool:
+            await self.pool.disconnect()
+            self.pool = None
+
+    @staticmethod
+    async def _replace_links(client: redis.Redis, links: List[str], key: str = "links"):
+        """写入临时key后RENAME，消费者不会看到空集合"""
+        async with client.pipeline(transaction=True) as pipe:
+            if links:
+                temp_key = f"links:tmp:{uuid.uuid4().hex}"
+                pipe.sadd(temp_key, *links)
+                pipe.rename(temp_key, key)
+            else:
+                pipe.delete(key)
+            await pipe.execute()
+
+    @staticmethod
+    async def _apply_link_diff(client: redis.Redis, added: Set[str], removed: Set[str], key: str = "links"):
+        async with client.pipeline(transaction=True) as pipe:
+            if removed:
+                pipe.srem(key, *removed)
+            if added:
+                pipe.sadd(key, *added)
+            await pipe.execute()
+
+    async def _merge_worker_links(self, client: redis.Redis):
+        """续期本worker的集合并把所有存活worker的集合合并到 links"""
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.sadd(WORKER_REGISTRY_KEY, self.links_key)
+            pipe.expire(self.links_key, self.worker_links_ttl)
+            _, renewed = await pipe.execute()
+        if not renewed and self._worker_links_expected and not self.resync_required:
+            # 集合已过期（worker长时间未续期）或被删除，之后的增量更新会基于空集合，需要全量同步
+            logger.warning("Redis worker links key %s is missing, a full resync is required", self.links_key)
+            self.resync_required = True
+        await client.eval(_MERGE_WORKER_LINKS_SCRIPT, 2, WORKER_REGISTRY_KEY, "links")
+
+    async def _apply_update(self, client: redis.Redis, update: tuple):
+        kind, payload = update
+        if kind == "replace":
+            await self._replace_links(client, payload, self.links_key)
+            self._worker_links_expected = bool(payload)
+        else:
+            added, removed = payload
+            await self._apply_link_diff(client, added, removed, self.links_key)
+            self._worker_links_expected = self._worker_links_expected or bool(added)
+        if self.worker_id:
+            await self._merge_worker_links(client)
+
+    async def refresh_worker_links(self):
+        """分片模式心跳：保持本worker的链接集合不过期，并清除失联worker的链接"""
+        if not config.enable_sync or not self.worker_id:
             return
         try:
-            await self.connect()
-            
-            # Clear existing links
-            await self.client.delete("links")
-            
-            # Add new links
-            if links:
-                await self.client.sadd("links", *links)
+            await self._call(self._merge_worker_links, "merge_worker_links")
         except Exception as e:
-            # 重置连接并重试一次
-            self.client = None
-            try:
-                await self.connect()
-                await self.client.delete("links")
-                if links:
-                    await self.client.sadd("links", *links)
-            except Exception as retry_error:
-                logger.error(f"Redis operation failed after retry: {retry_error}")
-                raise
-    
+            if not isinstance(e, CircuitOpenError):
+                logger.warning("Redis worker links refresh failed: %s", e)
+
+    def _enqueue_update(self, update: tuple):
+        if update[0] == "replace":
+            # 全量替换覆盖之前所有未执行的更新
+            self._pending_updates.clear()
+            self.resync_required = False
+        elif len(self._pending_updates) >= self.max_pending_updates:
+            logger.warning("Redis pending link updates overflowed, a full resync is required")
+            self._pending_updates.clear()
+            self.resync_required = True
+            return
+        self._pending_updates.append(update)
+
+    async def replay_pending_updates(self) -> bool:
+        """按顺序执行暂存的链接更新，全部完成返回True"""
+        async with self._replay_lock:
+            while self._pending_updates:
+                update = self._pending_updates[0]
+                try:
+                    await self._call(lambda client: self._apply_update(client, update), update[0])
+                except Exception as e:
+                    if not isinstance(e, CircuitOpenError):
+                        logger.warning("Redis link update deferred: %s", e)
+                    return False
+                self._pending_updates.popleft()
+            return True
+
+    async def update_active_links(self, links: List[str]):
+        """全量同步：原子替换整个链接集合（Redis不可用时暂存，恢复后重放）"""
+        if not config.enable_sync:
+            return
+        self._enqueue_update(("replace", list(links)))
+        await self.replay_pending_updates()
+
+    async def sync_links(self, added: Set[str], removed: Set[str]):
+        """增量同步：只在一个MULTI事务中SADD新增、SREM移除的链接"""
+        if not config.enable_sync:
+            return
+        if not added and not removed:
+            return
+        self._enqueue_update(("diff", (set(added), set(removed))))
+        await self.replay_pending_updates()
+
     async def get_active_links(self) -> Set[str]:
         if not config.enable_sync:
             return set()
         try:
-            await self.connect()
-            return await self.client.smembers("links")
+            return await self._call(lambda client: client.smembers("links"), "smembers")
         except Exception as e:
-            # 重置连接并重试一次
-            self.client = None
-            try:
-                await self.connect()
-                return await self.client.smembers("links")
-            except Exception as retry_error:
-                logger.error(f"Redis get operation failed after retry: {retry_error}")
-                return set()
-    
+            logger.error("Redis get operation failed: %s", e)
+            return set()
+
     async def add_link(self, link: str):
-        if not config.enable_sync:
-            return
-        try:
-            await self.connect()
-            await self.client.sadd("links", link)
-        except Exception as e:
-            self.client = None
-            await self.connect()
-            await self.client.sadd("links", link)
-    
+        await self.sync_links({link}, set())
+
     async def remove_link(self, link: str):
-        if not config.enable_sync:
-            return
-        try:
-            await self.connect()
-            await self.client.srem("links", link)
-        except Exception as e:
-            self.client = None
-            await self.connect()
-            await self.client.srem("links", link)
+        await self.sync_links(set(), {link})
 
 # Global Redis client instance
 redis_client = RedisClient(
     host=os.getenv("REDIS_HOST", "141.164.43.115"),
     port=int(os.getenv("REDIS_PORT", "6379")),
     db=int(os.getenv("REDIS_DB", "0")),
-    password=os.getenv("REDIS_PASSWORD", "Haishi")
-)
\ No newline at end of file
+    password=os.getenv("REDIS_PASSWORD", "Haishi"),
+    max_connections=config.redis_max_connections,
+    max_pending_updates=config.redis_max_pending_updates,
+    worker_id=config.worker_id if config.sharding else None,
+    worker_links_ttl=int(config.lease_ttl * 3)
+)
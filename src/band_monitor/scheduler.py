@@ -0,0 +1,80 @@
+import asyncio
+import random
+import time
+from typing import Dict, Optional
+
+
+class PollScheduler:
+    """
+    轮询调度：每个账户独立的自适应间隔
+    - 计数变化后间隔缩短到 min_interval，无变化时按 backoff 倍数增长到 max_interval
+    - 每次间隔加入 ±jitter 的随机抖动，避免大量浏览器同时刷新
+    - 全局令牌桶限制每秒轮询次数，超出预算的账户按到达顺序排队
+    """
+
+    def __init__(self, min_interval: float = 5, max_interval: float = 60, base_interval: float = 10,
+                 backoff: float = 1.5, jitter: float = 0.2, max_polls_per_second: float = 5):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.base_interval = min(max(base_interval, self.min_interval), self.max_interval)
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_polls_per_second = max_polls_per_second
+        # 令牌桶容量至少为1，否则每秒上限小于1时永远攒不够一次轮询的令牌
+        self._capacity = max(1.0, max_polls_per_second)
+        self._intervals: Dict[int, float] = {}
+        self._next_due: Dict[int, float] = {}
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+        self._budget_lock = asyncio.Lock()
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def register(self, account_id: int):
+        """开始监控时调用，首次轮询立即进行"""
+        self._intervals.setdefault(account_id, self.base_interval)
+        self._next_due[account_id] = time.monotonic()
+
+    def unregister(self, account_id: int):
+        self._intervals.pop(account_id, None)
+        self._next_due.pop(account_id, None)
+
+    def record(self, account_id: int, changed: bool):
+        """根据本次轮询结果调整间隔并安排下一次轮询"""
+        interval = self._intervals.get(account_id, self.base_interval)
+        if changed:
+            interval = self.min_interval
+        else:
+            interval = min(self.max_interval, interval * self.backoff)
+        self._intervals[account_id] = interval
+        self._next_due[account_id] = time.monotonic() + self._jittered(interval)
+
+    def get_interval(self, account_id: int) -> Optional[float]:
+        interval = self._intervals.get(account_id)
+        return round(interval, 1) if interval is not None else None
+
+    async def _acquire_budget(self):
+        if self.max_polls_per_second <= 0:
+            return
+        async with self._budget_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity,
+                    self._tokens + (now - self._last_refill) * self.max_polls_per_second
+                )
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.max_polls_per_second)
+
+    async def wait_turn(self, account_id: int) -> float:
+        """等待该账户的下一次轮询时间，并占用一个全局轮询预算；返回比预定时间晚了多少秒"""
+        due = self._next_due.get(account_id, time.monotonic())
+        delay = due - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._acquire_budget()
+        return max(0.0, time.monotonic() - due)
@@ -0,0 +1,134 @@
+import asyncio
+import io
+import logging
+import os
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Dict, Optional
+from PIL import Image
+from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+_EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+
+
+def _dhash(image_bytes: bytes) -> int:
+    """64位差值哈希，内容几乎相同的截图哈希值也几乎相同"""
+    image = Image.open(io.BytesIO(image_bytes)).convert("L").resize((9, 8))
+    pixels = image.tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+class ScreenshotStore:
+    """
+    截图存储：压缩编码（JPEG/WebP）、可只截成员列表区域、跳过与上一张感知相同的截图，
+    并限制每个账户保留的数量和目录总大小
+    """
+
+    def __init__(self, directory: str = "screenshots", image_format: str = "jpeg", quality: int = 70,
+                 clip_selector: str = "", max_per_account: int = 50, max_total_mb: int = 200,
+                 dedupe_distance: int = 4):
+        self.directory = directory
+        self.image_format = image_format if image_format in _EXTENSIONS else "jpeg"
+        self.quality = quality
+        self.clip_selector = clip_selector
+        self.max_per_account = max_per_account
+        self.max_total_bytes = max_total_mb * 1024 * 1024
+        self.dedupe_distance = dedupe_distance
+        self._last_fingerprints: Dict[int, int] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self.stats = {"saved": 0, "skipped_duplicates": 0, "deleted": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    async def _grab(self, page: Page) -> bytes:
+        # WebP由Pillow编码，先拿无损PNG
+        capture_type = "jpeg" if self.image_format == "jpeg" else "png"
+        options = {"type": capture_type}
+        if capture_type == "jpeg":
+            options["quality"] = self.quality
+
+        if self.clip_selector:
+            element = await page.query_selector(self.clip_selector)
+            if element:
+                return await element.screenshot(**options)
+        return await page.screenshot(full_page=True, **options)
+
+    async def capture(self, page: Page, account_id: int, reason: str, force: bool = False, guard=None) -> Optional[str]:
+        """
+        截图并保存，返回文件路径；与上一张相同被跳过时返回None
+        guard 为只包住浏览器截图这一步的异步上下文（如准入控制）
+        编码、比较和清理在线程中执行，不阻塞事件循环
+        """
+        lock = self._locks.setdefault(account_id, asyncio.Lock())
+        async with lock:
+            async with guard or nullcontext():
+                raw = await self._grab(page)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            return await asyncio.to_thread(self._store, account_id, reason, timestamp, raw, force)
+
+    def _is_duplicate(self, account_id: int, fingerprint: int) -> bool:
+        previous = self._last_fingerprints.get(account_id)
+        if previous is None:
+            return False
+        return bin(previous ^ fingerprint).count("1") <= self.dedupe_distance
+
+    def _store(self, account_id: int, reason: str, timestamp: str, raw: bytes, force: bool) -> Optional[str]:
+        fingerprint = _dhash(raw)
+        if not force and self._is_duplicate(account_id, fingerprint):
+            self.stats["skipped_duplicates"] += 1
+            logger.debug("Screenshot unchanged, skipped", extra={"account_id": account_id})
+            return None
+        self._last_fingerprints[account_id] = fingerprint
+
+        data = raw
+        if self.image_format == "webp":
+            output = io.BytesIO()
+            Image.open(io.BytesIO(raw)).save(output, format="WEBP", quality=self.quality)
+            data = output.getvalue()
+
+        filename = f"account_{account_id}_{reason}_{timestamp}.{_EXTENSIONS[self.image_format]}"
+        filepath = os.path.join(self.directory, filename)
+        with open(filepath, "wb") as f:
+            f.write(data)
+        self.stats["saved"] += 1
+
+        self._enforce_retention(account_id)
+        return filepath
+
+    def _enforce_retention(self, account_id: int):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.startswith("account_"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path, entry.name))
+        files.sort()
+
+        # 每个账户只保留最新的 max_per_account 张
+        prefix = f"account_{account_id}_"
+        own = [f for f in files if f[3].startswith(prefix)]
+        expired = set(f[2] for f in own[:max(0, len(own) - self.max_per_account)])
+
+        # 总大小超限时从最旧的开始删除
+        total = sum(f[1] for f in files if f[2] not in expired)
+        for _, size, path, _ in files:
+            if total <= self.max_total_bytes:
+                break
+            if path not in expired:
+                expired.add(path)
+                total -= size
+
+        for path in expired:
+            try:
+                os.remove(path)
+                self.stats["deleted"] += 1
+            except OSError:
+                pass
+
+    def forget(self, account_id: int):
+        self._last_fingerprints.pop(account_id, None)
+        self._locks.pop(account_id, None)
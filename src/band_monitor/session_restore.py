@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+from .database import Database
+from .browser_manager import BrowserManager
+from .link_manager import LinkManager
+from .models import Account, MonitorResponse, MonitorStatus
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+
+class SessionRestorer:
+    """
+    重启后恢复监控：按批次重新打开状态为RUNNING的账户会话，用保存的登录状态直接进入成员页面
+    恢复期间保留这些账户在Redis中的上次链接，确认成功或失败后再按实际状态更新
+    无法直接进入成员页面的账户标记为暂停（保留初始计数），需要手动重新开始
+    """
+
+    def __init__(self, db: Database, browser_manager: BrowserManager, link_manager: LinkManager,
+                 resume: Callable[[Account], Awaitable[MonitorResponse]],
+                 set_status: Callable[[int, MonitorStatus], Awaitable[None]],
+                 wave_size: int = 5, wave_interval: float = 10.0):
+        self.db = db
+        self.browser_manager = browser_manager
+        self.link_manager = link_manager
+        self.resume = resume
+        self.set_status = set_status  # 写入状态并发布 StatusChanged
+        self.wave_size = max(1, wave_size)
+        self.wave_interval = wave_interval
+        self._accounts: List[Account] = []
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"pending": 0, "restored": 0, "failed": 0}
+
+    async def prepare(self):
+        """找出需要恢复的账户并保留它们的Redis链接，需在链接定期更新启动前调用"""
+        accounts = await self.db.get_all_accounts()
+        self._accounts = [account for account in accounts if account.status == MonitorStatus.RUNNING]
+        await self._hold(self._accounts)
+
+    async def _hold(self, accounts: List[Account]):
+        self.stats["pending"] += len(accounts)
+        if accounts and config.enable_sync:
+            await self.link_manager.hold_links(accounts)
+
+    async def _restore_one(self, account: Account) -> bool:
+        try:
+            if not account.band_id:
+                logger.warning("No band id saved, cannot restore without login", extra={"account_id": account.id})
+                return False
+            await self.browser_manager.open_for_monitoring(account.id)
+            if not await self.browser_manager.try_direct_member_page_access(account.id, account.band_id):
+                return False
+            result = await self.resume(account)
+            return result.success
+        except Exception as e:
+            logger.error("Session restore failed: %s", e, extra={"account_id": account.id})
+            return False
+
+    async def _finish(self, account: Account, restored: bool):
+        self.stats["pending"] -= 1
+        if restored:
+            self.stats["restored"] += 1
+            logger.info("Monitoring restored", extra={"account_id": account.id})
+        else:
+            self.stats["failed"] += 1
+            await self.browser_manager.close_browser(account.id)
+            await self.set_status(account.id, MonitorStatus.PAUSED)
+            logger.warning("Session expired, paused until started again", extra={"account_id": account.id})
+        self.link_manager.release_held_link(account.id)
+
+    async def restore(self):
+        accounts, self._accounts = self._accounts, []
+        await self._restore_waves(accounts)
+
+    async def restore_accounts(self, accounts: List[Account]):
+        """恢复指定账户（分片模式下接管失联worker的账户）"""
+        await self._hold(accounts)
+        await self._restore_waves(accounts)
+
+    async def _restore_waves(self, accounts: List[Account]):
+        for start in range(0, len(accounts), self.wave_size):
+            wave = accounts[start:start + self.wave_size]
+            results = await asyncio.gather(*(self._restore_one(account) for account in wave))
+            for account, restored in zip(wave, results):
+                await self._finish(account, restored)
+            # 每批完成后按实际状态更新一次Redis链接（与同批的状态事件合并）
+            self.link_manager.request_update()
+            if start + self.wave_size < len(accounts):
+                await asyncio.sleep(self.wave_interval)
+
+    def start(self):
+        if self._task or not self._accounts:
+            return
+
+        async def restore_task():
+            try:
+                await self.restore()
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.error("Error restoring sessions: %s", e)
+
+        self._task = asyncio.create_task(restore_task())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Optional, Set
+from .database import Database
+from .browser_manager import BrowserManager
+from .events import LeaseLost
+from .redis_client import redis_client
+from .session_restore import SessionRestorer
+
+logger = logging.getLogger(__name__)
+
+# SQLite（WAL模式）不能在这些文件系统上安全地被多个进程共用
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p", "ceph", "glusterfs", "fuse.glusterfs", "afs"}
+
+
+def _filesystem_type(path: str) -> Optional[str]:
+    """path 所在挂载点的文件系统类型（读取 /proc/mounts，其他平台返回None）"""
+    path = os.path.realpath(path)
+    best, fs_type = "", None
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point = parts[1].replace("\\040", " ")
+                prefix = mount_point.rstrip("/") + "/"
+                if (path == mount_point or path.startswith(prefix)) and len(mount_point) >= len(best):
+                    best, fs_type = mount_point, parts[2]
+    except OSError:
+        return None
+    return fs_type
+
+
+class WorkerCoordinator:
+    """
+    多worker分片：各worker通过数据库中的租约认领账户，并定期心跳续约
+    - 租约和账户都保存在本地SQLite（WAL模式）中，只支持同一台机器上的多个worker进程，
+      启动时拒绝网络文件系统上的数据库和其他主机上仍在心跳的worker
+    - 只有租约持有者运行该账户的浏览器和监控，其他worker收到的命令转发给持有者
+    - worker失联（租约过期）后，其他worker接管它的RUNNING账户，用保存的会话直接恢复监控
+    - 租约被其他worker接管时（如本worker长时间卡顿）本地关闭该账户的浏览器
+    """
+
+    def __init__(self, db: Database, browser_manager: BrowserManager, restorer: SessionRestorer,
+                 worker_id: str, url: str = "", lease_ttl: float = 30, heartbeat_interval: float = 10,
+                 max_accounts: int = 0):
+        self.db = db
+        self.browser_manager = browser_manager
+        self.restorer = restorer
+        self.worker_id = worker_id
+        self.url = url or None
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.max_accounts = max_accounts
+        self.host = socket.gethostname()
+        self._owned: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._failover_task: Optional[asyncio.Task] = None
+
+    async def check_single_host(self):
+        """启动前检查：数据库不在网络文件系统上，且没有其他主机的worker在使用它"""
+        fs_type = _filesystem_type(self.db.db_path)
+        if fs_type in NETWORK_FILESYSTEMS:
+            raise RuntimeError(
+                f"Sharding requires a local database file, {self.db.db_path} is on {fs_type}; "
+                "run all workers on one host"
+            )
+        other_hosts = await self.db.get_live_worker_hosts(self.lease_ttl) - {self.host}
+        if other_hosts:
+            raise RuntimeError(
+                f"Workers on other hosts ({', '.join(sorted(other_hosts))}) are using this database; "
+                "sharding supports only workers on one host"
+            )
+
+    def owns(self, account_id: int) -> bool:
+        return account_id in self._owned
+
+    async def claim(self, account_id: int) -> bool:
+        if await self.db.claim_lease(account_id, self.worker_id, self.lease_ttl):
+            self._owned.add(account_id)
+            return True
+        return False
+
+    async def release(self, account_id: int):
+        self._owned.discard(account_id)
+        await self.db.release_lease(account_id, self.worker_id)
+
+    async def owner_of(self, account_id: int) -> Optional[dict]:
+        return await self.db.get_lease_owner(account_id)
+
+    async def heartbeat(self):
+        owned_before = set(self._owned)
+        held = await self.db.heartbeat_worker(self.worker_id, self.url, self.lease_ttl, self.host)
+        # 心跳期间新认领的账户不算丢失
+        self._owned = held | (self._owned - owned_before)
+        for account_id in owned_before - held:
+            # 租约已被其他worker接管，停止本地监控（不修改账户状态）
+            logger.warning("Lease lost to another worker, closing local session", extra={"account_id": account_id})
+            await self.browser_manager.close_browser(account_id)
+            self.browser_manager.events.publish(LeaseLost(account_id))
+        await redis_client.refresh_worker_links()
+
+    async def _failover(self):
+        try:
+            await self._take_over()
+        except Exception as e:
+            logger.error("Error taking over accounts: %s", e)
+
+    async def _take_over(self):
+        """认领没有有效租约的RUNNING账户并恢复监控，每次最多一批"""
+        limit = self.restorer.wave_size
+        if self.max_accounts:
+            limit = min(limit, self.max_accounts - len(self._owned))
+        if limit <= 0:
+            return
+        accounts = await self.db.get_unleased_running_accounts(limit)
+        claimed = [account for account in accounts if await self.claim(account.id)]
+        if not claimed:
+            return
+        logger.info("Worker %s taking over %d accounts", self.worker_id, len(claimed))
+        await self.restorer.restore_accounts(claimed)
+        # 恢复失败的账户已被暂停，释放租约
+        for account in claimed:
+            if account.id not in self.browser_manager.monitoring_tasks:
+                await self.release(account.id)
+
+    def start(self):
+        if self._task:
+            return
+
+        async def heartbeat_loop():
+            # 以同一worker_id重启时，上次的租约对应的浏览器已不存在，先全部释放再重新认领
+            await self.db.release_worker(self.worker_id)
+            while True:
+                try:
+                    await self.heartbeat()
+                    # 接管在单独的任务中进行，恢复会话期间心跳不中断
+                    if self._failover_task is None or self._failover_task.done():
+                        self._failover_task = asyncio.create_task(self._failover())
+                    await asyncio.sleep(self.heartbeat_interval)
+                except asyncio.CancelledError:
+                    break
+                except Exception as e:
+                    logger.error("Error in worker heartbeat: %s", e)
+                    await asyncio.sleep(self.heartbeat_interval)
+
+        self._task = asyncio.create_task(heartbeat_loop())
+
+    async def stop(self):
+        for task in (self._task, self._failover_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._failover_task = None
+        # 正常退出时立即交出全部账户
+        await self.db.release_worker(self.worker_id)
+        self._owned.clear()
@@ -0,0 +1,29 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.band_monitor import main
+from src.band_monitor.config import config
+
+
+@pytest.fixture
+def app_config(tmp_path, monkeypatch):
+    """应用使用临时数据库，不连接Redis、不恢复会话、不写日志文件"""
+    monkeypatch.setattr(config, "enable_sync", False)
+    monkeypatch.setattr(config, "restore_on_startup", False)
+    monkeypatch.setattr(config, "log_file", "")
+    monkeypatch.setattr(main.db, "db_path", str(tmp_path / "band_monitor.db"))
+    # 模块级的数据库对象在各测试的事件循环间复用，写锁可能已绑定到上一个循环
+    monkeypatch.setattr(main.db, "_write_lock", asyncio.Lock())
+    main.db.account_cache.clear()
+
+
+@pytest.fixture
+def client(app_config):
+    with TestClient(main.app) as test_client:
+        yield test_client
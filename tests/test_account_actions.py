@@ -0,0 +1,60 @@
+from src.band_monitor import main
+
+
+def _add_account(client, username="user@example.com"):
+    response = client.post("/api/accounts", json={"username": username, "password": "secret"})
+    return response.json()["data"]["account_id"]
+
+
+def test_unknown_account_returns_404(client):
+    for action in ("start", "pause", "resume", "close"):
+        response = client.post(f"/api/accounts/999/{action}")
+        assert response.status_code == 404, action
+        assert response.json()["detail"] == "Account not found"
+
+
+class _OtherWorkerHoldsLease:
+    worker_id = "this-worker"
+
+    async def owner_of(self, account_id):
+        return None
+
+    async def claim(self, account_id):
+        return False
+
+    async def stop(self):
+        pass
+
+
+def test_start_leased_by_other_worker_returns_409(client, monkeypatch):
+    account_id = _add_account(client)
+    monkeypatch.setattr(main, "coordinator", _OtherWorkerHoldsLease())
+
+    response = client.post(f"/api/accounts/{account_id}/start")
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Account is owned by another worker"
+
+
+def test_bulk_concurrency_is_capped_by_config(client, monkeypatch):
+    monkeypatch.setattr(main.config, "bulk_concurrency", 5)
+    used = []
+
+    async def fake_run_bulk_action(action, account_ids, accounts, concurrency, progress):
+        used.append(concurrency)
+        progress.put_nowait({"type": "done", "action": action, "total": 0, "succeeded": 0, "failed": 0})
+
+    monkeypatch.setattr(main, "_run_bulk_action", fake_run_bulk_action)
+    for requested in (None, 2, 1000, -3):
+        response = client.post("/api/accounts/bulk/pause", json={"account_ids": [], "concurrency": requested})
+        assert response.status_code == 200
+    assert used == [5, 2, 5, 1]
+
+
+def test_history_rejects_too_many_points(client):
+    account_id = _add_account(client)
+    response = client.get(f"/api/accounts/{account_id}/history", params={"from": 0, "to": 10**9, "step": 60})
+    assert response.status_code == 400
+    response = client.get(f"/api/accounts/{account_id}/history", params={"step": 60})
+    assert response.status_code == 200
+    assert response.json()["data"]["points"] == []
@@ -0,0 +1,29 @@
+from src.band_monitor import main
+from src.band_monitor.change_tracker import ChangeTracker
+
+
+def test_unchanged_band_name_is_written_once(client, monkeypatch):
+    monkeypatch.setattr(main, "change_tracker", ChangeTracker())
+    transactions = []
+    original_transaction = main.db._transaction
+
+    def counting_transaction(*args, **kwargs):
+        transactions.append(args)
+        return original_transaction(*args, **kwargs)
+
+    async def scenario():
+        account_id = await main.db.add_account("user@example.com", "secret")
+        await main.db.update_band_id(account_id, "123")
+        monkeypatch.setattr(main.db, "_transaction", counting_transaction)
+
+        await main._save_band_name(account_id, "My band")
+        assert len(transactions) == 1
+        for _ in range(1000):
+            await main._save_band_name(account_id, "My band")
+        assert len(transactions) == 1
+
+        await main._save_band_name(account_id, "Renamed band")
+        assert len(transactions) == 2
+        assert (await main.db.get_account_record(account_id)).band_name == "Renamed band"
+
+    client.portal.call(scenario)
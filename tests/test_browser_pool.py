@@ -0,0 +1,79 @@
+import asyncio
+
+from src.band_monitor.browser_pool import BrowserPool
+
+
+class _Context:
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def close(self):
+        pass
+
+
+class _Browser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        return _Context()
+
+    async def close(self):
+        self.closed = True
+
+    def crash(self, emit=True):
+        self.connected = False
+        if emit:
+            self.handlers["disconnected"](self)
+
+
+class _Chromium:
+    def __init__(self):
+        self.launched = []
+
+    async def launch(self, **options):
+        browser = _Browser()
+        self.launched.append(browser)
+        return browser
+
+
+class _Playwright:
+    def __init__(self):
+        self.chromium = _Chromium()
+
+
+def test_crashed_browser_slot_is_removed(tmp_path):
+    async def scenario():
+        playwright = _Playwright()
+        pool = BrowserPool(playwright, str(tmp_path), accounts_per_browser=5)
+        await pool.acquire_context(1, headless=True)
+        await pool.acquire_context(2, headless=True)
+        first = playwright.chromium.launched[0]
+
+        first.crash()
+        assert pool.stats()["processes"] == 0
+        assert pool.stats()["contexts"] == 0
+
+        await pool.acquire_context(1, headless=True)
+        second = playwright.chromium.launched[1]
+        assert pool.stats()["slots"] == [{"headless": True, "accounts": [1]}]
+
+        # 未触发disconnected事件时，分配slot前也会清理并关闭断开的进程
+        second.crash(emit=False)
+        await pool.acquire_context(2, headless=True)
+        assert second.closed
+        assert len(playwright.chromium.launched) == 3
+        assert pool.stats()["slots"] == [{"headless": True, "accounts": [2]}]
+
+    asyncio.run(scenario())
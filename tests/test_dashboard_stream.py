@@ -0,0 +1,50 @@
+import asyncio
+
+from src.band_monitor.dashboard_stream import DashboardStream
+from src.band_monitor.models import Account
+
+
+class _SlowDatabase:
+    def __init__(self):
+        self.calls = []
+
+    async def get_accounts(self, account_ids):
+        self.calls.append(sorted(account_ids))
+        await asyncio.sleep(0.05)
+        return [Account(id=account_id, username=f"user{account_id}", password="secret") for account_id in account_ids]
+
+
+def _drain(queue):
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+
+def test_changes_during_load_are_published():
+    async def scenario():
+        db = _SlowDatabase()
+        stream = DashboardStream(db, debounce=0.01)
+        queue = stream.subscribe()
+        stream.notify(1)
+        await asyncio.sleep(0.03)  # 正在读取账户1
+        stream.notify(2)
+        await asyncio.sleep(0.2)
+        return db.calls, _drain(queue)
+
+    calls, events = asyncio.run(scenario())
+    assert calls == [[1], [2]]
+    assert [event["account"]["id"] for event in events] == [1, 2]
+
+
+def test_account_events_exclude_password():
+    async def scenario():
+        stream = DashboardStream(_SlowDatabase(), debounce=0)
+        queue = stream.subscribe()
+        stream.notify(1)
+        await asyncio.sleep(0.1)
+        return _drain(queue)
+
+    events = asyncio.run(scenario())
+    assert events and "password" not in events[0]["account"]
+    assert "secret" not in repr(events)
@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+from src.band_monitor.database import Database
+from src.band_monitor.metrics import DB_QUERY_SECONDS
+from src.band_monitor.models import MonitorStatus
+
+
+def test_active_accounts_use_listing_friend_count(tmp_path):
+    async def scenario():
+        db = Database(str(tmp_path / "accounts.db"))
+        await db.init_db()
+        reached = await db.add_account("reached@example.com", "secret")
+        pending = await db.add_account("pending@example.com", "secret")
+        for account_id in (reached, pending):
+            await db.update_account_status(account_id, MonitorStatus.RUNNING)
+        # 当前成员数未记录（0）时按 friend_count 计算，与账户对象和列表接口一致
+        async with db._transaction(reached, pending) as conn:
+            await conn.execute(
+                "UPDATE accounts SET current_friend_count = 0, friend_count = ? WHERE id = ?", (12, reached)
+            )
+            await conn.execute(
+                "UPDATE accounts SET current_friend_count = 0, friend_count = ? WHERE id = ?", (3, pending)
+            )
+
+        active = await db.get_active_accounts()
+        reached_account = await db.get_account(reached)
+        await db.close()
+        return [account.id for account in active], pending, reached_account
+
+    active_ids, pending, reached_account = asyncio.run(scenario())
+    assert reached_account.current_friend_count == 12
+    assert active_ids == [pending]
+
+
+def test_cache_hits_are_not_timed_as_queries(tmp_path):
+    def observed(method):
+        series = DB_QUERY_SECONDS._series.get((method,))
+        return series[2] if series else 0
+
+    async def scenario():
+        db = Database(str(tmp_path / "accounts.db"))
+        await db.init_db()
+        account_id = await db.add_account("user@example.com", "secret")
+        loads = observed("load_records")
+        await db.get_account(account_id)
+        assert observed("load_records") == loads + 1
+        for _ in range(10):
+            await db.get_account(account_id)
+            await db.get_accounts([account_id])
+        assert observed("load_records") == loads + 1
+        assert observed("get_account") == observed("get_accounts") == 0
+        await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_rolled_back_write_is_not_cached(tmp_path):
+    async def scenario():
+        db = Database(str(tmp_path / "accounts.db"))
+        await db.init_db()
+        account_id = await db.add_account("user@example.com", "secret")
+        db.account_cache.clear()
+        try:
+            async with db._transaction(account_id) as conn:
+                await conn.execute("UPDATE accounts SET band_name = 'uncommitted' WHERE id = ?", (account_id,))
+                # 写事务进行中的读取（共用连接）
+                assert (await db.get_account_record(account_id)).band_name == "uncommitted"
+                raise RuntimeError("rollback")
+        except RuntimeError:
+            pass
+        record = await db.get_account_record(account_id)
+        await db.close()
+        return record
+
+    assert asyncio.run(scenario()).band_name is None
+
+
+def test_history_rollups_carry_state_and_include_recent_samples(tmp_path):
+    base = (int(time.time()) // 3600) * 3600 - 7200
+
+    async def add_sample(db, account_id, ts, friend_count):
+        async with db._transaction() as conn:
+            await conn.execute(
+                "INSERT INTO count_samples (account_id, ts, friend_count, friend_requests) VALUES (?, ?, ?, 0)",
+                (account_id, ts, friend_count)
+            )
+
+    async def scenario():
+        db = Database(str(tmp_path / "accounts.db"))
+        await db.init_db()
+        account_id = await db.add_account("user@example.com", "secret")
+        await add_sample(db, account_id, base + 10, 10)
+        await add_sample(db, account_id, base + 150, 12)
+
+        # 尚未汇总：直接使用原始变化点
+        before = await db.get_count_history(account_id, base, base + 299, 60)
+        await db.compact_count_history()
+        after = await db.get_count_history(account_id, base, base + 299, 60)
+        # 汇总之后的新变化立即可见
+        await add_sample(db, account_id, int(time.time()), 15)
+        recent = await db.get_count_history(account_id, int(time.time()) - 60, int(time.time()), 60)
+        # 区间内没有变化时使用区间开始前的最后状态
+        quiet = await db.get_count_history(account_id, base + 3600, base + 3719, 60)
+        hourly = await db.get_count_history(account_id, base, base + 3599, 3600)
+        await db.close()
+        return before, after, recent, quiet, hourly
+
+    before, after, recent, quiet, hourly = asyncio.run(scenario())
+    assert before["points"] == after["points"]
+    assert [(p["t"] - base, p["friend_count"], p["friend_count_min"], p["friend_count_max"]) for p in after["points"]] == [
+        (0, 10, 10, 10), (60, 10, 10, 10), (120, 12, 10, 12), (180, 12, 12, 12), (240, 12, 12, 12),
+    ]
+    assert recent["points"][-1]["friend_count"] == 15
+    assert [p["friend_count"] for p in quiet["points"]] == [12, 12]
+    assert [(p["friend_count"], p["friend_count_min"], p["friend_count_max"]) for p in hourly["points"]] == [(12, 10, 12)]
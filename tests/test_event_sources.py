@@ -0,0 +1,86 @@
+import asyncio
+
+from src.band_monitor.events import EventBus, LeaseLost
+from src.band_monitor.models import Account, MonitorStatus
+from src.band_monitor.session_restore import SessionRestorer
+from src.band_monitor.sharding import WorkerCoordinator
+
+
+class _BrowserManager:
+    def __init__(self):
+        self.events = EventBus()
+        self.closed = []
+
+    async def close_browser(self, account_id):
+        self.closed.append(account_id)
+
+
+class _LinkManager:
+    def release_held_link(self, account_id):
+        pass
+
+
+def test_failed_restore_goes_through_set_status():
+    statuses = []
+
+    async def set_status(account_id, status):
+        statuses.append((account_id, status))
+
+    restorer = SessionRestorer(db=None, browser_manager=_BrowserManager(), link_manager=_LinkManager(),
+                               resume=None, set_status=set_status)
+    restorer.stats["pending"] = 1
+    asyncio.run(restorer._finish(Account(id=1, username="user", password="secret"), restored=False))
+
+    assert statuses == [(1, MonitorStatus.PAUSED)]
+
+
+class _LeaseDatabase:
+    async def heartbeat_worker(self, worker_id, url, lease_ttl, host=None):
+        return {2}
+
+
+def test_lost_lease_is_published():
+    browser_manager = _BrowserManager()
+    events = []
+
+    async def on_event(event):
+        events.append(event)
+
+    browser_manager.events.subscribe("test", on_event)
+    coordinator = WorkerCoordinator(_LeaseDatabase(), browser_manager, restorer=None, worker_id="w1")
+    coordinator._owned = {1, 2}
+
+    async def scenario():
+        browser_manager.events.start()
+        await coordinator.heartbeat()
+        await browser_manager.events.stop()
+
+    asyncio.run(scenario())
+    assert browser_manager.closed == [1]
+    assert events == [LeaseLost(1)]
+    assert coordinator._owned == {2}
+
+
+
+def test_counts_published_while_stopping_monitors_are_saved(app_config, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from src.band_monitor import main
+    from src.band_monitor.events import CountChanged
+
+    async def close_all():
+        # 监控循环停止前的最后一次轮询
+        main.event_bus.publish(CountChanged(account_id, 7, 1, "2026-01-01T00:00:00"))
+
+    monkeypatch.setattr(main.browser_manager, "close_all", close_all)
+    with TestClient(main.app) as client:
+        response = client.post("/api/accounts", json={"username": "user@example.com", "password": "secret"})
+        account_id = response.json()["data"]["account_id"]
+
+    async def read_counts():
+        record = await main.db.get_account_record(account_id)
+        await main.db.close()
+        return record.current_friend_count, record.current_friend_requests
+
+    main.db.account_cache.clear()
+    assert asyncio.run(read_counts()) == (7, 1)
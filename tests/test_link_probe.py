@@ -0,0 +1,37 @@
+import asyncio
+
+from src.band_monitor.browser_manager import BrowserManager
+from src.band_monitor.link_manager import LinkManager
+
+
+class _SlowPage:
+    url = "https://band.us/band/123/member"
+
+    async def wait_for_load_state(self, state, timeout=None):
+        # 与Playwright一致：timeout为毫秒，0表示不限时
+        await asyncio.sleep(timeout / 1000 if timeout else 10)
+        raise TimeoutError("page load timed out")
+
+
+def _browser_manager_with_slow_page(account_id):
+    browser_manager = BrowserManager()
+    browser_manager.browsers[account_id] = object()
+    browser_manager.pages[account_id] = _SlowPage()
+    return browser_manager
+
+
+def test_slow_probe_is_unknown_not_closed():
+    link_manager = LinkManager(db=None, browser_manager=_browser_manager_with_slow_page(1))
+    link_manager._probe_timeout = 0.05
+
+    result = asyncio.run(link_manager._probe_on_member_page(1, asyncio.Semaphore(1)))
+    assert result is None
+
+
+def test_status_check_keeps_its_own_timeout():
+    browser_manager = _browser_manager_with_slow_page(1)
+
+    async def scenario():
+        return await asyncio.wait_for(browser_manager.check_browser_and_page_status(1, timeout=0.05), timeout=1)
+
+    assert asyncio.run(scenario())['browser_open'] is False
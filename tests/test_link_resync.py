@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from src.band_monitor import link_manager as link_manager_module
+from src.band_monitor.config import config
+from src.band_monitor.link_manager import LinkManager
+from src.band_monitor.redis_client import RedisClient
+
+
+class _LinkManager(LinkManager):
+    def __init__(self, links):
+        super().__init__(db=None, browser_manager=None)
+        self.links = links
+
+    async def get_active_links(self):
+        return list(self.links)
+
+
+def _setup(monkeypatch, links):
+    monkeypatch.setattr(config, "enable_sync", True)
+    client = RedisClient(worker_id="w1", worker_links_ttl=60)
+    client.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(link_manager_module, "redis_client", client)
+    return client, _LinkManager(links)
+
+
+def test_missing_worker_key_triggers_full_resync(monkeypatch):
+    client, manager = _setup(monkeypatch, {"a", "b"})
+
+    async def scenario():
+        await manager.update_redis_links()
+        assert await client.client.smembers(client.links_key) == {"a", "b"}
+
+        # worker集合过期后，只做增量同步会丢掉未变化的链接
+        await client.client.delete(client.links_key)
+        await client.refresh_worker_links()
+        assert client.resync_required
+
+        manager.links = {"a", "b", "c"}
+        await manager.update_redis_links()
+        assert await client.client.smembers(client.links_key) == {"a", "b", "c"}
+        assert not client.resync_required
+
+    asyncio.run(scenario())
+
+
+def test_periodic_full_resync(monkeypatch):
+    client, manager = _setup(monkeypatch, {"a"})
+    manager._full_resync_interval = 60
+
+    async def scenario():
+        await manager.update_redis_links()
+        await client.client.sadd(client.links_key, "stale")
+
+        assert not await manager.update_redis_links()
+        manager._last_full_sync -= 60
+        assert await manager.update_redis_links()
+        assert await client.client.smembers(client.links_key) == {"a"}
+
+    asyncio.run(scenario())
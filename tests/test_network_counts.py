@@ -0,0 +1,81 @@
+import asyncio
+
+from src.band_monitor.network_counts import NetworkCountExtractor, extract_counts
+
+
+class _FailingPage:
+    url = "https://band.us/band/123/member"
+
+    async def evaluate(self, script, arg):
+        return None
+
+
+def test_band_name_only_from_current_band():
+    data = {
+        "recommended": [{"band_no": 999, "name": "Other band"}],
+        "band": {"band_no": 123, "name": " My band ", "member_count": 42},
+    }
+    assert extract_counts(data, "123")["band_name"] == "My band"
+    assert "band_name" not in extract_counts(data, "555")
+    assert "band_name" not in extract_counts(data, None)
+
+
+def test_counts_only_from_current_band():
+    data = {
+        "recommended": [{"band_no": 999, "member_count": 5000, "applicant_count": 7}],
+        "band": {"band_no": 123, "name": "Mine", "member_count": 42, "join": {"applicant_count": 3}},
+    }
+    assert extract_counts(data, "123") == {"member_count": 42, "friend_requests": 3, "band_name": "Mine"}
+    # 不包含当前Band的响应（如Band列表）不提供任何字段，也不会被学习为接口
+    assert extract_counts({"bands": [{"band_no": 999, "member_count": 5000}]}, "123") == {}
+
+
+class _Request:
+    method = "GET"
+
+    async def all_headers(self):
+        return {"accept": "application/json"}
+
+
+class _Response:
+    ok = True
+    request = _Request()
+    headers = {"content-type": "application/json"}
+
+    def __init__(self, url, data):
+        self.url = url
+        self._data = data
+
+    async def json(self):
+        return self._data
+
+
+def test_learns_only_endpoints_with_current_band():
+    extractor = NetworkCountExtractor()
+    band_list = _Response("https://api.band.us/v2/bands", {"bands": [{"band_no": 999, "member_count": 5000}]})
+    band = _Response("https://api.band.us/v2/band", {"band": {"band_no": 123, "member_count": 42}})
+
+    asyncio.run(extractor._learn(1, band_list, "123"))
+    assert 1 not in extractor.endpoints
+    asyncio.run(extractor._learn(1, band, "123"))
+    assert extractor.endpoints[1]["member_count"]["url"] == band.url
+
+
+def test_invalidated_endpoints_back_off():
+    extractor = NetworkCountExtractor()
+    endpoint = {"url": "https://api.band.us/v2/members", "headers": {}}
+    extractor.endpoints[1] = {"member_count": endpoint, "friend_requests": endpoint}
+    assert extractor.is_ready(1)
+
+    assert asyncio.run(extractor.poll(1, _FailingPage())) is None
+    first_delay = extractor.backoff[1][1]
+
+    # 退避期内即使DOM刷新重新学习到接口也不启用网络模式
+    extractor.endpoints[1] = {"member_count": endpoint, "friend_requests": endpoint}
+    assert not extractor.is_ready(1)
+
+    extractor.backoff[1] = (1, 0.0)
+    assert extractor.is_ready(1)
+    asyncio.run(extractor.poll(1, _FailingPage()))
+    failures, resume_at = extractor.backoff[1]
+    assert failures == 2 and resume_at > first_delay
@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+from src.band_monitor.scheduler import PollScheduler
+
+
+def test_interval_shrinks_on_change_and_backs_off():
+    scheduler = PollScheduler(min_interval=5, max_interval=20, base_interval=10, backoff=2, jitter=0)
+    scheduler.register(1)
+    assert scheduler.get_interval(1) == 10
+
+    scheduler.record(1, changed=False)
+    assert scheduler.get_interval(1) == 20
+    scheduler.record(1, changed=False)
+    assert scheduler.get_interval(1) == 20
+
+    scheduler.record(1, changed=True)
+    assert scheduler.get_interval(1) == 5
+    assert scheduler._next_due[1] > time.monotonic() + 4
+
+
+def test_budget_limits_polls_per_second():
+    scheduler = PollScheduler(max_polls_per_second=20)
+
+    async def scenario():
+        start = time.monotonic()
+        for _ in range(30):
+            await scheduler._acquire_budget()
+        return time.monotonic() - start
+
+    # 初始20个令牌立即可用，其余10个按每秒20个补充
+    elapsed = asyncio.run(scenario())
+    assert 0.4 <= elapsed < 1.0
+
+
+def test_budget_below_one_poll_per_second_still_polls():
+    scheduler = PollScheduler(max_polls_per_second=0.5)
+    scheduler.register(1)
+
+    async def scenario():
+        await asyncio.wait_for(scheduler.wait_turn(1), timeout=1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,37 @@
+import io
+
+from PIL import Image, ImageDraw
+
+from src.band_monitor.screenshot_store import ScreenshotStore
+
+
+def _screenshot(rows: int, quality: int) -> bytes:
+    """模拟成员列表：每个成员一行（头像 + 名字）"""
+    image = Image.new("RGB", (320, 200), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 320, 30), fill="navy")
+    for row in range(rows):
+        top = 40 + row * 30
+        draw.ellipse((10, top, 30, top + 20), fill="gray")
+        draw.rectangle((40 + row * 25, top + 5, 200 + row * 10, top + 15), fill="black")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
+
+
+def test_perceptual_dedupe_ignores_encoding_noise(tmp_path):
+    store = ScreenshotStore(str(tmp_path))
+    first = store._store(1, "initial", "20260101_000000", _screenshot(5, 90), force=False)
+    # 字节不同但看起来相同的截图被跳过
+    again = store._store(1, "member_+0", "20260101_000001", _screenshot(5, 60), force=False)
+    changed = store._store(1, "member_-3", "20260101_000002", _screenshot(2, 90), force=False)
+
+    assert first and changed and again is None
+    assert store.stats["skipped_duplicates"] == 1
+
+
+def test_webp_output(tmp_path):
+    store = ScreenshotStore(str(tmp_path), image_format="webp")
+    path = store._store(1, "initial", "20260101_000000", _screenshot(5, 90), force=True)
+    assert path.endswith(".webp")
+    assert Image.open(path).format == "WEBP"
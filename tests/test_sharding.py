@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from src.band_monitor import sharding
+from src.band_monitor.database import Database
+from src.band_monitor.sharding import WorkerCoordinator
+
+
+def _coordinator(db, worker_id):
+    return WorkerCoordinator(db, browser_manager=None, restorer=None, worker_id=worker_id, lease_ttl=30)
+
+
+def test_rejects_workers_on_other_hosts(tmp_path):
+    async def scenario():
+        db = Database(str(tmp_path / "accounts.db"))
+        await db.init_db()
+        try:
+            local = _coordinator(db, "local-1")
+            await db.heartbeat_worker("local-2", None, 30, local.host)
+            await local.check_single_host()
+
+            await db.heartbeat_worker("remote-1", None, 30, "other-host")
+            with pytest.raises(RuntimeError, match="other-host"):
+                await local.check_single_host()
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_rejects_database_on_network_filesystem(tmp_path, monkeypatch):
+    monkeypatch.setattr(sharding, "_filesystem_type", lambda path: "nfs4")
+
+    async def scenario():
+        db = Database(str(tmp_path / "accounts.db"))
+        with pytest.raises(RuntimeError, match="nfs4"):
+            await _coordinator(db, "local-1").check_single_host()
+
+    asyncio.run(scenario())